@@ -0,0 +1,207 @@
+"""Content-addressed response cache for deterministic AI generators.
+
+Responses are keyed by a SHA-256 of (model, system prompt, messages,
+max_tokens) and kept in a local SQLite file (AI_CACHE_PATH), separate from
+the Django database so cache writes never contend with app writes. Entries
+expire after a TTL, and the least recently used ones are evicted once the
+store grows past AI_CACHE_MAX_BYTES.
+
+Call sites pick a namespace (e.g. "suggest_topics"), can bypass the cache
+with refresh=True, and can drop entries with invalidate().
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from . import client, singleflight
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE INDEX IF NOT EXISTS responses_namespace ON responses (namespace);
+"""
+
+_local = threading.local()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _conn():
+    """Per-thread SQLite connection (sqlite3 connections can't cross threads)."""
+    path = str(settings.AI_CACHE_PATH)
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != path:
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.path = conn, path
+    return conn
+
+
+def _count(namespace, event):
+    with _stats_lock:
+        _stats[(namespace, event)] += 1
+
+
+def make_key(model: str, system, messages: list[dict], max_tokens: int | None) -> str:
+    """Hash the request fields that determine a model response."""
+    payload = json.dumps(
+        {"model": model, "system": system, "messages": messages, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get(key: str) -> str | None:
+    """Return the cached value for `key`, or None if missing or expired."""
+    conn = _conn()
+    row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    value, expires_at = row
+    now = time.time()
+    if expires_at <= now:
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        return None
+    conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+    return value
+
+
+def put(key: str, namespace: str, value: str, ttl: int | None = None):
+    """Store `value` under `key`, then evict down to the size budget."""
+    ttl = settings.AI_CACHE_TTL if ttl is None else ttl
+    now = time.time()
+    conn = _conn()
+    conn.execute(
+        "INSERT OR REPLACE INTO responses (key, namespace, value, size, created_at, expires_at, last_used) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (key, namespace, value, len(value.encode()), now, now + ttl, now),
+    )
+    _evict(conn, now)
+
+
+def _evict(conn, now):
+    """Drop expired entries, then least recently used ones over AI_CACHE_MAX_BYTES."""
+    conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    excess = total - settings.AI_CACHE_MAX_BYTES
+    if excess <= 0:
+        return
+    victims = []
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+        victims.append((key,))
+        excess -= size
+        if excess <= 0:
+            break
+    conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+    with _stats_lock:
+        _stats[("*", "evictions")] += len(victims)
+
+
+def invalidate(namespace: str | None = None, key: str | None = None) -> int:
+    """Delete one entry, a namespace, or (with no arguments) everything."""
+    conn = _conn()
+    if key:
+        cur = conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+    elif namespace:
+        cur = conn.execute("DELETE FROM responses WHERE namespace = ?", (namespace,))
+    else:
+        cur = conn.execute("DELETE FROM responses")
+    return cur.rowcount
+
+
+def stats() -> dict:
+    """Hit/miss/bypass counts per namespace plus store size."""
+    with _stats_lock:
+        counters = dict(_stats)
+    result = {"namespaces": {}, "evictions": counters.pop(("*", "evictions"), 0)}
+    for (namespace, event), count in counters.items():
+        result["namespaces"].setdefault(namespace, {"hits": 0, "misses": 0, "bypasses": 0})[event] = count
+    entries, size = _conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    result.update(entries=entries, bytes=size)
+    return result
+
+
+def cached_completion(
+    namespace: str,
+    messages: list[dict],
+    system="",
+    model: str | None = None,
+    max_tokens: int | None = None,
+    ttl: int | None = None,
+    refresh: bool = False,
+    parse=None,
+    workload: str = "generation",
+):
+    """chat_completion() with a read-through cache.
+
+    Args:
+        namespace: Call-site name, used for stats and invalidation
+        ttl: Seconds to keep the entry (defaults to AI_CACHE_TTL)
+        refresh: Skip the cache lookup and overwrite the entry
+        workload: Scheduler class for the model call on a miss
+        parse: Optional parser applied to the response text; a response is
+            only cached if it parses, so a malformed answer is never replayed
+
+    Returns:
+        The response text, or parse(text) if a parser is given.
+    """
+    parse = parse or (lambda text: text)
+    model = model or settings.AI_MODEL
+    if not settings.AI_CACHE_ENABLED:
+        response = client.chat_completion(
+            messages=messages, system=system, model=model, max_tokens=max_tokens, workload=workload
+        )
+        return parse(response)
+
+    key = make_key(model, system, messages, max_tokens)
+    if refresh:
+        _count(namespace, "bypasses")
+    else:
+        try:
+            cached = get(key)
+        except sqlite3.Error:
+            logger.exception("AI cache read failed")
+            cached = None
+        if cached is not None:
+            _count(namespace, "hits")
+            return parse(cached)
+        _count(namespace, "misses")
+
+    # Another process may be generating the same response; wait for it and reuse its entry
+    with singleflight.file_lock(key) as contended:
+        if contended and not refresh:
+            try:
+                cached = get(key)
+            except sqlite3.Error:
+                cached = None
+            if cached is not None:
+                return parse(cached)
+
+        response = client.chat_completion(
+            messages=messages, system=system, model=model, max_tokens=max_tokens, workload=workload
+        )
+        result = parse(response)
+        try:
+            put(key, namespace, response, ttl)
+        except sqlite3.Error:
+            logger.exception("AI cache write failed")
+    return result
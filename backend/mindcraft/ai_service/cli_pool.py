@@ -0,0 +1,448 @@
+"""Warm pool of long-lived Claude CLI workers.
+
+Spawning ``claude -p`` for every request costs seconds of startup. The pool
+keeps CLI processes running in stream-json input mode, blocked on stdin, so a
+request only pays for the model round trip.
+
+Workers are keyed by model only. They are launched with a generic system
+prompt (see client.WORKER_SYSTEM_PROMPT), and each request sends its own
+system prompt inside the user message. Chat system prompts carry the kid's
+name, the rolling summary and the lesson sections for the question, so a
+pool keyed by system prompt would almost never have a matching worker.
+Keyed by model, the worker spawned when the last request finished serves
+the next one, whoever it is for.
+
+When a worker is retired, a replacement for its model is spawned in the
+background if a slot is free, so the pool holds a warm worker per model in
+use. A CLI process keeps its conversation across turns, so
+AI_CLI_POOL_MAX_REQUESTS defaults to 1: each worker answers one request and
+is replaced, which keeps requests isolated while still hiding the spawn cost.
+
+lease() is for threads; alease() and CLIWorker.alines() are for the ASGI
+event loop and wait without holding a thread.
+
+Configured via settings:
+    AI_CLI_POOL_SIZE           max live CLI processes (0 disables the pool)
+    AI_CLI_POOL_MAX_REQUESTS   turns a worker serves before it is recycled
+    AI_CLI_POOL_QUEUE_TIMEOUT  seconds to wait for a free worker
+    AI_CLI_POOL_IDLE_TTL       seconds an idle worker is kept alive
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CLIPoolTimeout(RuntimeError):
+    """Raised when no CLI worker frees up within the queue timeout."""
+
+
+class CLIWorker:
+    """A single `claude -p --input-format stream-json` process.
+
+    stdout is pumped into a queue and stderr is drained into a short tail by
+    background threads, so neither pipe can fill up and block the process.
+    """
+
+    def __init__(self, key, cmd, env):
+        self.key = key
+        self.requests_served = 0
+        self.turn_complete = True
+        self.last_used = time.monotonic()
+        self.stderr_tail = deque(maxlen=50)
+        self._lines = queue.Queue()
+        self._waker = None  # set by alines() while an event loop is reading
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=env,
+        )
+        try:
+            threading.Thread(target=self._pump_stdout, daemon=True).start()
+            threading.Thread(target=self._drain_stderr, daemon=True).start()
+        except RuntimeError:
+            self.terminate()  # interpreter shutting down
+            raise
+
+    def _pump_stdout(self):
+        for line in self.process.stdout:
+            self._put(line)
+        self._put(None)  # EOF sentinel
+
+    def _put(self, line):
+        self._lines.put(line)
+        waker = self._waker
+        if waker:
+            try:
+                waker()
+            except RuntimeError:
+                pass  # the reading event loop has closed
+
+    def _drain_stderr(self):
+        for line in self.process.stderr:
+            self.stderr_tail.append(line.rstrip())
+
+    def is_healthy(self):
+        return self.process.poll() is None
+
+    def send(self, prompt):
+        """Start a new turn by writing a user message to stdin."""
+        message = {"type": "user", "message": {"role": "user", "content": prompt}}
+        self.process.stdin.write(json.dumps(message) + "\n")
+        self.process.stdin.flush()
+        self.requests_served += 1
+        self.turn_complete = False
+
+    def _is_result(self, line):
+        """Whether `line` ends the current turn; raises if the process exited instead."""
+        if line is None:
+            err = "\n".join(self.stderr_tail) or f"exit {self.process.poll()}"
+            raise RuntimeError(f"Claude CLI error: worker exited ({err})")
+        try:
+            is_result = json.loads(line).get("type") == "result"
+        except (json.JSONDecodeError, AttributeError):
+            is_result = False
+        if is_result:
+            # Readers stop at the result line without resuming the generator,
+            # so the turn has to count as complete before it is handed out
+            self.turn_complete = True
+        return is_result
+
+    def lines(self, timeout):
+        """Yield stdout lines for the current turn, up to and including its result event."""
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                raise RuntimeError(f"Claude CLI error: no output for {timeout}s")
+            is_result = self._is_result(line)
+            yield line
+            if is_result:
+                return
+
+    async def alines(self, timeout):
+        """Async variant of lines(): waits on the event loop instead of blocking a thread."""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        self._waker = lambda: loop.call_soon_threadsafe(ready.set)
+        try:
+            while True:
+                try:
+                    line = self._lines.get_nowait()
+                except queue.Empty:
+                    ready.clear()
+                    if not self._lines.empty():
+                        continue  # arrived before the event was cleared
+                    try:
+                        await asyncio.wait_for(ready.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        raise RuntimeError(f"Claude CLI error: no output for {timeout}s")
+                    continue
+                is_result = self._is_result(line)
+                yield line
+                if is_result:
+                    return
+        finally:
+            self._waker = None
+
+    def terminate(self):
+        """Stop the process; returns True if it ignored SIGTERM and had to be killed."""
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                return True
+        return False
+
+
+class CLIWorkerPool:
+    """Bounded pool of CLI workers keyed by model, with FIFO-ish queueing when all are busy."""
+
+    def __init__(self, size, max_requests, queue_timeout, idle_ttl, build_cmd, build_env):
+        self.size = size
+        self.max_requests = max_requests
+        self.queue_timeout = queue_timeout
+        self.idle_ttl = idle_ttl
+        self._build_cmd = build_cmd
+        self._build_env = build_env
+        self._cond = threading.Condition()
+        self._idle = {}  # model -> list[CLIWorker]
+        self._wakers = set()  # alease() waiters on event loops
+        self._warming = set()  # models with a worker being prewarmed
+        self._live = 0  # idle + busy + spawning
+        self._closed = False
+
+    # -- leasing -------------------------------------------------------------
+
+    @contextmanager
+    def lease(self, model):
+        """Check out a warm worker for `model`, waiting if all are busy."""
+        worker = self._acquire(model)
+        try:
+            yield worker
+        except BaseException:
+            self._release(worker, reusable=False)
+            raise
+        self._release(worker, reusable=worker.turn_complete)
+
+    @asynccontextmanager
+    async def alease(self, model):
+        """Async variant of lease(); waiting for a worker does not hold a thread."""
+        worker = await self._aacquire(model)
+        try:
+            yield worker
+        except BaseException:
+            # Releasing may terminate the process, which can take seconds
+            await asyncio.to_thread(self._release, worker, False)
+            raise
+        await asyncio.to_thread(self._release, worker, worker.turn_complete)
+
+    def _try_acquire_locked(self, key, stale):
+        """One attempt to check out a worker for `key` without waiting.
+
+        Returns (worker, None) for an idle worker, (None, victim) once a slot
+        is reserved for a new worker (victim being the idle worker evicted to
+        free it, or None), or None if every slot is busy. Reaped workers are
+        added to `stale` for the caller to terminate outside the lock.
+        """
+        stale.extend(self._reap_locked())
+        idle = self._idle.get(key)
+        if idle:
+            logger.debug("CLI pool: reusing warm worker for %s", key)
+            return idle.pop(), None
+        if key in self._warming:
+            return None  # a worker for this model is already starting: no slower than spawning one
+        if self._live < self.size:
+            self._live += 1
+            return None, None
+        victim = self._pop_oldest_idle_locked()
+        if victim is not None:
+            return None, victim  # its slot is handed straight to the new worker
+        return None
+
+    def _acquire(self, key):
+        deadline = time.monotonic() + self.queue_timeout
+        stale = []
+        try:
+            with self._cond:
+                while (taken := self._try_acquire_locked(key, stale)) is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timeout()
+                    self._cond.wait(remaining)
+        finally:
+            # Outside the lock: terminate() can wait seconds for a process to exit
+            for worker in stale:
+                worker.terminate()
+        return self._checkout(key, *taken)
+
+    async def _aacquire(self, key):
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        def waker():
+            loop.call_soon_threadsafe(wake.set)
+
+        deadline = time.monotonic() + self.queue_timeout
+        stale = []
+        try:
+            while True:
+                with self._cond:
+                    taken = self._try_acquire_locked(key, stale)
+                    if taken is None:
+                        wake.clear()
+                        self._wakers.add(waker)
+                if taken is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise self._timeout()
+                    await asyncio.wait_for(wake.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass  # re-checked at the top, then raised on the deadline
+                finally:
+                    with self._cond:
+                        self._wakers.discard(waker)
+        finally:
+            if stale:
+                await asyncio.to_thread(_terminate_all, stale)
+        return await asyncio.to_thread(self._checkout, key, *taken)
+
+    def _checkout(self, key, worker, victim):
+        """Finish an acquisition: return the idle worker, or spawn one into the reserved slot."""
+        if worker is not None:
+            return worker
+        if victim is not None:
+            victim.terminate()
+        try:
+            return self._spawn(key)
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._notify_locked()
+            raise
+
+    def _timeout(self):
+        return CLIPoolTimeout(f"Claude CLI error: all {self.size} workers busy for {self.queue_timeout}s")
+
+    def _notify_locked(self):
+        """Wake a thread waiting in lease() and every alease() waiter (they re-check)."""
+        self._cond.notify()
+        for wake in self._wakers:
+            wake()
+
+    def _release(self, worker, reusable):
+        worker.last_used = time.monotonic()
+        keep = (
+            reusable
+            and not self._closed
+            and worker.is_healthy()
+            and worker.requests_served < self.max_requests
+        )
+        with self._cond:
+            if keep:
+                self._idle.setdefault(worker.key, []).append(worker)
+            else:
+                self._live -= 1
+            self._notify_locked()
+        if not keep:
+            worker.terminate()
+            self.prewarm(worker.key)
+
+    # -- spawning ------------------------------------------------------------
+
+    def _spawn(self, key):
+        logger.info("CLI pool: spawning worker (model=%s)", key)
+        return CLIWorker(key, self._build_cmd(key), self._build_env())
+
+    def prewarm(self, key):
+        """Spawn a worker for `key` in the background unless one is idle or no slot is free."""
+        with self._cond:
+            if self._closed or self._live >= self.size or self._idle.get(key) or key in self._warming:
+                return
+            self._live += 1
+            self._warming.add(key)
+
+        def run():
+            try:
+                worker = self._spawn(key)
+            except Exception:
+                if not self._closed:
+                    logger.exception("CLI pool: failed to prewarm worker")
+                with self._cond:
+                    self._live -= 1
+                    self._warming.discard(key)
+                    self._notify_locked()
+                return
+            with self._cond:
+                self._warming.discard(key)
+                if not self._closed:
+                    self._idle.setdefault(key, []).append(worker)
+                    self._notify_locked()
+                    return
+                self._live -= 1
+            worker.terminate()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # -- health --------------------------------------------------------------
+
+    def _reap_locked(self):
+        """Drop idle workers that have exited or sat idle past the TTL.
+
+        Returns the dropped workers; the caller terminates them once it has
+        released the lock.
+        """
+        now = time.monotonic()
+        dropped = []
+        for key, workers in list(self._idle.items()):
+            alive = []
+            for worker in workers:
+                if worker.is_healthy() and now - worker.last_used < self.idle_ttl:
+                    alive.append(worker)
+                else:
+                    self._live -= 1
+                    dropped.append(worker)
+            if alive:
+                self._idle[key] = alive
+            else:
+                del self._idle[key]
+        return dropped
+
+    def _pop_oldest_idle_locked(self):
+        oldest_key, oldest = None, None
+        for key, workers in self._idle.items():
+            for worker in workers:
+                if oldest is None or worker.last_used < oldest.last_used:
+                    oldest_key, oldest = key, worker
+        if oldest is not None:
+            self._idle[oldest_key].remove(oldest)
+            if not self._idle[oldest_key]:
+                del self._idle[oldest_key]
+        return oldest
+
+    def stats(self):
+        with self._cond:
+            idle = sum(len(w) for w in self._idle.values())
+            return {"size": self.size, "live": self._live, "idle": idle, "busy": self._live - idle}
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            workers = [w for ws in self._idle.values() for w in ws]
+            self._idle.clear()
+            self._live -= len(workers)
+        _terminate_all(workers)
+
+
+def _terminate_all(workers):
+    for worker in workers:
+        worker.terminate()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, or None if AI_CLI_POOL_SIZE is 0."""
+    global _pool
+    if settings.AI_CLI_POOL_SIZE <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from .client import WORKER_SYSTEM_PROMPT, _cli_build_cmd, _cli_build_env
+
+                _pool = CLIWorkerPool(
+                    size=settings.AI_CLI_POOL_SIZE,
+                    max_requests=settings.AI_CLI_POOL_MAX_REQUESTS,
+                    queue_timeout=settings.AI_CLI_POOL_QUEUE_TIMEOUT,
+                    idle_ttl=settings.AI_CLI_POOL_IDLE_TTL,
+                    build_cmd=lambda model: _cli_build_cmd(
+                        model, WORKER_SYSTEM_PROMPT, stream=True, persistent=True,
+                    ),
+                    build_env=_cli_build_env,
+                )
+                atexit.register(_pool.shutdown)
+                # Chat is the interactive path: have its first request find a warm worker
+                _pool.prewarm(settings.AI_MODEL_CHAT)
+    return _pool
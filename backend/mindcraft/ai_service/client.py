@@ -1,19 +1,27 @@
-"""Claude AI client — supports both Claude Code CLI and Anthropic API backends.
+"""Claude AI client — supports Claude Code CLI and Anthropic API backends.
 
-Toggle via AI_BACKEND setting: "cli" (default) or "api".
+Toggle via AI_BACKEND setting: "cli" (default), "api", or "replay" (serve
+recorded cassettes, see replay.py).
 """
 
+import asyncio
 import json
 import logging
 import os
 import subprocess
+import threading
+import time
+from collections import Counter, deque
 from contextlib import contextmanager
 
 from django.conf import settings
 
+from . import cli_pool, prompts, providers, replay, scheduler, singleflight
+
 logger = logging.getLogger(__name__)
 
 CLI_TIMEOUT = 300  # 5 minutes — CLI has startup overhead
+CLI_KILL_GRACE = 5  # seconds a cancelled CLI process gets to exit before it is killed
 
 # ---------------------------------------------------------------------------
 # Public interface (used by generators.py, chat views, etc.)
@@ -22,46 +30,278 @@ CLI_TIMEOUT = 300  # 5 minutes — CLI has startup overhead
 
 def chat_completion(
     messages: list[dict],
-    system: str = "",
+    system: str | list[dict] = "",
     model: str | None = None,
     max_tokens: int | None = None,
     stream: bool = False,
+    workload: str = "generation",
 ):
     """Send a completion request — routes to CLI or API based on AI_BACKEND.
 
     Args:
         messages: List of {"role": "user"|"assistant", "content": "..."} dicts
-        system: System prompt
+        system: System prompt, or a list of system blocks (see
+            prompts.cached_system) carrying cache_control breakpoints
         model: Model to use (defaults to AI_MODEL from settings)
         max_tokens: Max response tokens
         stream: Whether to stream the response
+        workload: Scheduler class the call is admitted under (see scheduler)
 
     Returns:
         If stream=False: The response message content string
         If stream=True: A streaming context manager with .text_stream
+
+    Identical non-streaming requests already in flight in this process are
+    coalesced into one upstream call (see singleflight).
     """
-    if settings.AI_BACKEND == "cli":
+    if stream:
+        if replay.enabled():
+            raise ValueError("The replay backend does not support stream=True; use chat_completion_stream")
+        return _route_completion(settings.AI_BACKEND, messages, system, model, max_tokens, stream)
+
+    from .cache import make_key
+
+    def call():
+        with scheduler.slot(workload):
+            if replay.enabled():
+                request = _replay_request(messages, system, model or settings.AI_MODEL, max_tokens)
+                return replay.completion(
+                    "anthropic",
+                    request,
+                    lambda: _route_completion(settings.AI_REPLAY_UPSTREAM, messages, system, model, max_tokens, False),
+                )
+            return _route_completion(settings.AI_BACKEND, messages, system, model, max_tokens, stream)
+
+    key = make_key(model or settings.AI_MODEL, system, messages, max_tokens)
+    return singleflight.do(key, call)
+
+
+def _route_completion(backend, messages, system, model, max_tokens, stream):
+    if backend == "cli":
         return _cli_chat_completion(messages, system, model, stream)
     return _api_chat_completion(messages, system, model, max_tokens, stream)
 
 
+class CancelToken:
+    """Stops a chat_completion_stream from any thread.
+
+    cancel() runs the abort callbacks the backend registered (terminate the
+    CLI process, close the API response), so the upstream call stops at once
+    rather than at its next chunk; the stream then ends without raising.
+    """
+
+    def __init__(self):
+        self.reason = ""
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Stream abort callback failed")
+
+    def on_cancel(self, callback):
+        """Run callback when cancelled (right away if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
 def chat_completion_stream(
     messages: list[dict],
-    system: str = "",
+    system: str | list[dict] = "",
     model: str | None = None,
     max_tokens: int | None = None,
+    workload: str = "chat",
+    cancel: CancelToken | None = None,
 ):
-    """Stream a chat completion, yielding text chunks."""
+    """Stream a chat completion, yielding text chunks.
+
+    Pass a CancelToken to be able to stop the upstream call mid-stream; a
+    cancelled stream just stops yielding. Workloads that only gate
+    admission (chat) hand their scheduler slot back at the first chunk.
+    """
     model = model or settings.AI_MODEL_CHAT
-    if settings.AI_BACKEND == "cli":
-        prompt = _messages_to_prompt(messages)
-        with _cli_stream(prompt, system, model) as stream:
-            for text in stream.text_stream:
+    with scheduler.slot(workload) as slot:
+        timer = _StreamTimer(settings.AI_BACKEND)
+        if replay.enabled():
+            chunks = replay.stream(
+                "anthropic",
+                _replay_request(messages, system, model, max_tokens),
+                lambda: _stream_chunks(settings.AI_REPLAY_UPSTREAM, messages, system, model, max_tokens, cancel),
+            )
+        else:
+            chunks = _stream_chunks(settings.AI_BACKEND, messages, system, model, max_tokens, cancel)
+        generated = []
+        try:
+            for text in chunks:
+                slot.admitted()
+                if cancel and cancel.cancelled:
+                    break
+                generated.append(text)
+                timer.tick()
                 yield text
+        except Exception:
+            # Aborting the upstream call surfaces as a read or exit error
+            if not (cancel and cancel.cancelled):
+                raise
+        finally:
+            chunks.close()
+            timer.finish()
+            if cancel and cancel.cancelled:
+                _record_cancel(cancel.reason, "".join(generated))
+
+
+async def achat_completion_stream(
+    messages: list[dict],
+    system: str | list[dict] = "",
+    model: str | None = None,
+    max_tokens: int | None = None,
+    workload: str = "chat",
+    cancel: CancelToken | None = None,
+):
+    """Async variant of chat_completion_stream for ASGI views.
+
+    Uses pooled CLI workers (or asyncio subprocess pipes) for the CLI backend
+    and AsyncAnthropic for the API backend, and waits for its scheduler slot
+    on the event loop, so an open stream does not hold a thread. Cancelling
+    (the token, or the task on client disconnect) interrupts the pending
+    read, which closes the upstream stream.
+    """
+    model = model or settings.AI_MODEL_CHAT
+    async with scheduler.aslot(workload) as slot:
+        timer = _StreamTimer(settings.AI_BACKEND)
+        if replay.enabled():
+            chunks = replay.astream(
+                "anthropic",
+                _replay_request(messages, system, model, max_tokens),
+                lambda: _astream_chunks(settings.AI_REPLAY_UPSTREAM, messages, system, model, max_tokens),
+            )
+        else:
+            chunks = _astream_chunks(settings.AI_BACKEND, messages, system, model, max_tokens)
+        generated = []
+        disconnected = False
+        try:
+            async for text in _until_cancelled(chunks, cancel):
+                slot.admitted()
+                generated.append(text)
+                timer.tick()
+                yield text
+        except (asyncio.CancelledError, GeneratorExit):
+            disconnected = True
+            raise
+        finally:
+            await chunks.aclose()
+            timer.finish()
+            if disconnected or (cancel and cancel.cancelled):
+                _record_cancel(cancel.reason if cancel and cancel.cancelled else "disconnected", "".join(generated))
+
+
+async def _until_cancelled(chunks, cancel):
+    """Yield from an async chunk iterator until it ends or `cancel` fires."""
+    if cancel is None:
+        async for text in chunks:
+            yield text
+        return
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    cancel.on_cancel(lambda: loop.call_soon_threadsafe(stop.set))
+    stopped = asyncio.ensure_future(stop.wait())
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(anext(chunks))
+            await asyncio.wait({pending, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if not pending.done():
+                return
+            try:
+                text = pending.result()
+            except StopAsyncIteration:
+                return
+            yield text
+    finally:
+        stopped.cancel()
+        if pending is not None and not pending.done():
+            # Interrupts the upstream read; the caller's aclose() then ends the stream
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+
+
+def _stream_chunks(backend, messages, system, model, max_tokens, cancel=None):
+    if backend == "cli":
+        prompt = _messages_to_prompt(messages)
+        with _cli_stream(prompt, _system_text(system), model, cancel) as stream:
+            yield from stream.text_stream
     else:
         with _api_chat_completion(messages, system, model, max_tokens, stream=True) as stream:
-            for text in stream.text_stream:
+            if cancel:
+                cancel.on_cancel(stream.close)
+            yield from stream.text_stream
+            _log_usage(model, stream.get_final_message().usage)
+
+
+async def _astream_chunks(backend, messages, system, model, max_tokens):
+    if backend == "cli":
+        prompt = _messages_to_prompt(messages)
+        async for text in _cli_astream(prompt, _system_text(system), model):
+            yield text
+    else:
+        client = providers.get_async_anthropic(_get_api_key())
+        kwargs = _api_request_kwargs(messages, system, model, max_tokens)
+        async with client.messages.stream(**kwargs) as stream:
+            async for text in stream.text_stream:
                 yield text
+            _log_usage(model, (await stream.get_final_message()).usage)
+
+
+def _replay_request(messages, system, model, max_tokens):
+    """Cassette key for a Claude call (independent of the upstream backend)."""
+    return {"model": model, "system": system, "messages": messages, "max_tokens": max_tokens}
+
+
+def stream_stats() -> dict:
+    """Time-to-first-token and inter-chunk latency per backend (recent streams)."""
+    with _stream_lock:
+        samples = {backend: (list(s["ttft"]), list(s["gaps"]), s["streams"], s["chunks"])
+                   for backend, s in _stream_samples.items()}
+    return {
+        backend: {
+            "streams": streams,
+            "avg_chunks": round(chunks / streams, 1) if streams else 0,
+            "ttft_p50_ms": _percentile_ms(ttft, 50),
+            "ttft_p95_ms": _percentile_ms(ttft, 95),
+            "inter_chunk_p50_ms": _percentile_ms(gaps, 50),
+            "inter_chunk_p95_ms": _percentile_ms(gaps, 95),
+        }
+        for backend, (ttft, gaps, streams, chunks) in samples.items()
+    }
+
+
+def cancel_stats() -> dict:
+    """Streams stopped early by reason, their estimated wasted output tokens, and CLI processes that had to be killed."""
+    with _stream_lock:
+        stats = dict(_cancel_stats)
+    return {
+        "streams": {key.split(":", 1)[1]: n for key, n in stats.items() if key.startswith("streams:")},
+        "wasted_tokens": stats.get("wasted_tokens", 0),
+        "stuck_processes": stats.get("stuck_processes", 0),
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -84,8 +324,26 @@ def _cli_build_env():
     return env
 
 
-def _cli_build_cmd(model, system="", stream=False):
-    """Build the claude CLI command list (prompt comes via stdin)."""
+# System prompt pooled workers are launched with; each request's own system prompt travels in its message
+WORKER_SYSTEM_PROMPT = (
+    "Each message starts with your instructions for it between <instructions> tags, followed by the "
+    "conversation to answer. Follow those instructions as your system prompt and reply only to the conversation."
+)
+
+
+def _worker_message(prompt, system=""):
+    """The user message sent to a pooled worker: the request's system prompt, then its prompt."""
+    if not system:
+        return prompt
+    return f"<instructions>\n{system}\n</instructions>\n\n{prompt}"
+
+
+def _cli_build_cmd(model, system="", stream=False, persistent=False):
+    """Build the claude CLI command list (prompt comes via stdin).
+
+    With persistent=True the CLI reads stream-json user messages from stdin
+    and stays alive between turns (used by the warm worker pool).
+    """
     cmd = [
         "claude", "-p",
         "--model", model,
@@ -95,17 +353,27 @@ def _cli_build_cmd(model, system="", stream=False):
     if system:
         cmd.extend(["--system-prompt", system])
     if stream:
-        cmd.extend(["--output-format", "stream-json", "--verbose"])
+        # Partial messages give token-level deltas instead of one whole message
+        cmd.extend(["--output-format", "stream-json", "--verbose", "--include-partial-messages"])
+    if persistent:
+        cmd.extend(["--input-format", "stream-json"])
     return cmd
 
 
 def _cli_chat_completion(messages, system, model, stream):
     model = model or settings.AI_MODEL
     prompt = _messages_to_prompt(messages)
+    system = _system_text(system)
 
     if stream:
         return _cli_stream(prompt, system, model)
 
+    pool = cli_pool.get_pool()
+    if pool is not None:
+        with pool.lease(model) as worker:
+            worker.send(_worker_message(prompt, system))
+            return _cli_collect_result(worker.lines(CLI_TIMEOUT))
+
     cmd = _cli_build_cmd(model, system)
 
     logger.info("Running claude CLI (model=%s, prompt_len=%d)", model, len(prompt))
@@ -126,51 +394,151 @@ def _cli_chat_completion(messages, system, model, stream):
     return result.stdout.strip()
 
 
+def _cli_collect_result(lines):
+    """Return the final text of one stream-json turn (its `result` event)."""
+    chunks = []
+    for line in lines:
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if data.get("type") == "result":
+            if data.get("is_error"):
+                raise RuntimeError(f"Claude CLI error: {data.get('result', '')}")
+            _log_usage("cli", data.get("usage"))
+            return (data.get("result") or "".join(chunks)).strip()
+        if data.get("type") == "assistant":
+            for block in data.get("message", {}).get("content", []):
+                chunks.append(block.get("text", ""))
+    return "".join(chunks).strip()
+
+
+class _CLIStreamParser:
+    """Turns one turn of stream-json output into text chunks.
+
+    Handles three event shapes:
+    - Partial messages: {"type":"stream_event","event":{"type":"content_block_delta",...}}
+    - Legacy: {"type":"content_block_delta","delta":{"text":"..."}}
+    - Verbose: {"type":"assistant","message":{"content":[{"text":"..."}]}}
+
+    With --include-partial-messages the CLI streams deltas and then repeats the
+    complete assistant message; once deltas were seen that message is skipped.
+    """
+
+    def __init__(self):
+        self.saw_deltas = False
+
+    def feed(self, line):
+        """Parse one line into (text chunks, turn finished)."""
+        line = line.strip()
+        if not line:
+            return [], False
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return [], False
+
+        kind = data.get("type")
+        if kind == "result":
+            if data.get("is_error"):
+                raise RuntimeError(f"Claude CLI error: {data.get('result', '')}")
+            _log_usage("cli", data.get("usage"))
+            return [], True
+
+        if kind == "stream_event":
+            data = data.get("event", {})
+            kind = data.get("type")
+
+        if kind == "content_block_delta":
+            text = data.get("delta", {}).get("text", "")
+            self.saw_deltas = True
+            return ([text] if text else []), False
+
+        if kind == "assistant" and not self.saw_deltas:
+            message = data.get("message", {})
+            return [block.get("text", "") for block in message.get("content", []) if block.get("text")], False
+
+        return [], False
+
+
 class _CLITextStream:
     """Mimics Anthropic's stream.text_stream using claude CLI stream-json output.
 
-    Handles two output formats:
-    - Legacy: {"type":"content_block_delta","delta":{"text":"..."}}
-    - Verbose (current): {"type":"assistant","message":{"content":[{"text":"..."}]}}
+    Reading stops at the turn's `result` event, so the same parser works for
+    one-shot processes and for pooled workers that stay alive afterwards.
     """
 
-    def __init__(self, process):
-        self._process = process
+    def __init__(self, lines, on_close=None, on_eof=None):
+        self._lines = lines
+        self._on_close = on_close
+        self._on_eof = on_eof
 
     @property
     def text_stream(self):
-        for line in self._process.stdout:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                data = json.loads(line)
+        parser = _CLIStreamParser()
+        for line in self._lines:
+            texts, done = parser.feed(line)
+            yield from texts
+            if done:
+                return
+        if self._on_eof:
+            self._on_eof()
 
-                # Legacy format: content_block_delta events
-                if data.get("type") == "content_block_delta":
-                    text = data.get("delta", {}).get("text", "")
-                    if text:
-                        yield text
+    def close(self):
+        if self._on_close:
+            self._on_close()
 
-                # Verbose format: full assistant message
-                elif data.get("type") == "assistant":
-                    message = data.get("message", {})
-                    for block in message.get("content", []):
-                        text = block.get("text", "")
-                        if text:
-                            yield text
 
-            except json.JSONDecodeError:
-                continue
+def _terminate_process(process):
+    process.terminate()
+    process.wait()
 
-    def close(self):
-        self._process.terminate()
-        self._process.wait()
+
+def _stop_process(process):
+    """Terminate a CLI process now; returns True if it ignored SIGTERM and had to be killed."""
+    if process.poll() is not None:
+        return False
+    process.terminate()
+    try:
+        process.wait(timeout=CLI_KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        return True
+    return False
+
+
+def _drain_stderr(pipe, tail):
+    """Keep the last lines of a CLI's stderr; reading it stops a full pipe blocking the process."""
+    for line in pipe:
+        tail.append(line.rstrip())
+
+
+def _check_exit(process, drain, stderr_tail):
+    """Raise if a one-shot CLI process ended without a result event and a zero exit."""
+    code = process.wait()
+    if code != 0:
+        drain.join(timeout=1)
+        err = "\n".join(stderr_tail) or f"exit {code}"
+        raise RuntimeError(f"Claude CLI error: {err}")
 
 
 @contextmanager
-def _cli_stream(prompt, system="", model=None):
-    """Run claude CLI with streaming JSON output, piping prompt via stdin."""
+def _cli_stream(prompt, system="", model=None, cancel=None):
+    """Run claude CLI with streaming JSON output, piping prompt via stdin.
+
+    Uses a warm pooled worker when the pool is enabled, otherwise spawns a
+    one-shot process. Cancelling terminates the process (a pooled worker is
+    then replaced).
+    """
+    pool = cli_pool.get_pool()
+    if pool is not None:
+        with pool.lease(model) as worker:
+            if cancel:
+                cancel.on_cancel(lambda: _count_stuck(worker.terminate()))
+            worker.send(_worker_message(prompt, system))
+            yield _CLITextStream(worker.lines(CLI_TIMEOUT))
+        return
+
     cmd = _cli_build_cmd(model, system, stream=True)
 
     process = subprocess.Popen(
@@ -181,30 +549,89 @@ def _cli_stream(prompt, system="", model=None):
         text=True,
         env=_cli_build_env(),
     )
+    stderr_tail = deque(maxlen=50)
+    drain = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_tail), daemon=True)
+    drain.start()
+    if cancel:
+        cancel.on_cancel(lambda: _count_stuck(_stop_process(process)))
     # Send prompt via stdin and close to signal EOF
     process.stdin.write(prompt)
     process.stdin.close()
 
-    stream = _CLITextStream(process)
+    stream = _CLITextStream(
+        process.stdout,
+        on_close=lambda: _terminate_process(process),
+        on_eof=lambda: _check_exit(process, drain, stderr_tail),
+    )
     try:
         yield stream
     finally:
         stream.close()
 
 
+async def _cli_astream(prompt, system="", model=None):
+    """Async claude CLI stream: a warm pooled worker, or a one-shot process over asyncio pipes."""
+    pool = cli_pool.get_pool()
+    if pool is not None:
+        async with pool.alease(model) as worker:
+            worker.send(_worker_message(prompt, system))
+            parser = _CLIStreamParser()
+            async for line in worker.alines(CLI_TIMEOUT):
+                texts, done = parser.feed(line)
+                for text in texts:
+                    yield text
+                if done:
+                    return
+        return
+
+    cmd = _cli_build_cmd(model, system, stream=True)
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=_cli_build_env(),
+        limit=16 * 1024 * 1024,  # the final assistant message still arrives as one line
+    )
+    # Drain stderr concurrently so a full pipe can't stall the CLI
+    stderr_task = asyncio.create_task(process.stderr.read())
+    parser = _CLIStreamParser()
+    try:
+        process.stdin.write(prompt.encode())
+        await process.stdin.drain()
+        process.stdin.close()
+
+        while True:
+            line = await asyncio.wait_for(process.stdout.readline(), CLI_TIMEOUT)
+            if not line:
+                break
+            texts, done = parser.feed(line.decode())
+            for text in texts:
+                yield text
+            if done:
+                return
+
+        if await process.wait() != 0:
+            err = (await stderr_task).decode().strip()
+            raise RuntimeError(f"Claude CLI error: {err}")
+    finally:
+        if process.returncode is None:
+            process.terminate()
+            await process.wait()
+        stderr_task.cancel()
+
+
 # ---------------------------------------------------------------------------
 # API backend (Anthropic SDK)
 # ---------------------------------------------------------------------------
 
 
-def _get_api_client():
-    """Get an Anthropic client instance.
+def _get_api_key():
+    """Resolve Anthropic credentials.
 
     Uses ANTHROPIC_API_KEY if set, otherwise falls back to
     CLAUDE_CODE_OAUTH_TOKEN for OAuth-based auth.
     """
-    import anthropic
-
     api_key = settings.ANTHROPIC_API_KEY
     if not api_key or api_key.startswith("your-"):
         # Fall back to OAuth token
@@ -215,25 +642,31 @@ def _get_api_client():
             "No Anthropic credentials found. Set ANTHROPIC_API_KEY or CLAUDE_CODE_OAUTH_TOKEN."
         )
 
-    return anthropic.Anthropic(api_key=api_key)
+    return api_key
 
 
-NON_STREAMING_MAX_TOKENS = 8192  # Keep non-streaming calls under SDK timeout limit
+def _get_api_client():
+    """Get the shared Anthropic client instance."""
+    return providers.get_anthropic(_get_api_key())
 
 
-def _api_chat_completion(messages, system, model, max_tokens, stream):
-    model = model or settings.AI_MODEL
-    max_tokens = max_tokens or settings.AI_MAX_TOKENS
+NON_STREAMING_MAX_TOKENS = 8192  # Keep non-streaming calls under SDK timeout limit
 
-    client = _get_api_client()
 
+def _api_request_kwargs(messages, system, model, max_tokens):
     kwargs = {
-        "model": model,
-        "max_tokens": max_tokens,
+        "model": model or settings.AI_MODEL,
+        "max_tokens": max_tokens or settings.AI_MAX_TOKENS,
         "messages": messages,
     }
     if system:
         kwargs["system"] = system
+    return kwargs
+
+
+def _api_chat_completion(messages, system, model, max_tokens, stream):
+    client = _get_api_client()
+    kwargs = _api_request_kwargs(messages, system, model, max_tokens)
 
     if stream:
         return client.messages.stream(**kwargs)
@@ -243,6 +676,7 @@ def _api_chat_completion(messages, system, model, max_tokens, stream):
         kwargs["max_tokens"] = NON_STREAMING_MAX_TOKENS
 
     response = client.messages.create(**kwargs)
+    _log_usage(kwargs["model"], response.usage)
     return response.content[0].text
 
 
@@ -251,6 +685,94 @@ def _api_chat_completion(messages, system, model, max_tokens, stream):
 # ---------------------------------------------------------------------------
 
 
+def _system_text(system) -> str:
+    """Flatten structured system blocks to plain text (the CLI takes a string)."""
+    if isinstance(system, str):
+        return system
+    return "\n\n".join(block.get("text", "") for block in system)
+
+
+def _usage_value(usage, field):
+    value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+    return value or 0
+
+
+def _log_usage(model, usage):
+    """Log input/output tokens and prompt-cache reads/writes for one call."""
+    if not usage:
+        return
+    logger.info(
+        "Claude usage (model=%s): input=%d cache_read=%d cache_write=%d output=%d",
+        model,
+        _usage_value(usage, "input_tokens"),
+        _usage_value(usage, "cache_read_input_tokens"),
+        _usage_value(usage, "cache_creation_input_tokens"),
+        _usage_value(usage, "output_tokens"),
+    )
+
+
+class _StreamTimer:
+    """Measures time to first token and gaps between chunks of one stream."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.start = time.monotonic()
+        self.last = None
+        self.ttft = None
+        self.gaps = []
+
+    def tick(self):
+        now = time.monotonic()
+        if self.last is None:
+            self.ttft = now - self.start
+        else:
+            self.gaps.append(now - self.last)
+        self.last = now
+
+    def finish(self):
+        if self.ttft is None:
+            return
+        with _stream_lock:
+            samples = _stream_samples.setdefault(
+                self.backend, {"ttft": deque(maxlen=500), "gaps": deque(maxlen=5000), "streams": 0, "chunks": 0}
+            )
+            samples["ttft"].append(self.ttft)
+            samples["gaps"].extend(self.gaps)
+            samples["streams"] += 1
+            samples["chunks"] += len(self.gaps) + 1
+        logger.debug(
+            "Stream (%s): ttft=%.0fms chunks=%d total=%.0fms",
+            self.backend, 1000 * self.ttft, len(self.gaps) + 1, 1000 * (self.last - self.start),
+        )
+
+
+_stream_samples = {}  # backend -> recent TTFT / inter-chunk samples
+_stream_lock = threading.Lock()
+# "streams:<reason>", "wasted_tokens" (estimated output of cancelled streams), "stuck_processes"
+_cancel_stats = Counter()
+
+
+def _record_cancel(reason, generated):
+    with _stream_lock:
+        _cancel_stats[f"streams:{reason}"] += 1
+        _cancel_stats["wasted_tokens"] += prompts.estimate_tokens(generated) if generated else 0
+    logger.info("Stream cancelled (%s) after %d chars", reason, len(generated))
+
+
+def _count_stuck(killed):
+    if killed:
+        with _stream_lock:
+            _cancel_stats["stuck_processes"] += 1
+        logger.warning("Cancelled CLI process ignored SIGTERM and was killed")
+
+
+def _percentile_ms(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(1000 * values[min(len(values) - 1, len(values) * pct // 100)])
+
+
 def _messages_to_prompt(messages: list[dict]) -> str:
     """Convert a message list to a single prompt string for the CLI."""
     if len(messages) == 1:
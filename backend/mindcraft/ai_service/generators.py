@@ -2,49 +2,27 @@
 
 import json
 from django.conf import settings
-from . import client, prompts
+from . import cache, client, prompts
 
 
-def generate_lesson(
-    topic: str,
-    grade_level: int,
-    difficulty: str = "medium",
-    additional_context: str = "",
-) -> dict:
-    """Generate a lesson using AI.
+def _parse_json(response: str):
+    """Parse JSON from a model response (handles markdown code blocks)."""
+    json_str = response.strip()
+    if json_str.startswith("```"):
+        json_str = "\n".join(json_str.split("\n")[1:-1])
+    return json.loads(json_str)
 
-    Returns:
-        {"title": str, "content": str, "description": str, "estimated_minutes": int}
-    """
-    user_message = f"""Create a lesson about: {topic}
+
+def _lesson_message(topic: str, grade_level: int, difficulty: str, additional_context: str = "") -> str:
+    return f"""Create a lesson about: {topic}
 Grade level: {grade_level}
 Difficulty: {difficulty}
 {f"Additional context: {additional_context}" if additional_context else ""}
 
 Make it engaging, fun, and appropriate for this grade level."""
 
-    content = client.chat_completion(
-        messages=[{"role": "user", "content": user_message}],
-        system=prompts.LESSON_GENERATOR_PROMPT,
-        model=settings.AI_MODEL,
-    )
 
-    # Extract title from first markdown heading
-    title = topic
-    for line in content.split("\n"):
-        if line.startswith("# "):
-            title = line.lstrip("# ").strip()
-            break
-
-    return {
-        "title": title,
-        "content": content,
-        "description": f"AI-generated lesson about {topic} for grade {grade_level}",
-        "estimated_minutes": 15 if difficulty == "easy" else 20 if difficulty == "medium" else 25,
-    }
-
-
-def generate_lesson_from_research(
+def _research_lesson_message(
     topic: str,
     grade_level: int,
     difficulty: str = "medium",
@@ -53,12 +31,7 @@ def generate_lesson_from_research(
     citations: list[dict] | None = None,
     media_resources: list[dict] | None = None,
     parent_notes: str = "",
-) -> dict:
-    """Generate a lesson using research findings.
-
-    Returns:
-        {"title": str, "content": str, "description": str, "estimated_minutes": int}
-    """
+) -> str:
     facts_text = "\n".join(f"- {fact}" for fact in (key_facts or []))
 
     citations_text = ""
@@ -75,7 +48,7 @@ def generate_lesson_from_research(
             for r in media_resources
         )
 
-    user_message = f"""Create a research-backed lesson about: {topic}
+    return f"""Create a research-backed lesson about: {topic}
 Grade level: {grade_level}
 Difficulty: {difficulty}
 
@@ -94,33 +67,109 @@ CITATIONS:
 
 Make it engaging, accurate, and appropriate for grade {grade_level}. Cite sources using [Source N] notation."""
 
-    content = client.chat_completion(
-        messages=[{"role": "user", "content": user_message}],
-        system=prompts.RESEARCH_LESSON_GENERATOR_PROMPT,
-        model=settings.AI_MODEL,
-    )
 
+def lesson_result(content: str, topic: str, grade_level: int, difficulty: str, research: bool = False) -> dict:
+    """Build the lesson dict from generated Markdown (title from the first heading)."""
     title = topic
     for line in content.split("\n"):
         if line.startswith("# "):
             title = line.lstrip("# ").strip()
             break
 
+    kind = "Research-backed" if research else "AI-generated"
     return {
         "title": title,
         "content": content,
-        "description": f"Research-backed lesson about {topic} for grade {grade_level}",
+        "description": f"{kind} lesson about {topic} for grade {grade_level}",
         "estimated_minutes": 15 if difficulty == "easy" else 20 if difficulty == "medium" else 25,
     }
 
 
+def generate_lesson(
+    topic: str,
+    grade_level: int,
+    difficulty: str = "medium",
+    additional_context: str = "",
+) -> dict:
+    """Generate a lesson using AI.
+
+    Returns:
+        {"title": str, "content": str, "description": str, "estimated_minutes": int}
+    """
+    content = client.chat_completion(
+        messages=[{"role": "user", "content": _lesson_message(topic, grade_level, difficulty, additional_context)}],
+        system=prompts.cached_system(prompts.LESSON_GENERATOR_PROMPT, model=settings.AI_MODEL),
+        model=settings.AI_MODEL,
+    )
+    return lesson_result(content, topic, grade_level, difficulty)
+
+
+def stream_lesson(topic: str, grade_level: int, difficulty: str = "medium", additional_context: str = ""):
+    """Streaming variant of generate_lesson: yields Markdown chunks (finish with lesson_result)."""
+    return client.chat_completion_stream(
+        messages=[{"role": "user", "content": _lesson_message(topic, grade_level, difficulty, additional_context)}],
+        system=prompts.cached_system(prompts.LESSON_GENERATOR_PROMPT, model=settings.AI_MODEL),
+        model=settings.AI_MODEL,
+        workload="generation",
+    )
+
+
+def generate_lesson_from_research(
+    topic: str,
+    grade_level: int,
+    difficulty: str = "medium",
+    research_summary: str = "",
+    key_facts: list[str] | None = None,
+    citations: list[dict] | None = None,
+    media_resources: list[dict] | None = None,
+    parent_notes: str = "",
+) -> dict:
+    """Generate a lesson using research findings.
+
+    Returns:
+        {"title": str, "content": str, "description": str, "estimated_minutes": int}
+    """
+    content = client.chat_completion(
+        messages=[{"role": "user", "content": _research_lesson_message(
+            topic, grade_level, difficulty, research_summary, key_facts, citations, media_resources, parent_notes,
+        )}],
+        system=prompts.cached_system(prompts.RESEARCH_LESSON_GENERATOR_PROMPT, model=settings.AI_MODEL),
+        model=settings.AI_MODEL,
+    )
+    return lesson_result(content, topic, grade_level, difficulty, research=True)
+
+
+def stream_lesson_from_research(
+    topic: str,
+    grade_level: int,
+    difficulty: str = "medium",
+    research_summary: str = "",
+    key_facts: list[str] | None = None,
+    citations: list[dict] | None = None,
+    media_resources: list[dict] | None = None,
+    parent_notes: str = "",
+):
+    """Streaming variant of generate_lesson_from_research (finish with lesson_result(research=True))."""
+    return client.chat_completion_stream(
+        messages=[{"role": "user", "content": _research_lesson_message(
+            topic, grade_level, difficulty, research_summary, key_facts, citations, media_resources, parent_notes,
+        )}],
+        system=prompts.cached_system(prompts.RESEARCH_LESSON_GENERATOR_PROMPT, model=settings.AI_MODEL),
+        model=settings.AI_MODEL,
+        workload="generation",
+    )
+
+
 def generate_quiz(
     lesson_content: str,
     num_questions: int = 5,
     grade_level: int = 5,
+    refresh: bool = False,
 ) -> dict:
     """Generate a quiz from lesson content.
 
+    Identical requests are served from the response cache unless refresh=True.
+
     Returns:
         Parsed JSON with quiz structure
     """
@@ -132,19 +181,15 @@ LESSON CONTENT:
 
 Remember to respond with ONLY valid JSON."""
 
-    response = client.chat_completion(
+    return cache.cached_completion(
+        "generate_quiz",
         messages=[{"role": "user", "content": user_message}],
         system=prompts.QUIZ_GENERATOR_PROMPT,
         model=settings.AI_MODEL,
+        refresh=refresh,
+        parse=_parse_json,
     )
 
-    # Parse JSON from response (handle markdown code blocks)
-    json_str = response.strip()
-    if json_str.startswith("```"):
-        json_str = "\n".join(json_str.split("\n")[1:-1])
-
-    return json.loads(json_str)
-
 
 def generate_feedback(
     journal_content: str,
@@ -167,6 +212,7 @@ Please give them warm, encouraging feedback."""
         messages=[{"role": "user", "content": user_message}],
         system=prompts.FEEDBACK_PROMPT,
         model=settings.AI_MODEL_CHAT,
+        workload="hint",
     )
 
 
@@ -174,25 +220,31 @@ def generate_hint(
     question_text: str,
     choices: list[str],
     attempt_number: int = 1,
+    refresh: bool = False,
 ) -> str:
-    """Generate a progressive hint for a quiz question."""
+    """Generate a progressive hint for a quiz question (cached per hint level)."""
     user_message = f"""Question: {question_text}
 Options: {', '.join(choices)}
 Hint level: {min(attempt_number, 3)} out of 3
 
 Give a hint appropriate for this level."""
 
-    return client.chat_completion(
+    return cache.cached_completion(
+        "generate_hint",
         messages=[{"role": "user", "content": user_message}],
         system=prompts.HINT_PROMPT,
         model=settings.AI_MODEL_CHAT,
         max_tokens=200,
+        refresh=refresh,
+        workload="hint",
     )
 
 
 def generate_math_problem(topic: str, grade_level: int) -> dict:
     """Generate a math problem using AI.
 
+    Not cached: every practice session and "Try another" should get a new problem.
+
     Returns:
         {"problem_text": str, "difficulty": str, "hint": str}
     """
@@ -205,14 +257,9 @@ Remember to respond with ONLY valid JSON."""
         messages=[{"role": "user", "content": user_message}],
         system=prompts.MATH_PROBLEM_PROMPT,
         model=settings.AI_MODEL,
+        workload="hint",
     )
-
-    # Parse JSON from response (handle markdown code blocks)
-    json_str = response.strip()
-    if json_str.startswith("```"):
-        json_str = "\n".join(json_str.split("\n")[1:-1])
-
-    return json.loads(json_str)
+    return _parse_json(response)
 
 
 def generate_curriculum_outline(
@@ -221,9 +268,12 @@ def generate_curriculum_outline(
     duration_weeks: int = 2,
     lessons_per_week: int = 2,
     difficulty: str = "medium",
+    refresh: bool = False,
 ) -> dict:
     """Generate a curriculum outline (week-by-week plan).
 
+    Identical requests are served from the response cache unless refresh=True.
+
     Returns:
         Parsed JSON with curriculum structure including weeks and lessons.
     """
@@ -236,21 +286,17 @@ Total lessons: {duration_weeks * lessons_per_week}
 Create a structured, progressive learning plan that builds knowledge week by week.
 Remember to respond with ONLY valid JSON."""
 
-    response = client.chat_completion(
+    return cache.cached_completion(
+        "generate_curriculum_outline",
         messages=[{"role": "user", "content": user_message}],
         system=prompts.CURRICULUM_OUTLINE_PROMPT,
         model=settings.AI_MODEL,
+        refresh=refresh,
+        parse=_parse_json,
     )
 
-    # Parse JSON from response (handle markdown code blocks)
-    json_str = response.strip()
-    if json_str.startswith("```"):
-        json_str = "\n".join(json_str.split("\n")[1:-1])
-
-    return json.loads(json_str)
 
-
-def generate_curriculum_lesson(
+def curriculum_lesson_message(
     concept: str,
     grade_level: int,
     difficulty: str,
@@ -261,18 +307,11 @@ def generate_curriculum_lesson(
     lesson_description: str = "",
     previous_lessons_context: str = "",
     upcoming_lesson_title: str = "",
-) -> dict:
-    """Generate a single lesson within a curriculum context.
-
-    The lesson is aware of its position in the curriculum and connects to
-    previous and upcoming lessons.
-
-    Returns:
-        {"title": str, "content": str, "description": str, "estimated_minutes": int}
-    """
+) -> str:
+    """Build the user message for generate_curriculum_lesson."""
     objectives_text = "\n".join(f"- {obj}" for obj in learning_objectives)
 
-    user_message = f"""Create a lesson for a multi-week curriculum about: {concept}
+    return f"""Create a lesson for a multi-week curriculum about: {concept}
 
 CURRICULUM POSITION:
 - Week {week_number}, Lesson {lesson_number}
@@ -291,9 +330,35 @@ LESSON DETAILS:
 
 Make it engaging, build on what came before, and set up what comes next. Appropriate for grade {grade_level}."""
 
+
+def generate_curriculum_lesson(
+    concept: str,
+    grade_level: int,
+    difficulty: str,
+    week_number: int,
+    lesson_number: int,
+    lesson_title: str,
+    learning_objectives: list[str],
+    lesson_description: str = "",
+    previous_lessons_context: str = "",
+    upcoming_lesson_title: str = "",
+) -> dict:
+    """Generate a single lesson within a curriculum context.
+
+    The lesson is aware of its position in the curriculum and connects to
+    previous and upcoming lessons.
+
+    Returns:
+        {"title": str, "content": str, "description": str, "estimated_minutes": int}
+    """
+    user_message = curriculum_lesson_message(
+        concept, grade_level, difficulty, week_number, lesson_number, lesson_title,
+        learning_objectives, lesson_description, previous_lessons_context, upcoming_lesson_title,
+    )
+
     content = client.chat_completion(
         messages=[{"role": "user", "content": user_message}],
-        system=prompts.CURRICULUM_LESSON_PROMPT,
+        system=prompts.cached_system(prompts.CURRICULUM_LESSON_PROMPT, model=settings.AI_MODEL),
         model=settings.AI_MODEL,
     )
 
@@ -312,9 +377,11 @@ Make it engaging, build on what came before, and set up what comes next. Appropr
     }
 
 
-def suggest_topics(subject_name: str, subject_description: str = "") -> list[dict]:
+def suggest_topics(subject_name: str, subject_description: str = "", refresh: bool = False) -> list[dict]:
     """Suggest topics for a subject using AI.
 
+    Identical requests are served from the response cache unless refresh=True.
+
     Returns:
         List of {"name": str, "description": str, "grade_level_min": int, "grade_level_max": int}
     """
@@ -325,15 +392,12 @@ Subject: {subject_name}
 
 Remember to respond with ONLY valid JSON."""
 
-    response = client.chat_completion(
+    data = cache.cached_completion(
+        "suggest_topics",
         messages=[{"role": "user", "content": user_message}],
         system=prompts.TOPIC_SUGGESTIONS_PROMPT,
         model=settings.AI_MODEL,
+        refresh=refresh,
+        parse=_parse_json,
     )
-
-    json_str = response.strip()
-    if json_str.startswith("```"):
-        json_str = "\n".join(json_str.split("\n")[1:-1])
-
-    data = json.loads(json_str)
     return data.get("topics", [])
@@ -1,15 +1,50 @@
 """System prompts for different AI contexts in Learning Monk."""
 
+from django.conf import settings
 
-def tutor_system_prompt(kid_name: str, grade_level: int, age: int | None = None) -> str:
-    """System prompt for the AI chat tutor."""
-    age_str = f"They are {age} years old." if age else ""
-    return f"""You are Learning Monk Tutor, a friendly and encouraging AI learning assistant for kids.
 
-You are currently helping {kid_name}, who is in grade {grade_level}. {age_str}
+# Shortest prefix Anthropic will cache, per model (prompt caching docs); first match wins
+MIN_CACHE_TOKENS = (("haiku-4-5", 4096), ("opus-4-5", 4096), ("haiku", 2048))
+DEFAULT_MIN_CACHE_TOKENS = 1024
 
-IMPORTANT RULES:
-- Use age-appropriate language for a grade {grade_level} student
+
+def min_cache_tokens(model: str | None = None) -> int:
+    """Minimum cacheable prompt length for `model` (defaults to AI_MODEL)."""
+    model = model or settings.AI_MODEL
+    for name, tokens in MIN_CACHE_TOKENS:
+        if name in model:
+            return tokens
+    return DEFAULT_MIN_CACHE_TOKENS
+
+
+def cached_system(stable: str, variable: str = "", model: str | None = None) -> str | list[dict]:
+    """Build structured system blocks with a prompt-cache breakpoint.
+
+    `stable` must be identical across calls (it is cached by the API);
+    `variable` holds per-request details and goes after the breakpoint so it
+    never invalidates the cached prefix.
+
+    The API only caches a prefix of at least min_cache_tokens(model) tokens
+    (1024 on Sonnet, 2048 on Haiku 3.x, 4096 on Haiku 4.5 and Opus 4.5);
+    below that a breakpoint only adds noise, so a plain string is returned.
+    """
+    if estimate_tokens(stable) < min_cache_tokens(model):
+        return "\n\n".join(part for part in (stable, variable) if part)
+    blocks = [{"type": "text", "text": stable, "cache_control": {"type": "ephemeral"}}]
+    if variable:
+        blocks.append({"type": "text", "text": variable})
+    return blocks
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+TUTOR_INTRO = "You are Learning Monk Tutor, a friendly and encouraging AI learning assistant for kids."
+
+TUTOR_RULES = """IMPORTANT RULES:
+- Use age-appropriate language for the student's grade level
 - Be encouraging, patient, and positive
 - Use simple explanations with real-world examples kids can relate to
 - If they don't understand something, try explaining it a different way
@@ -24,20 +59,43 @@ IMPORTANT RULES:
 - If they ask you to do their homework, help them understand the concept instead"""
 
 
-def lesson_system_prompt(kid_name: str, grade_level: int, context: str = "") -> str:
-    """System prompt for lesson-context chat."""
-    base = tutor_system_prompt(kid_name, grade_level)
-    if context:
-        return f"""{base}
+def tutor_system_prompt(kid_name: str, grade_level: int, age: int | None = None) -> str:
+    """System prompt for the AI chat tutor."""
+    age_str = f"They are {age} years old." if age else ""
+    return f"""{TUTOR_INTRO}
+
+You are currently helping {kid_name}, who is in grade {grade_level}. {age_str}
+
+{TUTOR_RULES}"""
+
+
+def lesson_system_prompt(
+    kid_name: str, grade_level: int, context: str = "", title: str = "", model: str | None = None,
+) -> str | list[dict]:
+    """System prompt for lesson-context chat.
+
+    With lesson context this is built with cached_system: the tutor rules and lesson
+    title are the same for every kid and every turn, so they come first and
+    are cached; the kid-specific line and the lesson sections picked for this
+    question follow the cache breakpoint.
+    """
+    if not context:
+        return tutor_system_prompt(kid_name, grade_level)
+    lesson = f' "{title}"' if title else ""
+    stable = f"""{TUTOR_INTRO}
+
+{TUTOR_RULES}
 
 CURRENT LESSON CONTEXT:
-{kid_name} is currently studying the following lesson. Help them understand this material.
-Keep your answers focused on this topic.
+The student is currently studying the lesson{lesson}. Help them understand this material.
+Keep your answers focused on this topic."""
+    variable = f"""You are currently helping {kid_name}, who is in grade {grade_level}.
 
+Parts of the lesson relevant to their question:
 ---
 {context}
 ---"""
-    return base
+    return cached_system(stable, variable, model or settings.AI_MODEL_CHAT)
 
 
 LESSON_GENERATOR_PROMPT = """You are Learning Monk Content Creator, an expert educational content writer.
@@ -162,6 +220,22 @@ RULES:
 - End with encouragement"""
 
 
+CHAT_SUMMARY_PROMPT = """You are Learning Monk Note Taker. You keep a running summary of a tutoring chat between a kid and their AI tutor.
+
+RULES:
+- Merge the new conversation turns into the existing summary
+- Keep what the tutor needs to continue: topics covered, what the kid understood, misconceptions, open questions, and anything the kid shared about themselves
+- Write in third person, in short plain sentences
+- Stay under 200 words; drop details that no longer matter
+- Respond with ONLY the updated summary"""
+
+
+def chat_summary_note(summary: str) -> str:
+    """System prompt addition carrying the rolling summary of older turns."""
+    return f"""EARLIER IN THIS CONVERSATION (summary of older messages):
+{summary}"""
+
+
 HINT_PROMPT = """You are Learning Monk Hint Helper. Give a progressive hint for a quiz question.
 
 RULES:
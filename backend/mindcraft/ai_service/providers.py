@@ -0,0 +1,198 @@
+"""Process-wide SDK clients for Anthropic, OpenAI and Perplexity.
+
+Each provider client is built once per process and shared, so requests reuse
+keep-alive HTTP connections instead of paying for a new TLS handshake and
+connection pool every call. A client is rebuilt when its credentials change
+and all clients are closed at interpreter exit.
+
+Connection pool limits and timeouts come from settings:
+    AI_HTTP_MAX_CONNECTIONS, AI_HTTP_MAX_KEEPALIVE, AI_HTTP_KEEPALIVE_EXPIRY,
+    AI_HTTP_TIMEOUT, AI_HTTP_CONNECT_TIMEOUT
+"""
+
+import asyncio
+import atexit
+import hashlib
+import logging
+import threading
+import weakref
+from collections import Counter
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+
+_clients = {}  # provider -> (credentials fingerprint, SDK client)
+# Async clients hold loop-bound connection pools, so they are cached per event loop
+_async_clients = weakref.WeakKeyDictionary()  # loop -> (fingerprint, client)
+_lock = threading.Lock()
+_stats = Counter()
+# Counters are bumped from every thread sharing the clients (httpx hooks run on the request's thread)
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+class _ConnectionTracker:
+    """httpx event hooks that count requests and whether each reused a connection."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._seen = weakref.WeakSet()
+
+    def on_request(self, request):
+        _count(f"{self.provider}.requests")
+
+    def on_response(self, response):
+        stream = response.extensions.get("network_stream")
+        if stream is None:
+            return
+        with _stats_lock:
+            if stream in self._seen:
+                _stats[f"{self.provider}.connections_reused"] += 1
+            else:
+                self._seen.add(stream)
+                _stats[f"{self.provider}.connections_opened"] += 1
+
+    def event_hooks(self, is_async=False):
+        if not is_async:
+            return {"request": [self.on_request], "response": [self.on_response]}
+
+        async def on_request(request):
+            self.on_request(request)
+
+        async def on_response(response):
+            self.on_response(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+
+def _http_client(provider, client_cls, is_async=False):
+    """Build a keep-alive HTTP client with the configured pool limits."""
+    tracker = _ConnectionTracker(provider)
+    return client_cls(
+        limits=httpx.Limits(
+            max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.AI_HTTP_TIMEOUT, connect=settings.AI_HTTP_CONNECT_TIMEOUT),
+        event_hooks=tracker.event_hooks(is_async),
+    )
+
+
+def _fingerprint(*parts):
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def _get(provider, fingerprint, factory):
+    """Return the cached client for `provider`, rebuilding it if credentials changed."""
+    stale = None
+    with _lock:
+        entry = _clients.get(provider)
+        if entry and entry[0] == fingerprint:
+            _count(f"{provider}.client_reuses")
+            return entry[1]
+        if entry:
+            stale = entry[1]
+            logger.info("Credentials changed for %s — rebuilding client", provider)
+        client = factory()
+        _clients[provider] = (fingerprint, client)
+        _count(f"{provider}.clients_created")
+    if stale is not None:
+        stale.close()
+    return client
+
+
+def get_anthropic(api_key: str):
+    """Shared `anthropic.Anthropic` client for the given key."""
+    import anthropic
+
+    return _get(
+        "anthropic",
+        _fingerprint(api_key),
+        lambda: anthropic.Anthropic(
+            api_key=api_key,
+            http_client=_http_client("anthropic", anthropic.DefaultHttpxClient),
+        ),
+    )
+
+
+def get_async_anthropic(api_key: str):
+    """Shared `anthropic.AsyncAnthropic` client for the running event loop."""
+    import anthropic
+
+    loop = asyncio.get_running_loop()
+    fingerprint = _fingerprint(api_key)
+    with _lock:
+        entry = _async_clients.get(loop)
+        if entry and entry[0] == fingerprint:
+            _count("anthropic_async.client_reuses")
+            return entry[1]
+        client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            http_client=_http_client("anthropic_async", anthropic.DefaultAsyncHttpxClient, is_async=True),
+        )
+        _async_clients[loop] = (fingerprint, client)
+        _count("anthropic_async.clients_created")
+    if entry:
+        loop.create_task(entry[1].close())
+    return client
+
+
+def get_openai():
+    """Shared OpenAI client (math answer evaluation)."""
+    import openai
+
+    api_key = settings.OPENAI_API_KEY
+    return _get(
+        "openai",
+        _fingerprint(api_key),
+        lambda: openai.OpenAI(
+            api_key=api_key,
+            http_client=_http_client("openai", openai.DefaultHttpxClient),
+        ),
+    )
+
+
+def get_perplexity():
+    """Shared OpenAI-compatible client pointed at Perplexity."""
+    import openai
+
+    api_key = settings.PERPLEXITY_API_KEY
+    return _get(
+        "perplexity",
+        _fingerprint(api_key, PERPLEXITY_BASE_URL),
+        lambda: openai.OpenAI(
+            api_key=api_key,
+            base_url=PERPLEXITY_BASE_URL,
+            http_client=_http_client("perplexity", openai.DefaultHttpxClient),
+        ),
+    )
+
+
+def stats() -> dict:
+    """Client creation/reuse and HTTP connection reuse counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def shutdown():
+    """Close every cached client and its connection pool."""
+    with _lock:
+        clients = [client for _, client in _clients.values()]
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            logger.exception("Failed to close SDK client")
+
+
+atexit.register(shutdown)
@@ -0,0 +1,142 @@
+"""Record/replay backend for AI calls (AI_BACKEND="replay").
+
+Lets tests, load tests and benchmarks exercise generators, chat streaming,
+math vision evaluation and Perplexity research without live credentials.
+
+Every call site hands this module a provider name, a JSON description of the
+request and a function that performs the real call. Request/response pairs
+are stored as cassette files under AI_REPLAY_DIR/<provider>/<hash>.json;
+streamed responses keep each chunk with its offset from the start of the
+request, so replays reproduce real streaming timing.
+
+    AI_REPLAY_MODE           "replay" (cassettes only), "record" (call the
+                             real provider and save), or "auto" (replay if a
+                             cassette exists, otherwise record)
+    AI_REPLAY_UPSTREAM       real Claude backend used when recording: "cli" or "api"
+    AI_REPLAY_LATENCY_SCALE  multiplier on recorded latency (0 = instant,
+                             1 = as recorded, 2 = twice as slow)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_stats = Counter()
+
+
+class CassetteNotFound(RuntimeError):
+    """Raised in replay mode when no cassette matches the request."""
+
+
+def enabled() -> bool:
+    return settings.AI_BACKEND == "replay"
+
+
+def _path(provider: str, request: dict) -> Path:
+    payload = json.dumps({"provider": provider, **request}, sort_keys=True, ensure_ascii=False)
+    key = hashlib.sha256(payload.encode()).hexdigest()
+    return Path(settings.AI_REPLAY_DIR) / provider / f"{key}.json"
+
+
+def _load(provider, request):
+    """Return the cassette for `request`, or None if it should be recorded."""
+    path = _path(provider, request)
+    mode = settings.AI_REPLAY_MODE
+    if mode != "record" and path.exists():
+        _stats[f"{provider}.replayed"] += 1
+        return json.loads(path.read_text())
+    if mode == "replay":
+        _stats[f"{provider}.missing"] += 1
+        raise CassetteNotFound(f"No {provider} cassette for this request ({path.name}) — record it first")
+    return None
+
+
+def _save(provider, request, **recorded):
+    path = _path(provider, request)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cassette = {"provider": provider, "request": request, "recorded_at": time.time(), **recorded}
+    # Write-then-rename so a concurrent replay never reads a half-written file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(cassette, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    _stats[f"{provider}.recorded"] += 1
+    logger.info("Recorded %s cassette %s", provider, path.name)
+
+
+def _delay(seconds):
+    return max(0.0, seconds) * settings.AI_REPLAY_LATENCY_SCALE
+
+
+def completion(provider: str, request: dict, call):
+    """Replay or record one non-streaming call.
+
+    Args:
+        provider: "anthropic", "openai" or "perplexity"
+        request: JSON-serializable description of the request (the cassette key)
+        call: Performs the real request and returns a JSON-serializable response
+    """
+    cassette = _load(provider, request)
+    if cassette is not None:
+        time.sleep(_delay(cassette["latency"]))
+        return cassette["response"]
+
+    start = time.monotonic()
+    response = call()
+    _save(provider, request, response=response, latency=time.monotonic() - start)
+    return response
+
+
+def stream(provider: str, request: dict, call):
+    """Replay or record a text stream; `call` returns the real chunk iterator."""
+    request = {**request, "stream": True}
+    cassette = _load(provider, request)
+    if cassette is not None:
+        elapsed = 0.0
+        for offset, text in cassette["chunks"]:
+            time.sleep(_delay(offset - elapsed))
+            elapsed = offset
+            yield text
+        return
+
+    start = time.monotonic()
+    chunks = []
+    for text in call():
+        chunks.append((time.monotonic() - start, text))
+        yield text
+    _save(provider, request, chunks=chunks, latency=time.monotonic() - start)
+
+
+async def astream(provider: str, request: dict, call):
+    """Async variant of stream(); `call` returns the real async chunk iterator."""
+    request = {**request, "stream": True}
+    cassette = _load(provider, request)
+    if cassette is not None:
+        elapsed = 0.0
+        for offset, text in cassette["chunks"]:
+            await asyncio.sleep(_delay(offset - elapsed))
+            elapsed = offset
+            yield text
+        return
+
+    start = time.monotonic()
+    chunks = []
+    async for text in call():
+        chunks.append((time.monotonic() - start, text))
+        yield text
+    _save(provider, request, chunks=chunks, latency=time.monotonic() - start)
+
+
+def stats() -> dict:
+    """Replayed / recorded / missing cassette counts per provider."""
+    return dict(_stats)
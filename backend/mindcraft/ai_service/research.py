@@ -4,23 +4,75 @@ import re
 from openai import OpenAI
 from django.conf import settings
 
+from . import providers, replay, scheduler
+
 
 def _get_perplexity_client() -> OpenAI:
-    return OpenAI(
-        api_key=settings.PERPLEXITY_API_KEY,
-        base_url="https://api.perplexity.ai",
-    )
+    return providers.get_perplexity()
 
 
-def research_topic(topic: str, grade_level: int, subject: str) -> dict:
-    """Research a topic using Perplexity Sonar API.
+def _sonar_chat(system_prompt: str, user_message: str) -> dict:
+    """Run one Sonar request (replayed from a cassette when AI_BACKEND=replay).
 
     Returns:
-        {"summary": str, "key_facts": list[str], "citations": list[dict], "raw_response": dict}
+        {"content": str, "citations": list[str]}
     """
-    client = _get_perplexity_client()
-
-    system_prompt = f"""You are an educational research assistant. Research the following topic
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message},
+    ]
+
+    def call():
+        response = _get_perplexity_client().chat.completions.create(
+            model=settings.PERPLEXITY_MODEL,
+            messages=messages,
+        )
+        return {
+            "content": response.choices[0].message.content or "",
+            "citations": list(getattr(response, "citations", None) or []),
+        }
+
+    with scheduler.slot("research"):
+        if replay.enabled():
+            return replay.completion("perplexity", {"model": settings.PERPLEXITY_MODEL, "messages": messages}, call)
+        return call()
+
+
+def _sonar_stream(system_prompt: str, user_message: str):
+    """Stream one Sonar request, yielding {"text": str, "citations": list[str]} deltas.
+
+    Citations ride along on the chunks (Perplexity repeats them), so they are
+    kept in replayed cassettes too.
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message},
+    ]
+
+    def call():
+        stream = _get_perplexity_client().chat.completions.create(
+            model=settings.PERPLEXITY_MODEL,
+            messages=messages,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else ""
+                citations = list(getattr(chunk, "citations", None) or [])
+                if text or citations:
+                    yield {"text": text or "", "citations": citations}
+        finally:
+            stream.close()
+
+    with scheduler.slot("research"):
+        if replay.enabled():
+            yield from replay.stream("perplexity", {"model": settings.PERPLEXITY_MODEL, "messages": messages}, call)
+        else:
+            yield from call()
+
+
+def _research_prompt(grade_level: int, subject: str) -> str:
+    return f"""You are an educational research assistant. Research the following topic
 for a grade {grade_level} student studying {subject}.
 
 Provide your response in this exact format:
@@ -38,21 +90,13 @@ Provide your response in this exact format:
 
 Focus on accuracy, educational value, and age-appropriateness for grade {grade_level}."""
 
-    response = client.chat.completions.create(
-        model=settings.PERPLEXITY_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Research this topic thoroughly: {topic}"},
-        ],
-    )
-
-    content = response.choices[0].message.content or ""
 
+def parse_research(content: str, citation_urls: list[str]) -> dict:
+    """Turn Sonar research text into the research_topic() result."""
     # Extract citations from Perplexity response
     citations = []
-    if hasattr(response, "citations") and response.citations:
-        for i, url in enumerate(response.citations):
-            citations.append({"url": url, "title": f"Source {i + 1}", "snippet": ""})
+    for i, url in enumerate(citation_urls):
+        citations.append({"url": url, "title": f"Source {i + 1}", "snippet": ""})
 
     # Parse summary and key facts from response
     summary = ""
@@ -87,14 +131,35 @@ Focus on accuracy, educational value, and age-appropriateness for grade {grade_l
     }
 
 
+def research_topic(topic: str, grade_level: int, subject: str) -> dict:
+    """Research a topic using Perplexity Sonar API.
+
+    Returns:
+        {"summary": str, "key_facts": list[str], "citations": list[dict], "raw_response": dict}
+    """
+    response = _sonar_chat(_research_prompt(grade_level, subject), f"Research this topic thoroughly: {topic}")
+    return parse_research(response["content"], response["citations"])
+
+
+def research_topic_stream(topic: str, grade_level: int, subject: str, citations: list):
+    """Stream research text as it is produced.
+
+    Yields text chunks; `citations` is filled with the source URLs as they
+    arrive. Pass the full text and `citations` to parse_research() at the end.
+    """
+    for delta in _sonar_stream(_research_prompt(grade_level, subject), f"Research this topic thoroughly: {topic}"):
+        if delta["citations"]:
+            citations[:] = delta["citations"]
+        if delta["text"]:
+            yield delta["text"]
+
+
 def discover_multimedia(topic: str, grade_level: int, subject: str) -> list[dict]:
     """Discover educational multimedia resources for a topic.
 
     Returns:
         list of {"url": str, "title": str, "description": str, "media_type": str, "thumbnail_url": str}
     """
-    client = _get_perplexity_client()
-
     system_prompt = f"""Find educational video and interactive resources for a grade {grade_level}
 student learning about the following topic in {subject}.
 
@@ -108,15 +173,7 @@ Find 3-6 high-quality, age-appropriate resources. Prioritize:
 2. YouTube educational videos (from channels like CrashCourse, SciShow, TED-Ed, etc.)
 3. Interactive simulations (PhET, etc.)"""
 
-    response = client.chat.completions.create(
-        model=settings.PERPLEXITY_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Find educational resources for: {topic}"},
-        ],
-    )
-
-    content = response.choices[0].message.content or ""
+    content = _sonar_chat(system_prompt, f"Find educational resources for: {topic}")["content"]
     resources = []
 
     type_map = {
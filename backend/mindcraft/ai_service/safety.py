@@ -1,8 +1,6 @@
 """Safety and filtering layer for AI responses."""
 
-from datetime import date
-from django.utils import timezone
-from mindcraft.chat.models import ChatMessage
+from mindcraft.chat import quota
 
 
 # Topics that should be blocked or redirected
@@ -20,20 +18,24 @@ BLOCKED_TOPICS = [
 
 
 def check_rate_limit(kid_profile) -> tuple[bool, str]:
-    """Check if kid has exceeded their daily chat limit.
+    """Check if kid has exceeded their daily chat limit or token budget.
 
     Returns:
         (is_allowed, message)
     """
-    today = timezone.now().date()
-    message_count = ChatMessage.objects.filter(
-        session__kid=kid_profile,
-        role=ChatMessage.Role.USER,
-        created_at__date=today,
-    ).count()
+    return _rate_limit_result(kid_profile, *quota.usage(kid_profile.id))
 
+
+async def acheck_rate_limit(kid_profile) -> tuple[bool, str]:
+    """Async variant of check_rate_limit."""
+    return _rate_limit_result(kid_profile, *await quota.ausage(kid_profile.id))
+
+
+def _rate_limit_result(kid_profile, message_count, token_count):
     if message_count >= kid_profile.daily_chat_limit:
         return False, f"You've reached your daily chat limit of {kid_profile.daily_chat_limit} messages. Come back tomorrow! 🌅"
+    if kid_profile.daily_token_limit and token_count >= kid_profile.daily_token_limit:
+        return False, "You've done a lot of chatting today! Come back tomorrow! 🌅"
 
     remaining = kid_profile.daily_chat_limit - message_count
     return True, f"{remaining} messages remaining today"
@@ -0,0 +1,337 @@
+"""Admission control and priority scheduling for AI calls.
+
+Every model call runs inside a slot for its workload class:
+
+    chat        tutor chat streams (interactive)
+    hint        short kid-facing generations: hints, practice problems,
+                journal feedback (interactive)
+    generation  lessons, quizzes, curriculum outlines and builds (batch)
+    research    Perplexity research and media discovery (batch)
+    vision      OpenAI evaluation of drawn math answers (interactive)
+
+Each class has its own concurrency limit and bounded FIFO queue. chat, hint
+and generation also share the Claude backend (CLI pool or API rate limit),
+capped at AI_SCHEDULER_CAPACITY. Interactive classes have strict priority on
+that shared capacity: batch work is not started while interactive requests
+are queued, and AI_SCHEDULER_INTERACTIVE_RESERVE slots are kept free for
+interactive traffic, so a kid's chat never waits behind a 10-lesson
+curriculum build.
+
+A class configured with "hold": "admission" (chat) only holds its slot until
+the upstream has admitted a streamed call, i.e. the first chunk arrives
+(see client.chat_completion_stream): the slot gates how many chat replies
+start at once, not how many stay open, so an ASGI process can hold many chat
+streams and one long reply never keeps other kids' chats waiting. On the
+CLI backend the worker pool bounds the processes open streams keep busy.
+Other classes hold their slot for the whole call.
+
+slot() is for threads; aslot() waits on the event loop without holding a
+thread.
+
+A request that finds its queue full, or waits past the class timeout, fails
+fast with AIBusy (HTTP 429 for interactive classes, 503 for batch).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+class AIBusy(RuntimeError):
+    """Raised when a workload class is saturated and the request is rejected."""
+
+    def __init__(self, workload, message, retry_after, interactive):
+        super().__init__(message)
+        self.workload = workload
+        self.retry_after = retry_after
+        self.status_code = 429 if interactive else 503
+
+
+class _Workload:
+    def __init__(self, name, limit, queue, timeout, priority, shared, hold="call"):
+        self.name = name
+        self.limit = limit
+        self.max_queue = queue
+        self.timeout = timeout
+        self.priority = priority
+        self.shared = shared
+        self.hold = hold  # "call", or "admission": streams release at their first chunk
+        self.running = 0
+        self.waiting = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def interactive(self):
+        return self.priority == INTERACTIVE
+
+    def busy(self, reason):
+        return AIBusy(
+            self.name,
+            f"The AI is busy right now ({self.name} {reason}). Please try again in a moment.",
+            retry_after=max(1, int(self.timeout // 4)),
+            interactive=self.interactive,
+        )
+
+
+class Scheduler:
+    """Per-class slots over a shared, priority-ordered backend capacity."""
+
+    def __init__(self, capacity, interactive_reserve, workloads):
+        self.capacity = capacity
+        self.interactive_reserve = interactive_reserve
+        self._workloads = {name: _Workload(name, **spec) for name, spec in workloads.items()}
+        self._cond = threading.Condition()
+        self._shared_running = 0
+        self._wakers = set()  # aacquire() waiters on event loops
+
+    def _get(self, name):
+        try:
+            return self._workloads[name]
+        except KeyError:
+            raise ValueError(f"Unknown AI workload: {name}") from None
+
+    # -- admission -----------------------------------------------------------
+
+    def admit(self, name):
+        """Fail fast if `name` cannot even be queued (used before opening a stream)."""
+        w = self._get(name)
+        with self._cond:
+            if len(w.waiting) >= w.max_queue:
+                w.rejected += 1
+                raise w.busy("queue full")
+
+    def acquire(self, name):
+        w = self._get(name)
+        ticket = object()
+        start = time.monotonic()
+        deadline = start + w.timeout
+        with self._cond:
+            self._enqueue_locked(w, ticket)
+            try:
+                while not self._can_run_locked(w, ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timed_out_locked(w)
+                    self._cond.wait(remaining)
+                self._start_locked(w, start)
+            finally:
+                w.waiting.remove(ticket)
+                self._notify_locked()  # the queue head changed
+        self._log_wait(w, start)
+
+    async def aacquire(self, name):
+        """Async variant of acquire(): waits on the event loop instead of blocking a thread."""
+        w = self._get(name)
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        def waker():
+            loop.call_soon_threadsafe(wake.set)
+
+        ticket = object()
+        start = time.monotonic()
+        deadline = start + w.timeout
+        with self._cond:
+            self._enqueue_locked(w, ticket)
+            self._wakers.add(waker)
+        try:
+            while True:
+                with self._cond:
+                    if self._can_run_locked(w, ticket):
+                        self._start_locked(w, start)
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timed_out_locked(w)
+                    wake.clear()
+                try:
+                    await asyncio.wait_for(wake.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass  # re-checked, then raised, at the top
+        finally:
+            # Also runs if the waiting task is cancelled: the ticket never turns into a slot
+            with self._cond:
+                self._wakers.discard(waker)
+                w.waiting.remove(ticket)
+                self._notify_locked()
+        self._log_wait(w, start)
+
+    def release(self, name):
+        w = self._get(name)
+        with self._cond:
+            w.running -= 1
+            if w.shared:
+                self._shared_running -= 1
+            self._notify_locked()
+
+    def _enqueue_locked(self, w, ticket):
+        if len(w.waiting) >= w.max_queue:
+            w.rejected += 1
+            raise w.busy("queue full")
+        w.waiting.append(ticket)
+
+    def _start_locked(self, w, start):
+        w.running += 1
+        if w.shared:
+            self._shared_running += 1
+        waited = time.monotonic() - start
+        w.admitted += 1
+        w.wait_total += waited
+        w.wait_max = max(w.wait_max, waited)
+
+    def _timed_out_locked(self, w):
+        w.timed_out += 1
+        logger.warning("AI scheduler: %s request timed out after %.1fs in queue", w.name, w.timeout)
+        return w.busy("queue timeout")
+
+    def _notify_locked(self):
+        self._cond.notify_all()
+        for wake in self._wakers:
+            try:
+                wake()
+            except RuntimeError:
+                pass  # that waiter's event loop has closed
+
+    @staticmethod
+    def _log_wait(w, start):
+        waited = time.monotonic() - start
+        if waited > 1:
+            logger.info("AI scheduler: %s request waited %.1fs for a slot", w.name, waited)
+
+    def _can_run_locked(self, w, ticket):
+        if w.waiting[0] is not ticket or w.running >= w.limit:
+            return False
+        if not w.shared:
+            return True
+        free = self.capacity - self._shared_running
+        if w.interactive:
+            return free > 0
+        # Strict priority: batch waits while any interactive request could use a slot
+        interactive_waiting = any(
+            o.waiting and o.running < o.limit for o in self._workloads.values() if o.shared and o.interactive
+        )
+        return not interactive_waiting and free > self.interactive_reserve
+
+    # -- metrics -------------------------------------------------------------
+
+    def stats(self):
+        with self._cond:
+            workloads = {
+                w.name: {
+                    "priority": w.priority,
+                    "limit": w.limit,
+                    "running": w.running,
+                    "queued": len(w.waiting),
+                    "admitted": w.admitted,
+                    "rejected": w.rejected,
+                    "timed_out": w.timed_out,
+                    "avg_wait_ms": round(1000 * w.wait_total / w.admitted) if w.admitted else 0,
+                    "max_wait_ms": round(1000 * w.wait_max),
+                }
+                for w in self._workloads.values()
+            }
+            return {"capacity": self.capacity, "shared_running": self._shared_running, "workloads": workloads}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, or None if AI_SCHEDULER_ENABLED is off."""
+    global _scheduler
+    if not settings.AI_SCHEDULER_ENABLED:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler(
+                    capacity=settings.AI_SCHEDULER_CAPACITY,
+                    interactive_reserve=settings.AI_SCHEDULER_INTERACTIVE_RESERVE,
+                    workloads=settings.AI_SCHEDULER_WORKLOADS,
+                )
+    return _scheduler
+
+
+def admit(workload: str):
+    """Raise AIBusy now if `workload` is saturated."""
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        scheduler.admit(workload)
+
+
+class Slot:
+    """A held slot; released when its block ends, or earlier by admitted()."""
+
+    def __init__(self, scheduler, workload):
+        self._scheduler = scheduler
+        self._workload = workload
+
+    def admitted(self):
+        """The upstream accepted the streamed call: release now if the class only gates admission."""
+        if self._scheduler is not None and self._scheduler._get(self._workload).hold == "admission":
+            self.release()
+
+    def release(self):
+        if self._scheduler is not None:
+            scheduler, self._scheduler = self._scheduler, None
+            scheduler.release(self._workload)
+
+
+@contextmanager
+def slot(workload: str):
+    """Hold a slot for `workload` for the duration of the block (see Slot.admitted)."""
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        scheduler.acquire(workload)
+    held = Slot(scheduler, workload)
+    try:
+        yield held
+    finally:
+        held.release()
+
+
+@asynccontextmanager
+async def aslot(workload: str):
+    """Async variant of slot(); waiting for the slot does not hold a thread."""
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        await scheduler.aacquire(workload)
+    held = Slot(scheduler, workload)
+    try:
+        yield held
+    finally:
+        held.release()
+
+
+def error_response(e: Exception, message: str | None = None, status: int = 500):
+    """DRF error Response for a failed AI call.
+
+    AIBusy rejections become 429/503 with a Retry-After header; anything else
+    is reported with `message` (default str(e)) and `status`.
+    """
+    from rest_framework.response import Response
+
+    if isinstance(e, AIBusy):
+        return Response({"error": str(e)}, status=e.status_code, headers={"Retry-After": str(e.retry_after)})
+    return Response({"error": message or str(e)}, status=status)
+
+
+def stats() -> dict:
+    """Queue depth, running count and wait times per workload class."""
+    scheduler = get_scheduler()
+    return scheduler.stats() if scheduler is not None else {"enabled": False}
@@ -0,0 +1,103 @@
+"""Single-flight coalescing of identical in-flight AI requests.
+
+When several threads ask for the same completion at once (a double-clicked
+"Generate Quiz", siblings asking for the same hint), only the first one calls
+the model; the rest wait for it and share its result.
+
+file_lock() extends this across processes with a lock file per request key
+(AI_SINGLEFLIGHT_LOCK_DIR). A process that waited on the lock re-checks the
+response cache, so it picks up the result the other process just stored.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows — cross-process locking is unavailable
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}  # key -> _Call
+_lock = threading.Lock()
+_stats = Counter()
+
+
+def do(key: str, fn):
+    """Run fn() once per key at a time; concurrent callers share the outcome."""
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+            _stats["calls"] += 1
+        else:
+            _stats["coalesced"] += 1
+
+    if not leader:
+        logger.info("Coalescing duplicate AI request %s", key[:12])
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _inflight[key]
+        call.done.set()
+
+
+@contextmanager
+def file_lock(key: str):
+    """Hold an exclusive cross-process lock for `key`.
+
+    Yields True if the lock was contended (another process was working on the
+    same request), False otherwise. A no-op when AI_SINGLEFLIGHT_LOCK_DIR is
+    unset or the platform lacks fcntl.
+    """
+    lock_dir = settings.AI_SINGLEFLIGHT_LOCK_DIR
+    if not lock_dir or fcntl is None:
+        yield False
+        return
+
+    os.makedirs(lock_dir, exist_ok=True)
+    name = hashlib.sha256(key.encode()).hexdigest()[:32]
+    with open(os.path.join(lock_dir, f"{name}.lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            contended = False
+        except BlockingIOError:
+            _stats["cross_process_waits"] += 1
+            fcntl.flock(f, fcntl.LOCK_EX)
+            contended = True
+        try:
+            yield contended
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def stats() -> dict:
+    """Leader calls, coalesced waiters and cross-process lock waits."""
+    with _lock:
+        return {**dict(_stats), "in_flight": len(_inflight)}
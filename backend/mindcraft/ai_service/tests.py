@@ -0,0 +1,433 @@
+import asyncio
+import os
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from . import client, prompts, providers, scheduler, singleflight
+from .cli_pool import CLIWorkerPool
+from .client import _cli_collect_result, _worker_message
+
+# Stands in for `claude -p --input-format stream-json`: answers each stdin message with a result event
+FAKE_CLI = textwrap.dedent("""
+    import json, os, sys
+    for line in sys.stdin:
+        prompt = json.loads(line)["message"]["content"]
+        print(json.dumps({"type": "assistant", "message": {"content": [{"type": "text", "text": prompt}]}}), flush=True)
+        print(json.dumps({"type": "result", "is_error": False, "result": f"{os.getpid()}:{prompt}"}), flush=True)
+""")
+
+
+class CLIWorkerPoolTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        fd, cls.script = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as f:
+            f.write(FAKE_CLI)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.unlink(cls.script)
+        super().tearDownClass()
+
+    def make_pool(self, **kwargs):
+        options = {"size": 2, "max_requests": 5, "queue_timeout": 5, "idle_ttl": 60}
+        options.update(kwargs)
+        pool = CLIWorkerPool(
+            **options,
+            build_cmd=lambda model: [sys.executable, self.script],
+            build_env=lambda: dict(os.environ),
+        )
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def ask(self, pool, prompt, system="rules"):
+        with pool.lease("model") as worker:
+            worker.send(_worker_message(prompt, system))
+            return _cli_collect_result(worker.lines(5))
+
+    async def aask(self, pool, prompt, system="rules"):
+        async with pool.alease("model") as worker:
+            worker.send(_worker_message(prompt, system))
+            return _cli_collect_result([line async for line in worker.alines(5)])
+
+    def wait_for_idle(self, pool):
+        deadline = time.monotonic() + 5
+        while pool.stats()["idle"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pool.stats()["idle"], 1)
+        return pool._idle["model"][0].process.pid
+
+    def test_worker_is_reused_up_to_max_requests(self):
+        pool = self.make_pool(max_requests=3)
+        pids = [self.ask(pool, f"q{i}").split(":")[0] for i in range(4)]
+        self.assertEqual(len(set(pids[:3])), 1)
+        self.assertNotEqual(pids[3], pids[0])
+
+    def test_reused_worker_answers_the_new_prompt(self):
+        pool = self.make_pool()
+        self.assertTrue(self.ask(pool, "first").endswith("first"))
+        self.assertTrue(self.ask(pool, "second").endswith("second"))
+        self.assertEqual(pool.stats()["live"], 1)
+
+    def test_chat_request_is_served_by_a_prewarmed_worker(self):
+        pool = self.make_pool(max_requests=1)
+        self.ask(pool, "hi", system="Tutor for Ada, lesson sections A")
+        warm_pid = self.wait_for_idle(pool)
+
+        # A different kid and system prompt still gets the worker spawned in advance
+        answer = self.ask(pool, "hello", system="Tutor for Ben, lesson sections B")
+        self.assertEqual(answer.split(":")[0], str(warm_pid))
+        self.assertIn("Tutor for Ben, lesson sections B", answer)
+        self.assertTrue(answer.endswith("hello"))
+
+    def test_async_lease_uses_the_pool(self):
+        pool = self.make_pool(max_requests=1)
+        pool.prewarm("model")
+        warm_pid = self.wait_for_idle(pool)
+        answer = asyncio.run(self.aask(pool, "hello", system="Tutor for Ben"))
+        self.assertEqual(answer.split(":")[0], str(warm_pid))
+        self.assertTrue(answer.endswith("hello"))
+
+    def test_async_lease_waits_for_a_busy_worker(self):
+        pool = self.make_pool(size=1)
+
+        async def run():
+            async with pool.alease("model") as worker:
+                waiting = asyncio.create_task(self.aask(pool, "second"))
+                await asyncio.sleep(0.2)
+                self.assertFalse(waiting.done())
+                worker.send("first")
+                first = _cli_collect_result([line async for line in worker.alines(5)])
+            return first, await waiting
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first.split(":")[0], second.split(":")[0])
+        self.assertTrue(second.endswith("second"))
+
+
+class MathProblemTests(SimpleTestCase):
+    def test_each_call_asks_for_a_new_problem(self):
+        from unittest import mock
+
+        from . import generators
+
+        response = '{"problem_text": "2 + 2", "difficulty": "easy", "hint": "count"}'
+        with mock.patch.object(generators.client, "chat_completion", return_value=response) as chat:
+            generators.generate_math_problem("addition", 2)
+            generators.generate_math_problem("addition", 2)
+        self.assertEqual(chat.call_count, 2)
+
+
+class PromptCacheTests(SimpleTestCase):
+    def assertPrefixesCacheable(self, system, model):
+        """Every cache breakpoint must close a prefix the API is willing to cache."""
+        if isinstance(system, str):
+            return
+        prefix = ""
+        for block in system:
+            prefix += block["text"]
+            if "cache_control" in block:
+                self.assertGreaterEqual(prompts.estimate_tokens(prefix), prompts.min_cache_tokens(model))
+
+    def test_minimum_depends_on_model(self):
+        self.assertEqual(prompts.min_cache_tokens("claude-sonnet-4-6"), 1024)
+        self.assertEqual(prompts.min_cache_tokens("claude-3-5-haiku-20241022"), 2048)
+        self.assertEqual(prompts.min_cache_tokens("claude-haiku-4-5-20251001"), 4096)
+
+    def test_short_stable_text_gets_no_breakpoint(self):
+        system = prompts.cached_system("rules", "kid", model="claude-sonnet-4-6")
+        self.assertEqual(system, "rules\n\nkid")
+
+    def test_long_stable_text_gets_a_breakpoint(self):
+        system = prompts.cached_system("word " * 1000, "kid", model="claude-sonnet-4-6")
+        self.assertIn("cache_control", system[0])
+        self.assertNotIn("cache_control", system[1])
+        self.assertPrefixesCacheable(system, "claude-sonnet-4-6")
+
+    def test_generator_prompts(self):
+        for stable in (prompts.LESSON_GENERATOR_PROMPT, prompts.RESEARCH_LESSON_GENERATOR_PROMPT,
+                       prompts.CURRICULUM_LESSON_PROMPT):
+            system = prompts.cached_system(stable, model=settings.AI_MODEL)
+            self.assertPrefixesCacheable(system, settings.AI_MODEL)
+
+    def test_lesson_chat_sends_only_the_picked_sections(self):
+        model = "claude-sonnet-4-6"
+        turns = [
+            prompts.lesson_system_prompt(kid, 4, context, title="Volcanoes", model=model)
+            for kid, context in [("Ada", "## Volcanoes\n\nMagma rises"), ("Ben", "## Eruptions")]
+        ]
+        for system in turns:
+            self.assertPrefixesCacheable(system, model)
+        text = [system if isinstance(system, str) else "".join(b["text"] for b in system) for system in turns]
+        self.assertIn("Magma rises", text[0])
+        self.assertNotIn("Magma rises", text[1])
+        self.assertIn("## Eruptions", text[1])
+        self.assertNotIn("Ada", text[1])
+        if not isinstance(turns[0], str):
+            self.assertEqual(turns[0][0], turns[1][0])  # same cached prefix for every kid and question
+            self.assertNotIn("Ada", turns[0][0]["text"])
+
+
+class ProviderClientTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(providers.shutdown)
+
+    def test_client_is_reused_until_credentials_change(self):
+        client = providers.get_anthropic("key-a")
+        self.assertIs(providers.get_anthropic("key-a"), client)
+        self.assertIsNot(providers.get_anthropic("key-b"), client)
+
+    def test_counters_are_exact_across_threads(self):
+        tracker = providers._ConnectionTracker("test")
+        before = providers.stats().get("test.requests", 0)
+        threads = [
+            threading.Thread(target=lambda: [tracker.on_request(None) for _ in range(2000)]) for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(providers.stats()["test.requests"] - before, 16000)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def run_followers(self, key, fn, followers=3):
+        """Start a leader blocked in fn plus `followers` duplicate callers; return their outcomes."""
+        release = threading.Event()
+        outcomes = []
+
+        def leader():
+            release.wait(5)
+            return fn()
+
+        def call():
+            try:
+                outcomes.append(("result", singleflight.do(key, leader)))
+            except Exception as e:
+                outcomes.append(("error", e))
+
+        coalesced = singleflight.stats().get("coalesced", 0)
+        threads = [threading.Thread(target=call) for _ in range(followers + 1)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while singleflight.stats().get("coalesced", 0) - coalesced < followers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_followers_share_the_leader_result(self):
+        calls = []
+        outcomes = self.run_followers("sf-result", lambda: calls.append(1) or "answer")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [("result", "answer")] * 4)
+
+    def test_followers_receive_the_leader_exception(self):
+        error = RuntimeError("upstream failed")
+
+        def fail():
+            raise error
+
+        outcomes = self.run_followers("sf-error", fail)
+        self.assertEqual(outcomes, [("error", error)] * 4)
+
+    def test_key_is_cleared_after_completion(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        self.run_followers("sf-clear", lambda: "first", followers=1)
+        with self.assertRaises(RuntimeError):
+            singleflight.do("sf-clear", fail)
+        self.assertEqual(singleflight.do("sf-clear", lambda: "second"), "second")
+        self.assertNotIn("sf-clear", singleflight._inflight)
+
+    def test_streaming_calls_are_not_coalesced(self):
+        # Both streams must reach the backend at once, or the barrier times out
+        barrier = threading.Barrier(2, timeout=5)
+        results = []
+
+        def route(*args):
+            barrier.wait()
+            return object()
+
+        with mock.patch.object(client, "_route_completion", side_effect=route), \
+                mock.patch.object(client.replay, "enabled", return_value=False):
+            threads = [
+                threading.Thread(target=lambda: results.append(client.chat_completion(
+                    [{"role": "user", "content": "hi"}], system="s", stream=True,
+                )))
+                for _ in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(results), 2)
+        self.assertIsNot(results[0], results[1])
+
+
+class SchedulerTests(SimpleTestCase):
+    WORKLOADS = {
+        "chat": {"limit": 2, "queue": 5, "timeout": 5, "priority": "interactive", "shared": True, "hold": "admission"},
+        "generation": {"limit": 2, "queue": 5, "timeout": 5, "priority": "batch", "shared": True},
+    }
+
+    def make_scheduler(self, capacity=2, reserve=0, workloads=None):
+        return scheduler.Scheduler(capacity, reserve, workloads or self.WORKLOADS)
+
+    def running(self, sched, name):
+        return sched.stats()["workloads"][name]["running"]
+
+    def with_timeout(self, timeout, **overrides):
+        return {
+            name: {**spec, "timeout": timeout, **overrides.get(name, {})} for name, spec in self.WORKLOADS.items()
+        }
+
+    def open_stream(self, sched, workload, chunks=("a", "b")):
+        """Start a chat_completion_stream and return it after its first chunk."""
+
+        def stream_chunks(*args):
+            yield from chunks
+
+        with mock.patch.object(scheduler, "get_scheduler", return_value=sched), \
+                mock.patch.object(client, "_stream_chunks", stream_chunks):
+            stream = client.chat_completion_stream([{"role": "user", "content": "hi"}], workload=workload)
+            next(stream)
+        return stream
+
+    def stream(self, sched, workload):
+        stream = self.open_stream(sched, workload)
+        running = self.running(sched, workload)
+        stream.close()
+        return running
+
+    def test_chat_stream_releases_its_slot_at_the_first_chunk(self):
+        sched = self.make_scheduler()
+        self.assertEqual(self.stream(sched, "chat"), 0)
+        self.assertEqual(self.stream(sched, "generation"), 1)
+        self.assertEqual(self.running(sched, "generation"), 0)
+
+    def test_async_acquire_waits_for_a_release(self):
+        sched = self.make_scheduler(capacity=1)
+
+        async def run():
+            await sched.aacquire("chat")
+            waiting = asyncio.create_task(sched.aacquire("chat"))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiting.done())
+            sched.release("chat")
+            await asyncio.wait_for(waiting, 1)
+
+        asyncio.run(run())
+        self.assertEqual(self.running(sched, "chat"), 1)
+
+    def test_cancelled_async_waiter_takes_no_slot(self):
+        sched = self.make_scheduler(capacity=1)
+
+        async def run():
+            await sched.aacquire("chat")
+            waiting = asyncio.create_task(sched.aacquire("chat"))
+            await asyncio.sleep(0.05)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            sched.release("chat")
+
+        asyncio.run(run())
+        self.assertEqual(self.running(sched, "chat"), 0)
+        self.assertEqual(sched.stats()["workloads"]["chat"]["queued"], 0)
+
+    def test_interactive_reserve_blocks_batch_work(self):
+        sched = self.make_scheduler(capacity=2, reserve=1, workloads=self.with_timeout(0.1))
+        sched.acquire("generation")
+        with self.assertRaises(scheduler.AIBusy) as busy:
+            sched.acquire("generation")
+        self.assertEqual(busy.exception.status_code, 503)
+        sched.acquire("chat")  # the reserved slot
+        self.assertEqual(sched.stats()["shared_running"], 2)
+
+    def test_queued_interactive_request_goes_before_batch(self):
+        sched = self.make_scheduler(capacity=1)
+        sched.acquire("generation")
+        order = []
+
+        def run(name):
+            sched.acquire(name)
+            order.append(name)
+            sched.release(name)
+
+        threads = [threading.Thread(target=run, args=(name,)) for name in ("generation", "chat")]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)  # queue generation first
+        sched.release("generation")
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["chat", "generation"])
+
+    def test_full_queue_raises_ai_busy(self):
+        sched = self.make_scheduler(capacity=1, workloads=self.with_timeout(5, chat={"queue": 1}))
+        sched.acquire("chat")
+        waiter = threading.Thread(target=sched.acquire, args=("chat",))
+        waiter.start()
+        while sched.stats()["workloads"]["chat"]["queued"] < 1:
+            time.sleep(0.01)
+
+        with self.assertRaises(scheduler.AIBusy) as busy:
+            sched.acquire("chat")
+        self.assertEqual(busy.exception.status_code, 429)
+        self.assertIn("queue full", str(busy.exception))
+        with self.assertRaises(scheduler.AIBusy):
+            sched.admit("chat")
+
+        sched.release("chat")
+        waiter.join()
+        self.assertEqual(sched.stats()["workloads"]["chat"]["rejected"], 2)
+
+    def test_waiting_past_the_timeout_raises_ai_busy(self):
+        sched = self.make_scheduler(capacity=1, workloads=self.with_timeout(0.1))
+        sched.acquire("chat")
+        with self.assertRaises(scheduler.AIBusy) as busy:
+            sched.acquire("chat")
+        self.assertIn("queue timeout", str(busy.exception))
+        with self.assertRaises(scheduler.AIBusy):
+            asyncio.run(sched.aacquire("chat"))
+        stats = sched.stats()["workloads"]["chat"]
+        self.assertEqual((stats["running"], stats["queued"], stats["timed_out"]), (1, 0, 2))
+
+    def test_slot_is_released_when_the_call_raises(self):
+        sched = self.make_scheduler()
+
+        def failing_chunks(*args):
+            raise RuntimeError("upstream failed")
+
+        with mock.patch.object(scheduler, "get_scheduler", return_value=sched):
+            with self.assertRaises(RuntimeError), scheduler.slot("generation"):
+                raise RuntimeError("upstream failed")
+            with mock.patch.object(client, "_stream_chunks", failing_chunks), self.assertRaises(RuntimeError):
+                list(client.chat_completion_stream([{"role": "user", "content": "hi"}], workload="generation"))
+        self.assertEqual(sched.stats()["shared_running"], 0)
+
+    def test_long_chat_and_generation_jobs_do_not_starve_other_chats(self):
+        # One open chat stream plus three generation jobs used to hold every slot, so further
+        # chats timed out. Chat now holds its slot only until the first chunk ("hold": "admission").
+        sched = scheduler.Scheduler(4, 1, {
+            name: {**spec, "timeout": 0.2} for name, spec in settings.AI_SCHEDULER_WORKLOADS.items()
+        })
+        streams = [self.open_stream(sched, "chat")]
+        for _ in range(3):
+            sched.acquire("generation")
+        streams += [self.open_stream(sched, "chat") for _ in range(5)]
+        self.assertEqual(self.running(sched, "chat"), 0)
+        self.assertEqual(self.running(sched, "generation"), 3)
+        for stream in streams:
+            stream.close()
@@ -3,6 +3,10 @@ ASGI config for mindcraft project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn mindcraft.asgi:application``) to
+use the async chat endpoint (``/api/v1/chat/sessions/<id>/send-async/``),
+which streams replies without holding a worker thread per open connection.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatSession, ChatMessage
+from .models import ChatSession, ChatMessage, DailyChatUsage
 
 
 class ChatMessageInline(admin.TabularInline):
@@ -24,3 +24,10 @@ class ChatMessageAdmin(admin.ModelAdmin):
     @admin.display(description="Content")
     def content_short(self, obj):
         return obj.content[:100]
+
+
+@admin.register(DailyChatUsage)
+class DailyChatUsageAdmin(admin.ModelAdmin):
+    list_display = ["kid", "day", "messages", "tokens"]
+    list_filter = ["day", "kid"]
+    readonly_fields = ["kid", "day", "messages", "tokens"]
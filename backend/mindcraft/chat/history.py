@@ -0,0 +1,141 @@
+"""Token-budgeted chat history with a rolling summary.
+
+Only the last AI_CHAT_HISTORY_TURNS exchanges are sent to the model verbatim,
+trimmed further to AI_CHAT_HISTORY_TOKENS. Older messages are folded into
+ChatSession.summary by a background thread after each reply, and the summary
+rides along in the system prompt, so the prompt stays roughly the same size
+however long the session runs.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from mindcraft.ai_service import client as ai_client, prompts
+from .models import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Max transcript tokens folded into the summary per model call
+SUMMARY_CHUNK_TOKENS = 4000
+SUMMARY_MAX_TOKENS = 400
+
+_pending = set()  # session ids with a summary update running
+_pending_lock = threading.Lock()
+
+
+def _unsummarized(session):
+    messages = session.messages.exclude(role=ChatMessage.Role.SYSTEM)
+    if session.summary_last_message_id:
+        messages = messages.filter(id__gt=session.summary_last_message_id)
+    return messages.order_by("-id").values_list("id", "role", "content")
+
+
+def _window_start(rows) -> int:
+    """Index into `rows` (oldest first) where the verbatim window begins."""
+    start = max(0, len(rows) - 2 * settings.AI_CHAT_HISTORY_TURNS)
+    used = 0
+    for i in range(len(rows) - 1, start - 1, -1):
+        used += prompts.estimate_tokens(rows[i][2])
+        if used > settings.AI_CHAT_HISTORY_TOKENS and i < len(rows) - 1:
+            start = i + 1
+            break
+    # The model expects the conversation to open with a user turn
+    while start < len(rows) - 1 and rows[start][1] != ChatMessage.Role.USER:
+        start += 1
+    return start
+
+
+def _with_summary(system, summary):
+    note = prompts.chat_summary_note(summary)
+    if isinstance(system, list):
+        return [*system, {"type": "text", "text": note}]
+    return f"{system}\n\n{note}"
+
+
+def build_context(session, system):
+    """Return (messages, system) for the next model call in `session`.
+
+    Reads only the newest unsummarized messages, so the cost per turn does
+    not grow with the length of the session.
+    """
+    rows = list(_unsummarized(session)[: 2 * settings.AI_CHAT_HISTORY_TURNS])
+    return _context(session, system, rows)
+
+
+async def abuild_context(session, system):
+    """Async variant of build_context."""
+    rows = [row async for row in _unsummarized(session)[: 2 * settings.AI_CHAT_HISTORY_TURNS]]
+    return _context(session, system, rows)
+
+
+def _context(session, system, rows):
+    rows.reverse()
+    window = rows[_window_start(rows):]
+    messages = [{"role": role, "content": content} for _, role, content in window]
+    if session.summary:
+        system = _with_summary(system, session.summary)
+    return messages, system
+
+
+def update_summary(session_id: int):
+    """Fold messages older than the verbatim window into the session summary."""
+    session = ChatSession.objects.get(id=session_id)
+    rows = list(_unsummarized(session))
+    rows.reverse()
+    older = rows[:_window_start(rows)]
+
+    while older:
+        chunk, used = [], 0
+        for row in older:
+            used += prompts.estimate_tokens(row[2])
+            if chunk and used > SUMMARY_CHUNK_TOKENS:
+                break
+            chunk.append(row)
+        older = older[len(chunk):]
+
+        transcript = "\n".join(
+            f"{'Kid' if role == ChatMessage.Role.USER else 'Tutor'}: {content}" for _, role, content in chunk
+        )
+        summary = ai_client.chat_completion(
+            messages=[{
+                "role": "user",
+                "content": f"Existing summary:\n{session.summary or '(none yet)'}\n\nNew turns:\n{transcript}",
+            }],
+            system=prompts.CHAT_SUMMARY_PROMPT,
+            model=settings.AI_MODEL_CHAT,
+            max_tokens=SUMMARY_MAX_TOKENS,
+        ).strip()
+
+        # Compare-and-set so a concurrent update never rolls the summary back;
+        # update() also leaves updated_at (the session list order) alone
+        last_id = chunk[-1][0]
+        updated = ChatSession.objects.filter(
+            id=session.id, summary_last_message_id=session.summary_last_message_id
+        ).update(summary=summary, summary_last_message_id=last_id)
+        if not updated:
+            return
+        session.summary, session.summary_last_message_id = summary, last_id
+        logger.info("Folded %d messages into chat summary for session %s", len(chunk), session.id)
+
+
+def schedule_summary(session_id: int):
+    """Update the session summary in a background thread (one at a time per session)."""
+    with _pending_lock:
+        if session_id in _pending:
+            return
+        _pending.add(session_id)
+
+    def run():
+        try:
+            update_summary(session_id)
+        except Exception:
+            logger.exception("Chat summary update failed for session %s", session_id)
+        finally:
+            with _pending_lock:
+                _pending.discard(session_id)
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
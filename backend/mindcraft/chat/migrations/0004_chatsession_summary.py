@@ -0,0 +1,25 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0003_alter_chatsession_context_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatsession",
+            name="summary",
+            field=models.TextField(blank=True, default="", help_text="Rolling summary of older turns"),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="summary_last_message_id",
+            field=models.IntegerField(
+                blank=True, help_text="ID of the last message folded into the summary", null=True
+            ),
+        ),
+    ]
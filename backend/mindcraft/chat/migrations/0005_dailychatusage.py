@@ -0,0 +1,30 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_chatsession_summary"),
+        ("core", "0002_kidprofile_daily_token_limit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyChatUsage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField(help_text="Local day in AI_CHAT_QUOTA_TIME_ZONE")),
+                ("messages", models.IntegerField(default=0)),
+                ("tokens", models.IntegerField(default=0)),
+                ("kid", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="chat_usage", to="core.kidprofile")),
+            ],
+            options={
+                "verbose_name_plural": "daily chat usage",
+                "ordering": ["-day"],
+                "unique_together": {("kid", "day")},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_dailychatusage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="truncated",
+            field=models.BooleanField(default=False, help_text="Reply was cut off by a cancel or disconnect"),
+        ),
+    ]
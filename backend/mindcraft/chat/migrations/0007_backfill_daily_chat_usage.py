@@ -0,0 +1,50 @@
+# Generated by Django 6.1.2 on 2026-10-17 08:40
+
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_today(apps, schema_editor):
+    """Fill today's ledger from chat history, so messages sent before the ledger existed still count."""
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+    DailyChatUsage = apps.get_model("chat", "DailyChatUsage")
+
+    tz = ZoneInfo(settings.AI_CHAT_QUOTA_TIME_ZONE)
+    day = timezone.localdate(timezone=tz)
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+
+    totals = {}  # kid_id -> [messages, tokens]
+    messages = ChatMessage.objects.filter(
+        created_at__gte=start, created_at__lt=end, role__in=["user", "assistant"],
+    ).values_list("session__kid_id", "role", "content")
+    for kid_id, role, content in messages.iterator():
+        kid_totals = totals.setdefault(kid_id, [0, 0])
+        if role == "user":
+            kid_totals[0] += 1
+        kid_totals[1] += len(content) // 4 + 1  # prompts.estimate_tokens
+
+    for kid_id, (message_count, token_count) in totals.items():
+        usage, created = DailyChatUsage.objects.get_or_create(
+            kid_id=kid_id, day=day, defaults={"messages": message_count, "tokens": token_count},
+        )
+        if not created:
+            # Sends since the ledger was deployed are already in it, and also in the history
+            usage.messages = max(usage.messages, message_count)
+            usage.tokens = max(usage.tokens, token_count)
+            usage.save(update_fields=["messages", "tokens"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_chatmessage_truncated"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_today, migrations.RunPython.noop),
+    ]
@@ -14,6 +14,10 @@ class ChatSession(models.Model):
     context_type = models.CharField(max_length=20, choices=ContextType.choices, default=ContextType.GENERAL)
     context_id = models.IntegerField(null=True, blank=True, help_text="ID of related lesson/quiz")
     is_active = models.BooleanField(default=True)
+    summary = models.TextField(blank=True, default="", help_text="Rolling summary of older turns")
+    summary_last_message_id = models.IntegerField(
+        null=True, blank=True, help_text="ID of the last message folded into the summary"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -24,6 +28,23 @@ class ChatSession(models.Model):
         return f"{self.kid.display_name}: {self.title}"
 
 
+class DailyChatUsage(models.Model):
+    """Per-kid chat quota ledger for one day (see chat.quota)."""
+
+    kid = models.ForeignKey("core.KidProfile", on_delete=models.CASCADE, related_name="chat_usage")
+    day = models.DateField(help_text="Local day in AI_CHAT_QUOTA_TIME_ZONE")
+    messages = models.IntegerField(default=0)
+    tokens = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        unique_together = ["kid", "day"]
+        verbose_name_plural = "daily chat usage"
+
+    def __str__(self):
+        return f"{self.kid} on {self.day}: {self.messages} messages, {self.tokens} tokens"
+
+
 class ChatMessage(models.Model):
     class Role(models.TextChoices):
         USER = "user", "User"
@@ -33,6 +54,7 @@ class ChatMessage(models.Model):
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name="messages")
     role = models.CharField(max_length=10, choices=Role.choices)
     content = models.TextField()
+    truncated = models.BooleanField(default=False, help_text="Reply was cut off by a cancel or disconnect")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
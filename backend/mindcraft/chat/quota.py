@@ -0,0 +1,126 @@
+"""Per-kid daily chat quotas.
+
+Usage is kept in a DailyChatUsage row per kid and local day (midnight in
+AI_CHAT_QUOTA_TIME_ZONE), so checking a quota never scans chat history.
+Each process also keeps the current day's totals in memory: checks are
+served from there, and record() writes through with an atomic F()
+increment and reads the row back, picking up what other processes have
+added since. A process may therefore lag other processes' sends until its
+own next write. The a-prefixed functions are the async ORM variants used
+by the ASGI chat views.
+"""
+
+import threading
+from datetime import date
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from mindcraft.ai_service.prompts import estimate_tokens
+from .models import DailyChatUsage
+
+_usage = {}  # (kid_id, day) -> (messages, tokens)
+_lock = threading.Lock()
+
+
+def today() -> date:
+    return timezone.localdate(timezone=ZoneInfo(settings.AI_CHAT_QUOTA_TIME_ZONE))
+
+
+def _remember(kid_id, day, totals):
+    with _lock:
+        # Entries from earlier days are never read again
+        for key in [k for k in _usage if k[1] != day]:
+            del _usage[key]
+        _usage[(kid_id, day)] = totals
+
+
+def usage(kid_id) -> tuple[int, int]:
+    """(messages, tokens) the kid has used today."""
+    day = today()
+    with _lock:
+        totals = _usage.get((kid_id, day))
+    if totals is None:
+        row = DailyChatUsage.objects.filter(kid_id=kid_id, day=day).values_list("messages", "tokens").first()
+        totals = row or (0, 0)
+        _remember(kid_id, day, totals)
+    return totals
+
+
+async def ausage(kid_id) -> tuple[int, int]:
+    """Async variant of usage()."""
+    day = today()
+    with _lock:
+        totals = _usage.get((kid_id, day))
+    if totals is None:
+        row = await DailyChatUsage.objects.filter(kid_id=kid_id, day=day).values_list("messages", "tokens").afirst()
+        totals = row or (0, 0)
+        _remember(kid_id, day, totals)
+    return totals
+
+
+def record(kid_id, messages=0, tokens=0) -> tuple[int, int]:
+    """Add to today's usage (negative values refund) and return the new totals."""
+    day = today()
+    with transaction.atomic():
+        updated = DailyChatUsage.objects.filter(kid_id=kid_id, day=day).update(
+            messages=F("messages") + messages, tokens=F("tokens") + tokens,
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    DailyChatUsage.objects.create(kid_id=kid_id, day=day, messages=messages, tokens=tokens)
+            except IntegrityError:
+                # Another process created today's row first
+                DailyChatUsage.objects.filter(kid_id=kid_id, day=day).update(
+                    messages=F("messages") + messages, tokens=F("tokens") + tokens,
+                )
+        totals = DailyChatUsage.objects.filter(kid_id=kid_id, day=day).values_list("messages", "tokens").get()
+    _remember(kid_id, day, totals)
+    return totals
+
+
+async def arecord(kid_id, messages=0, tokens=0) -> tuple[int, int]:
+    """Async variant of record(); each increment is still a single atomic UPDATE."""
+    day = today()
+    rows = DailyChatUsage.objects.filter(kid_id=kid_id, day=day)
+    increment = {"messages": F("messages") + messages, "tokens": F("tokens") + tokens}
+    if not await rows.aupdate(**increment):
+        try:
+            await DailyChatUsage.objects.acreate(kid_id=kid_id, day=day, messages=messages, tokens=tokens)
+        except IntegrityError:
+            # Another process created today's row first
+            await rows.aupdate(**increment)
+    totals = await rows.values_list("messages", "tokens").aget()
+    _remember(kid_id, day, totals)
+    return totals
+
+
+def record_message(kid_id, text) -> tuple[int, int]:
+    """Count a kid's saved chat message and its tokens."""
+    return record(kid_id, messages=1, tokens=estimate_tokens(text))
+
+
+def record_reply(kid_id, text) -> tuple[int, int]:
+    """Count the tokens of the AI's reply against the kid's budget."""
+    return record(kid_id, tokens=estimate_tokens(text))
+
+
+def refund_message(kid_id, text) -> tuple[int, int]:
+    """Give back a message that was cancelled before any reply arrived."""
+    return record(kid_id, messages=-1, tokens=-estimate_tokens(text))
+
+
+async def arecord_message(kid_id, text) -> tuple[int, int]:
+    return await arecord(kid_id, messages=1, tokens=estimate_tokens(text))
+
+
+async def arecord_reply(kid_id, text) -> tuple[int, int]:
+    return await arecord(kid_id, tokens=estimate_tokens(text))
+
+
+async def arefund_message(kid_id, text) -> tuple[int, int]:
+    return await arecord(kid_id, messages=-1, tokens=-estimate_tokens(text))
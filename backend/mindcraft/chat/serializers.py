@@ -5,8 +5,8 @@ from .models import ChatSession, ChatMessage
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
-        fields = ["id", "role", "content", "created_at"]
-        read_only_fields = ["id", "role", "created_at"]
+        fields = ["id", "role", "content", "truncated", "created_at"]
+        read_only_fields = ["id", "role", "truncated", "created_at"]
 
 
 class ChatSessionSerializer(serializers.ModelSerializer):
@@ -19,11 +19,16 @@ class ChatSessionSerializer(serializers.ModelSerializer):
         model = ChatSession
         fields = ["id", "kid", "kid_name", "kid_avatar", "title", "context_type", "context_id", "is_active", "created_at", "updated_at", "last_message", "message_count"]
 
+    # Annotated by ChatSessionViewSet.get_queryset; queried only for a freshly created session
     def get_last_message(self, obj):
+        if hasattr(obj, "last_message_preview"):
+            return obj.last_message_preview
         msg = obj.messages.last()
         return msg.content[:100] if msg else None
 
     def get_message_count(self, obj):
+        if hasattr(obj, "message_count"):
+            return obj.message_count
         return obj.messages.count()
 
 
@@ -0,0 +1,210 @@
+"""Chat replies being streamed in this process: cancellable and resumable.
+
+Each reply is a ChatStream. The model call runs in a producer (a thread, or
+a task on the ASGI event loop) that pushes SSE payloads into the stream's
+ring buffer, each with a sequence number; HTTP responses are consumers that
+read from the buffer. A client whose connection drops reconnects with the
+last event id it saw ("<stream id>:<seq>") and gets the missed events, then
+the rest live, without another model call. If it missed more than the
+buffer holds it first gets a "resume" event with the reply so far; one
+that reconnects after the final event gets the final event again.
+
+While no event arrives consumers get a keepalive tick every
+AI_CHAT_STREAM_KEEPALIVE seconds, which the views send as an SSE comment,
+so a closed connection is noticed even while the model is silent.
+
+With no client attached for AI_CHAT_RESUME_GRACE seconds, an unfinished
+reply is cancelled as "disconnected". Finished streams stay resumable for
+AI_CHAT_STREAM_TTL seconds.
+
+The registry is per process: cancel and resume requests have to reach the
+process serving the stream (true of the single-process ASGI deployment and
+of runserver).
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+
+from mindcraft.ai_service.client import CancelToken
+
+# Payload types that end a stream
+FINAL_EVENTS = {"done", "cancelled", "error"}
+
+_streams = {}  # stream id -> ChatStream
+_lock = threading.Lock()
+
+
+class ChatStream:
+    """One streamed reply: its CancelToken and a ring buffer of its SSE payloads."""
+
+    def __init__(self, session_id):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.token = CancelToken()
+        self.seq = 0
+        self.text = ""  # reply so far, for clients that fell behind the buffer
+        self.finished_at = None
+        self.task = None  # asyncio producer, referenced so it is not garbage collected
+        self._events = deque(maxlen=settings.AI_CHAT_STREAM_BUFFER)  # (seq, payload)
+        self._cond = threading.Condition()
+        self._consumers = 0
+        self._wakers = set()
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def event_id(self, seq):
+        return f"{self.id}:{seq}"
+
+    def push(self, payload):
+        """Append a payload (called by the producer) and wake the consumers."""
+        with self._cond:
+            self.seq += 1
+            self._events.append((self.seq, payload))
+            if payload["type"] == "chunk":
+                self.text += payload["content"]
+            elif payload["type"] in FINAL_EVENTS:
+                self.finished_at = time.monotonic()
+            self._cond.notify_all()
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake()
+
+    def since(self, after):
+        """Events after sequence number `after`.
+
+        Returns:
+            ([(seq, payload)], new cursor)
+        """
+        with self._cond:
+            after = max(0, min(after, self.seq))  # ids past the end come from another stream or a bad client
+            if after == self.seq:
+                # Already saw the final event (a reconnect after "done"): send it again so the consumer ends
+                return ([self._events[-1]] if self.finished else []), self.seq
+            oldest = self._events[0][0]
+            if after >= oldest - 1:
+                return [e for e in self._events if e[0] > after], self.seq
+            # Fell out of the buffer: send the reply so far, or the final event (it carries the whole reply)
+            if self.finished:
+                return [self._events[-1]], self.seq
+            return [(self.seq, {"type": "resume", "content": self.text})], self.seq
+
+    def wait(self, after, timeout):
+        """Block until there are events after `after` or `timeout` seconds pass; True if there are."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.seq > after, timeout)
+
+    def attach(self, waker=None):
+        with self._cond:
+            self._consumers += 1
+            if waker:
+                self._wakers.add(waker)
+
+    def detach(self, waker=None):
+        with self._cond:
+            self._consumers -= 1
+            self._wakers.discard(waker)
+            orphaned = self._consumers == 0 and not self.finished
+        if orphaned:
+            timer = threading.Timer(settings.AI_CHAT_RESUME_GRACE, self._cancel_if_orphaned)
+            timer.daemon = True
+            timer.start()
+
+    def _cancel_if_orphaned(self):
+        with self._cond:
+            orphaned = self._consumers == 0 and not self.finished
+        if orphaned:
+            self.token.cancel("disconnected")
+
+
+def _prune_locked():
+    now = time.monotonic()
+    for stream_id in [
+        sid for sid, s in _streams.items() if s.finished and now - s.finished_at > settings.AI_CHAT_STREAM_TTL
+    ]:
+        del _streams[stream_id]
+
+
+def start(session_id) -> ChatStream:
+    stream = ChatStream(session_id)
+    with _lock:
+        _prune_locked()
+        _streams[stream.id] = stream
+    return stream
+
+
+def get(stream_id):
+    with _lock:
+        _prune_locked()
+        return _streams.get(stream_id)
+
+
+def latest(session_id):
+    """The session's most recent stream still held, if any."""
+    with _lock:
+        _prune_locked()
+        streams = [s for s in _streams.values() if s.session_id == session_id]
+    return streams[-1] if streams else None
+
+
+def cancel(session_id) -> int:
+    """Cancel the session's unfinished replies; returns how many were running."""
+    with _lock:
+        running = [s for s in _streams.values() if s.session_id == session_id and not s.finished]
+    for stream in running:
+        stream.token.cancel("cancelled")
+    return len(running)
+
+
+def events(stream, after=0):
+    """Yield (seq, payload) from `after` on until the final event, blocking for live ones.
+
+    Yields (cursor, None) as a keepalive tick after AI_CHAT_STREAM_KEEPALIVE
+    seconds without an event.
+    """
+    stream.attach()
+    try:
+        cursor = after
+        while True:
+            batch, cursor = stream.since(cursor)
+            for seq, payload in batch:
+                yield seq, payload
+                if payload["type"] in FINAL_EVENTS:
+                    return
+            if not batch and not stream.wait(cursor, settings.AI_CHAT_STREAM_KEEPALIVE):
+                yield cursor, None
+    finally:
+        stream.detach()
+
+
+async def aevents(stream, after=0):
+    """Async variant of events() for ASGI views."""
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+
+    def waker():
+        loop.call_soon_threadsafe(wake.set)
+
+    stream.attach(waker)
+    try:
+        cursor = after
+        while True:
+            wake.clear()
+            batch, cursor = stream.since(cursor)
+            for seq, payload in batch:
+                yield seq, payload
+                if payload["type"] in FINAL_EVENTS:
+                    return
+            if not batch:
+                try:
+                    await asyncio.wait_for(wake.wait(), settings.AI_CHAT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield cursor, None
+    finally:
+        stream.detach(waker)
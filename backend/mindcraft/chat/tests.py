@@ -0,0 +1,186 @@
+import asyncio
+import importlib
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.apps import apps
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from mindcraft.core.models import KidProfile
+from . import quota, streams
+from .models import ChatMessage, ChatSession, DailyChatUsage
+
+
+class ChatSessionQueryCountTests(APITestCase):
+    """The session list takes the same number of queries however many sessions there are."""
+
+    def setUp(self):
+        parent = User.objects.create_user("parent", is_staff=True)
+        kid_user = User.objects.create_user("kid")
+        self.kid = KidProfile.objects.create(user=kid_user, parent=parent, display_name="Kid")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=kid_user).key}")
+
+    def add_sessions(self, count):
+        for i in range(count):
+            session = ChatSession.objects.create(kid=self.kid, title=f"Chat {i}")
+            ChatMessage.objects.create(session=session, role=ChatMessage.Role.USER, content="Why is the sky blue?")
+            ChatMessage.objects.create(session=session, role=ChatMessage.Role.ASSISTANT, content="Because of light!")
+
+    def test_list(self):
+        # Token, kid profile, page count, page
+        for count in (2, 10):
+            self.add_sessions(count)
+            with self.subTest(sessions=ChatSession.objects.count()), self.assertNumQueries(4):
+                response = self.client.get("/api/v1/chat/sessions/")
+            self.assertEqual(response.data["count"], ChatSession.objects.count())
+            self.assertEqual(response.data["results"][0]["message_count"], 2)
+
+
+@override_settings(AI_CHAT_STREAM_KEEPALIVE=0.05)
+class StreamResumeTests(SimpleTestCase):
+    def finished_stream(self):
+        stream = streams.ChatStream(session_id=1)
+        stream.push({"type": "chunk", "content": "Hi"})
+        stream.push({"type": "done", "content": "Hi"})
+        return stream
+
+    async def collect(self, stream, after):
+        return [event async for event in streams.aevents(stream, after)]
+
+    def test_resume_after_done_gets_the_final_event(self):
+        stream = self.finished_stream()
+        self.assertEqual(list(streams.events(stream, 2)), [(2, {"type": "done", "content": "Hi"})])
+        self.assertEqual(asyncio.run(self.collect(stream, 2)), [(2, {"type": "done", "content": "Hi"})])
+
+    def test_resume_past_the_last_seq_is_clamped(self):
+        stream = self.finished_stream()
+        self.assertEqual(list(streams.events(stream, 99)), [(2, {"type": "done", "content": "Hi"})])
+        self.assertEqual(asyncio.run(self.collect(stream, 99)), [(2, {"type": "done", "content": "Hi"})])
+
+    def test_silent_stream_ticks(self):
+        stream = streams.ChatStream(session_id=1)
+        stream.push({"type": "chunk", "content": "Hi"})
+        events = streams.events(stream, 99)
+        self.assertEqual(next(events), (1, None))
+        stream.push({"type": "done", "content": "Hi"})
+        self.assertEqual(list(events), [(2, {"type": "done", "content": "Hi"})])
+
+
+class SendAsyncTests(APITransactionTestCase):
+    # The async ORM runs queries on another thread's connection, so data must be committed
+    def setUp(self):
+        parent = User.objects.create_user("parent", is_staff=True)
+        kid_user = User.objects.create_user("kid")
+        self.kid = KidProfile.objects.create(user=kid_user, parent=parent, display_name="Kid")
+        self.session = ChatSession.objects.create(kid=self.kid)
+        self.token = Token.objects.create(user=kid_user).key
+
+    async def send(self, message, token=None):
+        from django.test import AsyncClient
+
+        response = await AsyncClient().post(
+            f"/api/v1/chat/sessions/{self.session.id}/send-async/", {"message": message},
+            content_type="application/json", headers={"Authorization": f"Token {token or self.token}"},
+        )
+        body = b"".join([chunk async for chunk in response.streaming_content]) if response.streaming else response.content
+        return response.status_code, body.decode()
+
+    def test_reply_is_streamed_and_saved(self):
+        from unittest import mock
+
+        from mindcraft.ai_service import client as ai_client
+        from . import quota
+
+        async def reply(**kwargs):
+            for chunk in ("Light ", "scatters!"):
+                yield chunk
+
+        with mock.patch.object(ai_client, "achat_completion_stream", reply):
+            status, body = asyncio.run(self.send("Why is the sky blue?"))
+        self.assertEqual(status, 200)
+        self.assertIn('"type": "done", "content": "Light scatters!"', body)
+        self.assertEqual(
+            list(self.session.messages.values_list("role", "content")),
+            [("user", "Why is the sky blue?"), ("assistant", "Light scatters!")],
+        )
+        self.assertEqual(quota.usage(self.kid.id)[0], 1)
+
+    def test_bad_token_is_rejected(self):
+        status, _ = asyncio.run(self.send("hi", token="nope"))
+        self.assertEqual(status, 401)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class DailyChatUsageTests(TestCase):
+    def setUp(self):
+        parent = User.objects.create_user("parent")
+        self.kid = KidProfile.objects.create(user=User.objects.create_user("kid"), parent=parent, display_name="Kid")
+        quota._usage.clear()
+
+    @override_settings(AI_CHAT_QUOTA_TIME_ZONE="America/Los_Angeles")
+    def test_day_rolls_over_at_midnight_in_the_quota_time_zone(self):
+        with mock.patch("django.utils.timezone.now", return_value=utc(2026, 10, 17, 6, 30)):  # 23:30 the 16th in LA
+            quota.record(self.kid.id, messages=3, tokens=30)
+            self.assertEqual(quota.usage(self.kid.id), (3, 30))
+        with mock.patch("django.utils.timezone.now", return_value=utc(2026, 10, 17, 7, 30)):  # 00:30 the 17th
+            self.assertEqual(quota.usage(self.kid.id), (0, 0))
+            quota.record(self.kid.id, messages=1, tokens=5)
+        self.assertEqual(
+            list(DailyChatUsage.objects.order_by("day").values_list("day", "messages")),
+            [(datetime(2026, 10, 16).date(), 3), (datetime(2026, 10, 17).date(), 1)],
+        )
+
+    def test_record_picks_up_increments_from_other_processes(self):
+        quota.record(self.kid.id, messages=1, tokens=10)
+        # Another process sends a message: this process's cache lags until its next write
+        DailyChatUsage.objects.filter(kid=self.kid).update(messages=2, tokens=20)
+        self.assertEqual(quota.usage(self.kid.id), (1, 10))
+        self.assertEqual(quota.record(self.kid.id, messages=1, tokens=10), (3, 30))
+
+    def test_losing_the_race_to_create_the_row_still_counts(self):
+        rows = DailyChatUsage.objects.filter(kid=self.kid, day=quota.today())
+        update = type(rows).update
+        calls = []
+
+        def update_after_other_process(queryset, **kwargs):
+            if not calls:
+                # The other process creates today's row between our UPDATE and INSERT
+                calls.append(1)
+                DailyChatUsage.objects.create(kid=self.kid, day=quota.today(), messages=1, tokens=10)
+                return 0
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(type(rows), "update", update_after_other_process):
+            self.assertEqual(quota.record(self.kid.id, messages=1, tokens=10), (2, 20))
+
+    def test_backfill_counts_todays_history(self):
+        session = ChatSession.objects.create(kid=self.kid, title="Volcanoes")
+        for role, content in (("user", "Why do volcanoes erupt?"), ("assistant", "Pressure builds up."), ("user", "Cool")):
+            ChatMessage.objects.create(session=session, role=role, content=content)
+        yesterday = ChatMessage.objects.create(session=session, role="user", content="Old question")
+        ChatMessage.objects.filter(id=yesterday.id).update(created_at=utc(2020, 1, 1))
+        DailyChatUsage.objects.create(kid=self.kid, day=quota.today(), messages=1, tokens=2)
+
+        importlib.import_module("mindcraft.chat.migrations.0007_backfill_daily_chat_usage").backfill_today(apps, None)
+        tokens = sum(len(text) // 4 + 1 for text in ("Why do volcanoes erupt?", "Pressure builds up.", "Cool"))
+        self.assertEqual(quota.usage(self.kid.id), (2, tokens))
+
+
+class ConcurrentChatUsageTests(TransactionTestCase):
+    # Concurrent sends as the ASGI views make them: every await is a point where another send can run
+    def test_concurrent_increments_are_not_lost(self):
+        parent = User.objects.create_user("parent")
+        kid = KidProfile.objects.create(user=User.objects.create_user("kid"), parent=parent, display_name="Kid")
+
+        async def sends():
+            await asyncio.gather(*(quota.arecord(kid.id, messages=1, tokens=3) for _ in range(40)))
+
+        asyncio.run(sends())
+        self.assertEqual(DailyChatUsage.objects.filter(kid=kid).values_list("messages", "tokens").get(), (40, 120))
+        self.assertEqual(quota.usage(kid.id), (40, 120))
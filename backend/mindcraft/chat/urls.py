@@ -6,5 +6,7 @@ router = DefaultRouter()
 router.register("sessions", views.ChatSessionViewSet, basename="chat-session")
 
 urlpatterns = [
+    path("sessions/<int:pk>/send-async/", views.send_async),
+    path("sessions/<int:pk>/stream-async/", views.resume_async),
     path("", include(router.urls)),
 ]
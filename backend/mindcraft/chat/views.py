@@ -1,27 +1,60 @@
+import asyncio
 import json
-from django.http import StreamingHttpResponse
+import threading
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Substr
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework import viewsets, status
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
+from . import history, quota, streams
 from .models import ChatSession, ChatMessage
 from .serializers import ChatSessionSerializer, ChatMessageSerializer, ChatSendSerializer
-from mindcraft.ai_service import client as ai_client, prompts, safety
+from mindcraft.ai_service import client as ai_client, prompts, safety, scheduler
+from mindcraft.content import retrieval
 from mindcraft.content.models import Lesson
 
 
+# SSE comment sent on streams.events() keepalive ticks
+KEEPALIVE = ": keepalive\n\n"
+
+
+def _sse(payload, event_id=None):
+    data = f"data: {json.dumps(payload)}\n\n"
+    return f"id: {event_id}\n{data}" if event_id else data
+
+
+def _sessions_for(user):
+    """Chat sessions visible to `user` — staff see all, kids see their own."""
+    if user.is_staff:
+        return ChatSession.objects.all()
+    if hasattr(user, "kid_profile"):
+        return ChatSession.objects.filter(kid=user.kid_profile)
+    return ChatSession.objects.none()
+
+
 class ChatSessionViewSet(viewsets.ModelViewSet):
     serializer_class = ChatSessionSerializer
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff:
-            kid_id = self.request.query_params.get("kid_id")
-            if kid_id:
-                return ChatSession.objects.filter(kid_id=kid_id)
-            return ChatSession.objects.all()
-        if hasattr(user, "kid_profile"):
-            return ChatSession.objects.filter(kid=user.kid_profile)
-        return ChatSession.objects.none()
+        kid_id = self.request.query_params.get("kid_id")
+        if user.is_staff and kid_id:
+            sessions = ChatSession.objects.filter(kid_id=kid_id)
+        else:
+            sessions = _sessions_for(user)
+        latest = ChatMessage.objects.filter(session=OuterRef("pk")).order_by("-created_at", "-id")
+        return sessions.select_related("kid").annotate(
+            message_count=Count("messages"),
+            last_message_preview=Subquery(latest.values(preview=Substr("content", 1, 100))[:1]),
+        ).order_by(*ChatSession._meta.ordering)  # aggregates drop Meta.ordering
 
     def perform_create(self, serializer):
         if hasattr(self.request.user, "kid_profile"):
@@ -52,95 +85,322 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
         if not valid:
             return Response({"error": validated_msg}, status=400)
 
+        # Reject up front rather than mid-stream when the chat queue is full
+        try:
+            scheduler.admit("chat")
+        except scheduler.AIBusy as e:
+            return scheduler.error_response(e)
+
         # Save user message
         ChatMessage.objects.create(
             session=session,
             role=ChatMessage.Role.USER,
             content=validated_msg,
         )
+        quota.record_message(kid_profile.id, validated_msg)
+
+        # Build system prompt based on context, then the token-budgeted history
+        context = send_serializer.validated_data.get("context")
+        system = _get_system_prompt(session, kid_profile, context=context, question=validated_msg)
+        messages, system = history.build_context(session, system)
+
+        # Generate in the background so the reply survives a dropped connection; stream it via SSE
+        stream = streams.start(session.id)
+        threading.Thread(
+            target=_produce_reply,
+            args=(stream, session, kid_profile, validated_msg, messages, system),
+            daemon=True,
+        ).start()
+        return _stream_response(stream)
+
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, pk=None):
+        """Stop the reply being streamed in this session; what was generated is saved, marked truncated."""
+        session = self.get_object()
+        return Response({"cancelled": streams.cancel(session.id)})
+
+    @action(detail=True, methods=["get"], url_path="stream")
+    def resume(self, request, pk=None):
+        """Reattach to the session's reply stream after a dropped connection.
+
+        Send the last event id seen as the Last-Event-ID header (or
+        ?last_event_id=) to get only the missed events, then the rest live.
+        """
+        session = self.get_object()
+        stream, after = _find_stream(session, _last_event_id(request))
+        if stream is None:
+            return Response({"error": "No reply stream to resume"}, status=404)
+        return _stream_response(stream, after)
+
+
+def _last_event_id(request):
+    return request.headers.get("Last-Event-ID") or request.GET.get("last_event_id", "")
+
+
+def _find_stream(session, last_event_id):
+    """The stream a Last-Event-ID ("<stream id>:<seq>") points at, and the seq to resume after."""
+    stream_id, _, seq = last_event_id.partition(":")
+    stream = streams.get(stream_id) if stream_id else streams.latest(session.id)
+    if stream is None or stream.session_id != session.id:
+        return None, 0
+    return stream, int(seq) if seq.isdigit() else 0
+
+
+def _stream_response(stream, after=0):
+    def event_stream():
+        events = streams.events(stream, after)
+        try:
+            for seq, payload in events:
+                yield _sse(payload, stream.event_id(seq)) if payload else KEEPALIVE
+        finally:
+            events.close()
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _astream_response(stream, after=0):
+    async def event_stream():
+        async for seq, payload in streams.aevents(stream, after):
+            yield _sse(payload, stream.event_id(seq)) if payload else KEEPALIVE
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _produce_reply(stream, session, kid_profile, user_message, messages, system):
+    """Generate one reply into `stream` (runs in its own thread, independent of the request)."""
+    full_response = ""
+    chunks = ai_client.chat_completion_stream(
+        messages=messages,
+        system=system,
+        model=None,  # Uses AI_MODEL_CHAT default
+        cancel=stream.token,
+    )
+    try:
+        for chunk in chunks:
+            full_response += chunk
+            stream.push({"type": "chunk", "content": chunk})
+
+        if stream.token.cancelled:
+            _save_reply(session, kid_profile, user_message, full_response, truncated=True)
+            stream.push({"type": "cancelled", "content": full_response})
+            return
+
+        _save_reply(session, kid_profile, user_message, full_response)
+
+        # Update session title if it's the first exchange
+        if session.messages.count() <= 2 and session.title == "New Chat":
+            session.title = user_message[:50]
+            session.save(update_fields=["title", "updated_at"])
+
+        history.schedule_summary(session.id)
+        stream.push({"type": "done", "content": full_response})
+    except Exception as e:
+        stream.push({"type": "error", "content": str(e)})
+    finally:
+        chunks.close()
+        connection.close()
+
+
+async def _aproduce_reply(stream, session, kid_profile, user_message, messages, system):
+    """Async variant of _produce_reply, run as a task on the ASGI event loop."""
+    full_response = ""
+    try:
+        async for chunk in ai_client.achat_completion_stream(
+            messages=messages,
+            system=system,
+            model=None,  # Uses AI_MODEL_CHAT default
+            cancel=stream.token,
+        ):
+            full_response += chunk
+            stream.push({"type": "chunk", "content": chunk})
 
-        # Build conversation history
-        history = list(
-            session.messages.exclude(role=ChatMessage.Role.SYSTEM)
-            .values_list("role", "content")
+        if stream.token.cancelled:
+            await _asave_reply(session, kid_profile, user_message, full_response, truncated=True)
+            stream.push({"type": "cancelled", "content": full_response})
+            return
+
+        await _asave_reply(session, kid_profile, user_message, full_response)
+
+        # Update session title if it's the first exchange
+        if await session.messages.acount() <= 2 and session.title == "New Chat":
+            session.title = user_message[:50]
+            await session.asave(update_fields=["title", "updated_at"])
+
+        history.schedule_summary(session.id)
+        stream.push({"type": "done", "content": full_response})
+    except Exception as e:
+        stream.push({"type": "error", "content": str(e)})
+
+
+def _save_reply(session, kid_profile, user_message, reply, truncated=False):
+    """Save the assistant reply and charge its tokens to the kid's quota.
+
+    A reply cut off before any text arrived is not saved, and the kid's
+    message is refunded.
+    """
+    if reply:
+        ChatMessage.objects.create(
+            session=session,
+            role=ChatMessage.Role.ASSISTANT,
+            content=reply,
+            truncated=truncated,
         )
-        messages = [{"role": role, "content": content} for role, content in history]
+        quota.record_reply(kid_profile.id, reply)
+    elif truncated:
+        quota.refund_message(kid_profile.id, user_message)
 
-        # Build system prompt based on context
-        context = send_serializer.validated_data.get("context")
-        system = self._get_system_prompt(session, kid_profile, context=context)
 
-        # Stream response via SSE
-        def event_stream():
-            full_response = ""
-            try:
-                for chunk in ai_client.chat_completion_stream(
-                    messages=messages,
-                    system=system,
-                    model=None,  # Uses AI_MODEL_CHAT default
-                ):
-                    full_response += chunk
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
-
-                # Save assistant message
-                ChatMessage.objects.create(
-                    session=session,
-                    role=ChatMessage.Role.ASSISTANT,
-                    content=full_response,
-                )
-
-                # Update session title if it's the first exchange
-                if session.messages.count() <= 2 and session.title == "New Chat":
-                    session.title = validated_msg[:50]
-                    session.save()
-
-                yield f"data: {json.dumps({'type': 'done', 'content': full_response})}\n\n"
-            except Exception as e:
-                yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
-
-        response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
-        response["Cache-Control"] = "no-cache"
-        response["X-Accel-Buffering"] = "no"
-        return response
+async def _asave_reply(session, kid_profile, user_message, reply, truncated=False):
+    """Async variant of _save_reply."""
+    if reply:
+        await ChatMessage.objects.acreate(
+            session=session,
+            role=ChatMessage.Role.ASSISTANT,
+            content=reply,
+            truncated=truncated,
+        )
+        await quota.arecord_reply(kid_profile.id, reply)
+    elif truncated:
+        await quota.arefund_message(kid_profile.id, user_message)
 
-    def _get_system_prompt(self, session, kid_profile, context=None):
-        """Build system prompt based on chat context."""
-        kid_name = kid_profile.display_name
-        grade = kid_profile.grade_level
-        age = kid_profile.age
 
-        if session.context_type == ChatSession.ContextType.LESSON and session.context_id:
+def _get_system_prompt(session, kid_profile, context=None, question=""):
+    """Build system prompt based on chat context (lesson chats get the sections relevant to `question`)."""
+    kid_name = kid_profile.display_name
+    grade = kid_profile.grade_level
+    age = kid_profile.age
+
+    if session.context_type == ChatSession.ContextType.LESSON and session.context_id:
+        try:
+            lesson = Lesson.objects.get(id=session.context_id)
+            lesson_context = retrieval.relevant_context(lesson, question)
+            return prompts.lesson_system_prompt(kid_name, grade, lesson_context, title=lesson.title)
+        except Lesson.DoesNotExist:
+            pass
+
+    if session.context_type == ChatSession.ContextType.MATH:
+        # Prefer frontend-provided context (has the exact problem the kid sees)
+        if context and context.get("problem_text"):
+            return prompts.math_tutor_system_prompt(
+                kid_name, grade,
+                context["problem_text"],
+                context.get("topic", "math"),
+                evaluation=context.get("evaluation"),
+            )
+
+        # Fallback: look up from DB
+        if session.context_id:
             try:
-                lesson = Lesson.objects.get(id=session.context_id)
-                return prompts.lesson_system_prompt(kid_name, grade, lesson.content[:3000])
-            except Lesson.DoesNotExist:
-                pass
-
-        if session.context_type == ChatSession.ContextType.MATH:
-            # Prefer frontend-provided context (has the exact problem the kid sees)
-            if context and context.get("problem_text"):
-                return prompts.math_tutor_system_prompt(
-                    kid_name, grade,
-                    context["problem_text"],
-                    context.get("topic", "math"),
-                    evaluation=context.get("evaluation"),
-                )
-
-            # Fallback: look up from DB
-            if session.context_id:
+                from mindcraft.math.models import MathPracticeSession
+                practice = MathPracticeSession.objects.get(id=session.context_id)
+                topic = practice.topic
+                latest = practice.attempts.last()
+                problem_text = latest.problem_text if latest else topic
+                return prompts.math_tutor_system_prompt(kid_name, grade, problem_text, topic)
+            except MathPracticeSession.DoesNotExist:
                 try:
-                    from mindcraft.math.models import MathPracticeSession
-                    practice = MathPracticeSession.objects.get(id=session.context_id)
-                    topic = practice.topic
-                    latest = practice.attempts.last()
-                    problem_text = latest.problem_text if latest else topic
-                    return prompts.math_tutor_system_prompt(kid_name, grade, problem_text, topic)
-                except MathPracticeSession.DoesNotExist:
-                    try:
-                        lesson = Lesson.objects.get(id=session.context_id)
-                        topic = lesson.topic.name if lesson.topic else "math"
-                        return prompts.math_tutor_system_prompt(kid_name, grade, lesson.title, topic)
-                    except Lesson.DoesNotExist:
-                        pass
-
-        return prompts.tutor_system_prompt(kid_name, grade, age)
+                    lesson = Lesson.objects.get(id=session.context_id)
+                    topic = lesson.topic.name if lesson.topic else "math"
+                    return prompts.math_tutor_system_prompt(kid_name, grade, lesson.title, topic)
+                except Lesson.DoesNotExist:
+                    pass
+
+    return prompts.tutor_system_prompt(kid_name, grade, age)
+
+
+async def _aload_send_session(request, pk):
+    """Authenticate the token and fetch the session the user may chat in (async ORM)."""
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != TokenAuthentication.keyword.lower().encode():
+        raise AuthenticationFailed("Authentication credentials were not provided.")
+    try:
+        # kid_profile is joined so _sessions_for() does not query
+        token = await Token.objects.select_related("user__kid_profile").aget(key=auth[1].decode())
+    except (Token.DoesNotExist, UnicodeError):
+        raise AuthenticationFailed("Invalid token.")
+    if not token.user.is_active:
+        raise AuthenticationFailed("User inactive or deleted.")
+    return await _sessions_for(token.user).select_related("kid").aget(pk=pk)
+
+
+@csrf_exempt
+@require_POST
+async def send_async(request, pk):
+    """Async variant of ChatSessionViewSet.send, for ASGI deployments.
+
+    Streams the reply over SSE without tying up a worker thread, so one
+    process served from mindcraft.asgi can hold many open chat streams.
+    History and messages go through the async ORM.
+    """
+    try:
+        session = await _aload_send_session(request, pk)
+    except AuthenticationFailed as e:
+        return JsonResponse({"detail": str(e.detail)}, status=401)
+    except ChatSession.DoesNotExist:
+        return JsonResponse({"detail": "Not found."}, status=404)
+    kid_profile = session.kid
+
+    try:
+        body = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    send_serializer = ChatSendSerializer(data=body)
+    if not send_serializer.is_valid():
+        return JsonResponse(send_serializer.errors, status=400)
+    user_message = send_serializer.validated_data["message"]
+
+    # Safety checks
+    allowed, rate_msg = await safety.acheck_rate_limit(kid_profile)
+    if not allowed:
+        return JsonResponse({"error": rate_msg}, status=429)
+
+    valid, validated_msg = safety.validate_kid_message(user_message)
+    if not valid:
+        return JsonResponse({"error": validated_msg}, status=400)
+
+    try:
+        scheduler.admit("chat")
+    except scheduler.AIBusy as e:
+        response = JsonResponse({"error": str(e)}, status=e.status_code)
+        response["Retry-After"] = str(e.retry_after)
+        return response
+
+    await ChatMessage.objects.acreate(
+        session=session,
+        role=ChatMessage.Role.USER,
+        content=validated_msg,
+    )
+    await quota.arecord_message(kid_profile.id, validated_msg)
+
+    context = send_serializer.validated_data.get("context")
+    # Lesson retrieval may (re)index the lesson, so the system prompt is still built on a thread
+    system = await sync_to_async(_get_system_prompt)(session, kid_profile, context=context, question=validated_msg)
+    messages, system = await history.abuild_context(session, system)
+
+    stream = streams.start(session.id)
+    stream.task = asyncio.create_task(
+        _aproduce_reply(stream, session, kid_profile, validated_msg, messages, system)
+    )
+    return _astream_response(stream)
+
+
+@require_GET
+async def resume_async(request, pk):
+    """Async variant of ChatSessionViewSet.resume (Last-Event-ID reconnect), for ASGI deployments."""
+    try:
+        session = await _aload_send_session(request, pk)
+    except AuthenticationFailed as e:
+        return JsonResponse({"detail": str(e.detail)}, status=401)
+    except ChatSession.DoesNotExist:
+        return JsonResponse({"detail": "Not found."}, status=404)
+
+    stream, after = _find_stream(session, _last_event_id(request))
+    if stream is None:
+        return JsonResponse({"error": "No reply stream to resume"}, status=404)
+    return _astream_response(stream, after)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Subject, Topic, Lesson, ResearchSession, ResearchFinding, MediaResource, CurriculumPlan, CurriculumLesson
+from django.db.models import Sum
+from .models import Subject, Topic, Lesson, ResearchSession, ResearchFinding, ResearchCache, MediaResource, CurriculumPlan, CurriculumLesson
 
 
 @admin.register(Subject)
@@ -45,6 +46,30 @@ class ResearchSessionAdmin(admin.ModelAdmin):
     inlines = [ResearchFindingInline, MediaResourceInline]
 
 
+@admin.register(ResearchCache)
+class ResearchCacheAdmin(admin.ModelAdmin):
+    list_display = ["topic_query", "subject", "grade_band", "hits", "fetches", "hit_rate_display", "finding_fetched_at", "last_hit_at"]
+    list_filter = ["subject", "grade_band"]
+    search_fields = ["topic_query", "topic_key"]
+    readonly_fields = ["hits", "fetches", "last_hit_at", "created_at"]
+    actions = ["expire_entries"]
+
+    @admin.display(description="Hit rate")
+    def hit_rate_display(self, obj):
+        return f"{obj.hit_rate:.0%}"
+
+    @admin.action(description="Expire selected entries (next session fetches fresh results)")
+    def expire_entries(self, request, queryset):
+        queryset.update(finding_fetched_at=None, media_fetched_at=None)
+
+    def changelist_view(self, request, extra_context=None):
+        totals = ResearchCache.objects.aggregate(hits=Sum("hits"), fetches=Sum("fetches"))
+        hits, fetches = totals["hits"] or 0, totals["fetches"] or 0
+        rate = hits / (hits + fetches) if hits + fetches else 0
+        extra_context = {**(extra_context or {}), "title": f"Research cache — {rate:.0%} hit rate ({hits} hits, {fetches} fetches)"}
+        return super().changelist_view(request, extra_context)
+
+
 @admin.register(MediaResource)
 class MediaResourceAdmin(admin.ModelAdmin):
     list_display = ["title", "media_type", "source", "is_included", "session"]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ContentConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "mindcraft.content"
+
+    def ready(self):
+        import mindcraft.content.signals  # noqa: F401
@@ -0,0 +1,268 @@
+"""Curriculum outline helpers and the bounded "previous lessons" digest.
+
+Listing every earlier lesson with its objectives makes each lesson prompt
+longer than the last, so a plan's total prompt size grows roughly as n².
+The digest keeps it bounded instead:
+
+    - the last AI_CURRICULUM_CONTEXT_RECENT lessons in detail, with any
+      objective already mentioned dropped
+    - older weeks folded into one line each (theme and lesson titles)
+    - oldest weeks, then oldest detailed lessons, dropped until the digest
+      fits in AI_CURRICULUM_CONTEXT_TOKENS
+
+Everything comes from the outline, so every lesson can be generated at once.
+
+Each generated CurriculumLesson also stores fingerprints of the outline entry
+it came from and of its neighbours, so after the outline is edited
+diff_outline() can tell which lessons are still current, which only moved,
+and which must be regenerated.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+
+from mindcraft.ai_service import generators, prompts
+from mindcraft.ai_service.prompts import estimate_tokens
+
+# Output tokens assumed per lesson when the plan has no generated lessons to average
+DEFAULT_LESSON_OUTPUT_TOKENS = 1500
+
+
+def outline_positions(outline):
+    """List (week_number, lesson_index, lesson_outline) for every lesson, in curriculum order."""
+    positions = []
+    for week in outline.get("weeks", []):
+        week_num = week.get("week_number", 1)
+        for lesson_idx, lesson_outline in enumerate(week.get("lessons", [])):
+            positions.append((week_num, lesson_idx, lesson_outline))
+    return positions
+
+
+def _week_themes(outline):
+    themes = {}
+    for week in outline.get("weeks", []):
+        week_num = week.get("week_number", 1)
+        theme = week.get("title", "")
+        # Outline week titles usually repeat the number ("Week 2: Saving Money")
+        prefix = f"Week {week_num}:"
+        if theme.startswith(prefix):
+            theme = theme[len(prefix):].strip()
+        themes[week_num] = theme
+    return themes
+
+
+def _lesson_line(week_num, lesson_idx, lesson_outline, seen_objectives):
+    objectives = []
+    for objective in lesson_outline.get("learning_objectives", []):
+        key = " ".join(objective.lower().split())
+        if key and key not in seen_objectives:
+            seen_objectives.add(key)
+            objectives.append(objective)
+    line = f"Week {week_num}, Lesson {lesson_idx + 1}: {lesson_outline.get('title', '')}"
+    return f"{line} — {', '.join(objectives)}" if objectives else line
+
+
+def _week_line(week_num, theme, lessons):
+    titles = "; ".join(lo.get("title", "") for _, _, lo in lessons)
+    return f"Week {week_num}{f' ({theme})' if theme else ''}: {titles}"
+
+
+def build_context(outline, week_number, lesson_index, max_tokens=None, recent=None):
+    """Bounded digest of the lessons before (week_number, lesson_index).
+
+    Returns:
+        (previous_lessons_context, upcoming_lesson_title)
+    """
+    max_tokens = settings.AI_CURRICULUM_CONTEXT_TOKENS if max_tokens is None else max_tokens
+    recent = settings.AI_CURRICULUM_CONTEXT_RECENT if recent is None else recent
+
+    positions = outline_positions(outline)
+    current = next(
+        (i for i, (w, idx, _) in enumerate(positions) if w == week_number and idx == lesson_index), len(positions),
+    )
+    upcoming_title = positions[current + 1][2].get("title", "") if current + 1 < len(positions) else ""
+
+    previous = positions[:current]
+    split = max(0, len(previous) - recent)
+    older, detailed = previous[:split], previous[split:]
+
+    themes = _week_themes(outline)
+    weeks = {}
+    for position in older:
+        weeks.setdefault(position[0], []).append(position)
+    # (line, number of lessons it covers)
+    lines = [(_week_line(week_num, themes.get(week_num, ""), lessons), len(lessons)) for week_num, lessons in weeks.items()]
+
+    seen_objectives = set()
+    lines += [(_lesson_line(w, idx, lo, seen_objectives), 1) for w, idx, lo in detailed]
+
+    dropped = 0
+    context = "\n".join(line for line, _ in lines)
+    while estimate_tokens(context) > max_tokens and len(lines) > 1:
+        dropped += lines.pop(0)[1]
+        context = "\n".join([f"(Earlier: {dropped} more lessons covered)"] + [line for line, _ in lines])
+
+    if estimate_tokens(context) > max_tokens:
+        context = context[: max_tokens * 4].rstrip() + "…"
+    return context, upcoming_title
+
+
+def lesson_prompt_kwargs(plan, week_number, lesson_index, lesson_outline):
+    """Arguments for generators.generate_curriculum_lesson for one outline entry."""
+    previous_context, upcoming_title = build_context(plan.outline, week_number, lesson_index)
+    return {
+        "concept": plan.concept,
+        "grade_level": plan.grade_level,
+        "difficulty": plan.difficulty,
+        "week_number": week_number,
+        "lesson_number": lesson_index + 1,
+        "lesson_title": lesson_outline.get("title", f"Week {week_number} Lesson {lesson_index + 1}"),
+        "learning_objectives": lesson_outline.get("learning_objectives", []),
+        "lesson_description": lesson_outline.get("description", ""),
+        "previous_lessons_context": previous_context,
+        "upcoming_lesson_title": upcoming_title,
+    }
+
+
+def _normalize(text):
+    return " ".join(str(text or "").lower().split())
+
+
+def _hash(parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()
+
+
+def lesson_fingerprint(lesson_outline):
+    """Hash of what a lesson is generated from: title, description and objectives."""
+    return _hash([
+        _normalize(lesson_outline.get("title")),
+        _normalize(lesson_outline.get("description")),
+        [_normalize(o) for o in lesson_outline.get("learning_objectives", [])],
+    ])
+
+
+def context_fingerprint(outline, week_number, lesson_index):
+    """Hash of the context a lesson is written against: its week theme and its neighbours.
+
+    Lessons explicitly build on the one before and set up the one after, so a
+    change there is worth a regeneration; edits further away are not.
+    """
+    positions = outline_positions(outline)
+    i = next((i for i, (w, idx, _) in enumerate(positions) if w == week_number and idx == lesson_index), None)
+    if i is None:
+        return ""
+    previous_title = positions[i - 1][2].get("title") if i > 0 else ""
+    next_title = positions[i + 1][2].get("title") if i + 1 < len(positions) else ""
+    return _hash([_normalize(_week_themes(outline).get(week_number)), _normalize(previous_title), _normalize(next_title)])
+
+
+def diff_outline(plan):
+    """Match the plan's outline against its existing CurriculumLessons.
+
+    Existing lessons are matched by content fingerprint first, so reordered
+    lessons are moved rather than regenerated; the rest are matched by
+    position. Lessons generated before fingerprints existed are adopted as-is.
+
+    Returns:
+        (items, removed) — one item per outline lesson:
+            {"week_number", "order", "lesson_outline", "entry", "action", "reason"}
+        where action is "keep", "move" or "generate" and reason is "new",
+        "changed" or "context" for generated items; `removed` lists entries no
+        longer in the outline.
+    """
+    outline = plan.outline or {}
+    entries = list(plan.curriculum_lessons.select_related("lesson").defer("lesson__content"))
+    by_fingerprint = {}
+    for entry in entries:
+        if entry.fingerprint:
+            by_fingerprint.setdefault(entry.fingerprint, []).append(entry)
+    used = set()
+
+    items = []
+    for week_num, lesson_idx, lesson_outline in outline_positions(outline):
+        candidates = [e for e in by_fingerprint.get(lesson_fingerprint(lesson_outline), []) if e.id not in used]
+        entry = next(
+            (e for e in candidates if (e.week_number, e.order) == (week_num, lesson_idx)),
+            candidates[0] if candidates else None,
+        )
+        if entry:
+            used.add(entry.id)
+        items.append({
+            "week_number": week_num, "order": lesson_idx, "lesson_outline": lesson_outline,
+            "entry": entry, "action": "keep", "reason": "",
+        })
+
+    by_position = {(e.week_number, e.order): e for e in entries}
+    for item in items:
+        position = (item["week_number"], item["order"])
+        entry = item["entry"]
+        if entry is None:
+            entry = by_position.get(position)
+            if entry is None or entry.id in used:
+                item.update(action="generate", reason="new", entry=None)
+                continue
+            used.add(entry.id)
+            item["entry"] = entry
+            if entry.fingerprint:
+                item.update(action="generate", reason="changed")
+                continue
+            # Generated before fingerprints were stored: keep it, as generation always used to
+        elif entry.context_fingerprint and entry.context_fingerprint != context_fingerprint(outline, *position):
+            item.update(action="generate", reason="context")
+            continue
+        if (entry.week_number, entry.order) != position:
+            item["action"] = "move"
+
+    removed = [e for e in entries if e.id not in used]
+    return items, removed
+
+
+def estimate_cost(plan, items):
+    """Estimated tokens to generate the "generate" items (prompt from the real prompt text)."""
+    generated = list(plan.curriculum_lessons.exclude(lesson__content="").values_list("lesson__content", flat=True))
+    output_per_lesson = (
+        sum(estimate_tokens(c) for c in generated) // len(generated) if generated else DEFAULT_LESSON_OUTPUT_TOKENS
+    )
+    system_tokens = estimate_tokens(prompts.CURRICULUM_LESSON_PROMPT)
+    input_tokens = output_tokens = 0
+    for item in items:
+        if item["action"] == "generate":
+            kwargs = lesson_prompt_kwargs(plan, item["week_number"], item["order"], item["lesson_outline"])
+            input_tokens += system_tokens + estimate_tokens(generators.curriculum_lesson_message(**kwargs))
+            output_tokens += output_per_lesson
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+def diff_summary(plan, items, removed, prune=False):
+    """JSON-friendly report of an outline diff and what applying it would cost.
+
+    "remove" entries are unlinked from the plan, or deleted when `prune` is set.
+    """
+    summary = {"generate": [], "move": [], "remove": [], "unchanged": 0, "prune": prune}
+    for item in items:
+        entry = item["entry"]
+        if item["action"] == "generate":
+            summary["generate"].append({
+                "week_number": item["week_number"],
+                "order": item["order"],
+                "title": item["lesson_outline"].get("title", ""),
+                "reason": item["reason"],
+                "curriculum_lesson": entry.id if entry else None,
+            })
+        elif item["action"] == "move":
+            summary["move"].append({
+                "curriculum_lesson": entry.id,
+                "title": entry.lesson.title,
+                "from": {"week_number": entry.week_number, "order": entry.order},
+                "to": {"week_number": item["week_number"], "order": item["order"]},
+            })
+        else:
+            summary["unchanged"] += 1
+    summary["remove"] = [
+        {"curriculum_lesson": e.id, "title": e.lesson.title, "week_number": e.week_number, "order": e.order}
+        for e in removed
+    ]
+    summary["estimate"] = estimate_cost(plan, items)
+    return summary
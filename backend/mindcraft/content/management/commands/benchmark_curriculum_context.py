@@ -0,0 +1,96 @@
+"""Compare curriculum lesson prompt sizes with the full and the bounded "previous lessons" context."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mindcraft.ai_service import generators, prompts
+from mindcraft.content import curriculum
+from mindcraft.content.models import CurriculumPlan
+
+# (weeks, lessons per week) for the built-in sample plans
+SAMPLE_PLANS = {4: (2, 2), 10: (5, 2), 15: (5, 3)}
+
+
+def sample_outline(weeks, lessons_per_week):
+    """A synthetic outline with realistic title and objective lengths."""
+    return {
+        "title": "Money Smarts",
+        "weeks": [
+            {
+                "week_number": w,
+                "title": f"Week {w}: Building money skills, part {w}",
+                "lessons": [
+                    {
+                        "title": f"Lesson {w}.{i + 1}: Understanding saving, spending and budgeting step {i + 1}",
+                        "description": "Students explore how people earn, save and spend money in everyday life.",
+                        "learning_objectives": [
+                            f"Explain why people save money for goals like a bike (step {w}.{i + 1})",
+                            f"Compare needs and wants using examples from home and school (step {w}.{i + 1})",
+                            "Use a simple budget table to plan a week of spending",
+                        ],
+                    }
+                    for i in range(lessons_per_week)
+                ],
+            }
+            for w in range(1, weeks + 1)
+        ],
+    }
+
+
+def full_context(outline, week_number, lesson_index):
+    """The unbounded context: every earlier lesson with all of its objectives."""
+    positions = curriculum.outline_positions(outline)
+    parts = []
+    for w, idx, lesson_outline in positions:
+        if (w, idx) == (week_number, lesson_index):
+            break
+        parts.append(f"Week {w}, Lesson {idx + 1}: {lesson_outline.get('title', '')} — {', '.join(lesson_outline.get('learning_objectives', []))}")
+    _, upcoming = curriculum.build_context(outline, week_number, lesson_index)
+    return "\n".join(parts), upcoming
+
+
+class Command(BaseCommand):
+    help = "Benchmark total prompt tokens per curriculum plan with the full vs. bounded lesson context"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=sorted(SAMPLE_PLANS),
+            help=f"Sample plan sizes in lessons ({', '.join(map(str, sorted(SAMPLE_PLANS)))})",
+        )
+        parser.add_argument("--plan", type=int, help="Benchmark an existing CurriculumPlan's outline instead")
+
+    def handle(self, *args, **options):
+        if options["plan"]:
+            try:
+                plan = CurriculumPlan.objects.get(pk=options["plan"])
+            except CurriculumPlan.DoesNotExist:
+                raise CommandError(f"Curriculum plan {options['plan']} not found")
+            plans = [(plan.title or plan.concept, plan.outline, plan.concept, plan.grade_level, plan.difficulty)]
+        else:
+            plans = []
+            for size in options["sizes"]:
+                if size not in SAMPLE_PLANS:
+                    raise CommandError(f"No sample plan with {size} lessons (choose from {sorted(SAMPLE_PLANS)})")
+                plans.append((f"{size} lessons", sample_outline(*SAMPLE_PLANS[size]), "Money Smarts", 4, "medium"))
+
+        system_tokens = prompts.estimate_tokens(prompts.CURRICULUM_LESSON_PROMPT)
+        self.stdout.write(f"{'plan':<20}{'before':>10}{'after':>10}{'saved':>8}{'max ctx before':>16}{'max ctx after':>15}")
+        for name, outline, concept, grade_level, difficulty in plans:
+            totals, max_context = {}, {}
+            for label, builder in (("before", full_context), ("after", curriculum.build_context)):
+                total = peak = 0
+                for week_num, lesson_idx, lesson_outline in curriculum.outline_positions(outline):
+                    context, upcoming = builder(outline, week_num, lesson_idx)
+                    message = generators.curriculum_lesson_message(
+                        concept, grade_level, difficulty, week_num, lesson_idx + 1, lesson_outline.get("title", ""),
+                        lesson_outline.get("learning_objectives", []), lesson_outline.get("description", ""),
+                        context, upcoming,
+                    )
+                    total += system_tokens + prompts.estimate_tokens(message)
+                    peak = max(peak, prompts.estimate_tokens(context) if context else 0)
+                totals[label], max_context[label] = total, peak
+
+            saved = 1 - totals["after"] / totals["before"] if totals["before"] else 0
+            self.stdout.write(
+                f"{name:<20}{totals['before']:>10}{totals['after']:>10}{saved:>8.0%}"
+                f"{max_context['before']:>16}{max_context['after']:>15}"
+            )
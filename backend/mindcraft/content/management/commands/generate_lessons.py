@@ -0,0 +1,86 @@
+"""Generate many draft lessons from a list of topics."""
+
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from mindcraft.content import tasks
+from mindcraft.content.serializers import BulkLessonGenerateSerializer
+
+
+class Command(BaseCommand):
+    help = "Bulk-generate draft lessons (skips lessons already generated from the same topic, grade and difficulty)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("topics", nargs="*", help="Lesson topics")
+        parser.add_argument(
+            "--file",
+            help='JSON file: a list of topics / {"topic", "grade_level", "difficulty", "topic_id"} items, '
+                 'or a full request ({"lessons": [...], "subject", ...})',
+        )
+        parser.add_argument("--subject", type=int, help="Subject id for topics without a topic id")
+        parser.add_argument("--topic-id", type=int, help="File every lesson under this Topic")
+        parser.add_argument("--grade", type=int, help="Default grade level (1-12)")
+        parser.add_argument("--difficulty", choices=["easy", "medium", "hard"], help="Default difficulty")
+        parser.add_argument("--user", help="Username recorded as the lessons' creator")
+        parser.add_argument("--concurrency", type=int, help="Lessons generated at the same time")
+
+    def handle(self, *args, **options):
+        request = {}
+        lessons = list(options["topics"])
+        if options["file"]:
+            try:
+                with open(options["file"]) as f:
+                    loaded = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['file']}: {e}")
+            if isinstance(loaded, dict):
+                request = loaded
+                lessons = request.get("lessons", []) + lessons
+            else:
+                lessons = loaded + lessons
+
+        items = [{"topic": item} if isinstance(item, str) else item for item in lessons]
+        if options["topic_id"]:
+            items = [{"topic_id": options["topic_id"], **item} for item in items]
+        request["lessons"] = items
+        for key, option in (("subject", "subject"), ("grade_level", "grade"), ("difficulty", "difficulty")):
+            if options[option] is not None:
+                request[key] = options[option]
+
+        serializer = BulkLessonGenerateSerializer(data=request)
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors))
+
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} not found")
+
+        topics = [item["topic"] for item in serializer.validated_data["lessons"]]
+        for event in tasks.generate_lessons_bulk(serializer.validated_data, user=user, concurrency=options["concurrency"]):
+            if event["type"] == "start":
+                self.stdout.write(f"Generating {event['total']} lessons...")
+            elif event["type"] == "item":
+                label = f"  [{event['index'] + 1}] {event['topic']}"
+                if event["status"] == "generated":
+                    self.stdout.write(f"{label}: {event['title']}")
+                elif event["status"] == "skipped":
+                    reason = (
+                        f"lesson {event['lesson_id']} exists" if "lesson_id" in event
+                        else f"same as [{event['duplicate_of'] + 1}]"
+                    )
+                    self.stdout.write(f"{label}: skipped ({reason})")
+                else:
+                    self.stderr.write(f"{label}: failed ({event['error']})")
+            elif event["type"] == "saved":
+                self.stdout.write(f"  saved {len(event['lesson_ids'])} lessons")
+                for index, lesson_id in event["skipped"].items():
+                    self.stdout.write(f"  [{index + 1}] {topics[index]}: skipped (title taken by lesson {lesson_id})")
+            elif event["type"] == "done":
+                self.stdout.write(self.style.SUCCESS(
+                    f"Done: {event['generated']} generated, {event['skipped']} skipped, {event['failed']} failed"
+                ))
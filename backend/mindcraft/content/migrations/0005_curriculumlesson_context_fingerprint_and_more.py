@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0004_curriculumplan_curriculumlesson"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="curriculumlesson",
+            name="context_fingerprint",
+            field=models.CharField(blank=True, default="", help_text="Hash of its week theme and neighbouring lessons", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="curriculumlesson",
+            name="fingerprint",
+            field=models.CharField(blank=True, default="", help_text="Hash of the outline entry it was generated from", max_length=64),
+        ),
+    ]
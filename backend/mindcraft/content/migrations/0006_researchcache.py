@@ -0,0 +1,37 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0005_curriculumlesson_context_fingerprint_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResearchCache",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("topic_key", models.CharField(help_text="Normalized topic query", max_length=300)),
+                ("grade_band", models.CharField(max_length=10)),
+                ("topic_query", models.CharField(help_text="Query the entry was first fetched for", max_length=300)),
+                ("finding", models.JSONField(blank=True, help_text="research_topic() result", null=True)),
+                ("finding_fetched_at", models.DateTimeField(blank=True, null=True)),
+                ("media", models.JSONField(blank=True, help_text="discover_multimedia() result", null=True)),
+                ("media_fetched_at", models.DateTimeField(blank=True, null=True)),
+                ("hits", models.IntegerField(default=0)),
+                ("fetches", models.IntegerField(default=0)),
+                ("last_hit_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("subject", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="research_cache", to="content.subject")),
+            ],
+            options={
+                "verbose_name_plural": "research cache",
+                "ordering": ["-created_at"],
+                "unique_together": {("subject", "topic_key", "grade_band")},
+            },
+        ),
+    ]
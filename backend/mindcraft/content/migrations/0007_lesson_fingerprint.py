@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0006_researchcache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="fingerprint",
+            field=models.CharField(blank=True, db_index=True, default="", help_text="Hash of the bulk generation request (topic, grade, difficulty) it came from", max_length=64),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0007_lesson_fingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LessonSection",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("order", models.IntegerField(default=0)),
+                ("heading", models.CharField(blank=True, help_text="Heading path, e.g. Main Content › Volcanoes", max_length=300)),
+                ("content", models.TextField(help_text="Section Markdown, heading included")),
+                ("terms", models.JSONField(default=dict, help_text="Term -> count in the heading and content")),
+                ("length", models.IntegerField(default=0, help_text="Number of terms")),
+                ("tokens", models.IntegerField(default=0, help_text="Estimated prompt tokens of the content")),
+                ("lesson", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="sections", to="content.lesson")),
+            ],
+            options={
+                "ordering": ["lesson", "order"],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0008_lessonsection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="researchsession",
+            name="media_error",
+            field=models.TextField(blank=True, default="", help_text="Why the last media discovery failed"),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.1.2 on 2026-10-17 08:23
+
+from django.db import migrations, models
+
+
+def clear_duplicate_fingerprints(apps, schema_editor):
+    # Keep the oldest lesson of each duplicate; the others lose their fingerprint (and the constraints with it)
+    Lesson = apps.get_model("content", "Lesson")
+    fingerprints, titles, duplicates = set(), set(), []
+    for lesson_id, fingerprint, topic_id, title in (
+        Lesson.objects.exclude(fingerprint="").order_by("id").values_list("id", "fingerprint", "topic_id", "title")
+    ):
+        if fingerprint in fingerprints or (topic_id, title) in titles:
+            duplicates.append(lesson_id)
+        else:
+            fingerprints.add(fingerprint)
+            titles.add((topic_id, title))
+    Lesson.objects.filter(id__in=duplicates).update(fingerprint="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("content", "0009_researchsession_media_error"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_fingerprints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="lesson",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("fingerprint", ""), _negated=True),
+                fields=("fingerprint",),
+                name="unique_lesson_fingerprint",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="lesson",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("fingerprint", ""), _negated=True),
+                fields=("topic", "title"),
+                name="unique_generated_lesson_title",
+            ),
+        ),
+    ]
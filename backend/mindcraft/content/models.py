@@ -53,17 +53,48 @@ class Lesson(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="created_lessons")
     ai_generated = models.BooleanField(default=False)
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.DRAFT)
+    fingerprint = models.CharField(
+        max_length=64, blank=True, default="", db_index=True,
+        help_text="Hash of the bulk generation request (topic, grade, difficulty) it came from",
+    )
     assigned_to = models.ManyToManyField("core.KidProfile", blank=True, related_name="assigned_lessons")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            # Bulk-generated lessons (the ones with a fingerprint): one per request, one per topic and title
+            models.UniqueConstraint(
+                fields=["fingerprint"], condition=~models.Q(fingerprint=""), name="unique_lesson_fingerprint",
+            ),
+            models.UniqueConstraint(
+                fields=["topic", "title"], condition=~models.Q(fingerprint=""), name="unique_generated_lesson_title",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class LessonSection(models.Model):
+    """A Markdown section of a lesson with its BM25 term counts, rebuilt when the lesson is saved."""
+
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="sections")
+    order = models.IntegerField(default=0)
+    heading = models.CharField(max_length=300, blank=True, help_text="Heading path, e.g. Main Content › Volcanoes")
+    content = models.TextField(help_text="Section Markdown, heading included")
+    terms = models.JSONField(default=dict, help_text="Term -> count in the heading and content")
+    length = models.IntegerField(default=0, help_text="Number of terms")
+    tokens = models.IntegerField(default=0, help_text="Estimated prompt tokens of the content")
+
+    class Meta:
+        ordering = ["lesson", "order"]
+
+    def __str__(self):
+        return f"{self.lesson.title} § {self.heading or self.order}"
+
+
 class ResearchSession(models.Model):
     class PipelineStatus(models.TextChoices):
         TOPIC_INPUT = "topic_input", "Topic Input"
@@ -82,6 +113,7 @@ class ResearchSession(models.Model):
     difficulty = models.CharField(max_length=10, choices=Lesson.Difficulty.choices, default=Lesson.Difficulty.MEDIUM)
     status = models.CharField(max_length=20, choices=PipelineStatus.choices, default=PipelineStatus.TOPIC_INPUT)
     lesson = models.OneToOneField(Lesson, on_delete=models.SET_NULL, null=True, blank=True, related_name="research_session")
+    media_error = models.TextField(blank=True, default="", help_text="Why the last media discovery failed")
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="research_sessions")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -107,6 +139,36 @@ class ResearchFinding(models.Model):
         return f"Findings for: {self.session.topic_query}"
 
 
+class ResearchCache(models.Model):
+    """Perplexity results shared by sessions on the same topic, subject and grade band."""
+
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name="research_cache")
+    topic_key = models.CharField(max_length=300, help_text="Normalized topic query")
+    grade_band = models.CharField(max_length=10)
+    topic_query = models.CharField(max_length=300, help_text="Query the entry was first fetched for")
+    finding = models.JSONField(null=True, blank=True, help_text="research_topic() result")
+    finding_fetched_at = models.DateTimeField(null=True, blank=True)
+    media = models.JSONField(null=True, blank=True, help_text="discover_multimedia() result")
+    media_fetched_at = models.DateTimeField(null=True, blank=True)
+    hits = models.IntegerField(default=0)
+    fetches = models.IntegerField(default=0)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        unique_together = ["subject", "topic_key", "grade_band"]
+        verbose_name_plural = "research cache"
+
+    def __str__(self):
+        return f"{self.topic_query} ({self.subject}, grades {self.grade_band})"
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.fetches
+        return self.hits / total if total else 0.0
+
+
 class MediaResource(models.Model):
     class MediaType(models.TextChoices):
         YOUTUBE = "youtube", "YouTube"
@@ -174,6 +236,8 @@ class CurriculumLesson(models.Model):
     week_number = models.IntegerField()
     order = models.IntegerField(default=0, help_text="Order within the week")
     learning_objectives = models.TextField(blank=True)
+    fingerprint = models.CharField(max_length=64, blank=True, default="", help_text="Hash of the outline entry it was generated from")
+    context_fingerprint = models.CharField(max_length=64, blank=True, default="", help_text="Hash of its week theme and neighbouring lessons")
 
     class Meta:
         ordering = ["week_number", "order"]
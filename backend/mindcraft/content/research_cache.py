@@ -0,0 +1,88 @@
+"""Reuse Perplexity research and media across sessions.
+
+Sessions on the same topic (after normalization), subject and grade band
+share one ResearchCache entry, so siblings in adjacent grades researching
+"How do volcanoes work?" and "how volcanoes work" pay for one call. Entries
+are fresh for AI_RESEARCH_CACHE_DAYS (0 disables the cache); callers pass
+refresh=True to fetch again and overwrite the entry.
+"""
+
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ResearchCache
+
+GRADE_BANDS = ((1, 2), (3, 5), (6, 8), (9, 12))
+
+STOP_WORDS = {
+    "a", "an", "and", "the", "of", "for", "to", "in", "on", "about", "is", "are",
+    "how", "what", "why", "do", "does", "they", "it", "its", "we", "with",
+    "learn", "learning", "kids", "intro", "introduction",
+}
+
+# ResearchCache field pairs per kind of result
+FIELDS = {
+    "finding": ("finding", "finding_fetched_at"),
+    "media": ("media", "media_fetched_at"),
+}
+
+
+def enabled() -> bool:
+    return settings.AI_RESEARCH_CACHE_DAYS > 0
+
+
+def normalize_topic(topic_query: str) -> str:
+    """Order-insensitive key: lowercase words without punctuation, stop words or plural -s."""
+    words = set()
+    for word in re.findall(r"[a-z0-9]+", topic_query.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return " ".join(sorted(words)) or topic_query.strip().lower()
+
+
+def grade_band(grade_level: int) -> str:
+    for low, high in GRADE_BANDS:
+        if grade_level <= high:
+            return f"{low}-{high}"
+    low, high = GRADE_BANDS[-1]
+    return f"{low}-{high}"
+
+
+def _key(session):
+    return {
+        "subject_id": session.subject_id,
+        "topic_key": normalize_topic(session.topic_query)[:300],
+        "grade_band": grade_band(session.grade_level),
+    }
+
+
+def lookup(session, kind: str):
+    """Return the cached "finding" or "media" for a session, or None if missing or stale."""
+    if not enabled():
+        return None
+    data_field, fetched_field = FIELDS[kind]
+    fresh_after = timezone.now() - timedelta(days=settings.AI_RESEARCH_CACHE_DAYS)
+    entry = ResearchCache.objects.filter(**_key(session), **{f"{fetched_field}__gte": fresh_after}).first()
+    if entry is None or getattr(entry, data_field) is None:
+        return None
+    ResearchCache.objects.filter(id=entry.id).update(hits=F("hits") + 1, last_hit_at=timezone.now())
+    return getattr(entry, data_field)
+
+
+def store(session, kind: str, data):
+    """Save a freshly fetched "finding" or "media" result for the session's key."""
+    if not enabled():
+        return
+    data_field, fetched_field = FIELDS[kind]
+    entry, _ = ResearchCache.objects.get_or_create(**_key(session), defaults={"topic_query": session.topic_query})
+    setattr(entry, data_field, data)
+    setattr(entry, fetched_field, timezone.now())
+    entry.fetches = F("fetches") + 1
+    entry.save(update_fields=[data_field, fetched_field, "fetches"])
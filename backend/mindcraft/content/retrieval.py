@@ -0,0 +1,169 @@
+"""Pick the parts of a lesson relevant to a kid's question.
+
+Lesson Markdown is split at its headings (the generators emit "## 🎯 What
+You'll Learn", "## 📖 Main Content" with "###" subheadings, ...) into
+LessonSection rows holding each section's term counts; oversized sections
+are split again at paragraph breaks. The rows are rebuilt whenever a lesson
+is saved with new content, so a chat turn only loads them and scores them
+with BM25 (IDF over the lesson's own sections) against the question, then
+takes the best AI_LESSON_CONTEXT_SECTIONS sections that fit in
+AI_LESSON_CONTEXT_TOKENS, in lesson order. A question matching nothing
+("I don't get it") gets the start of the lesson instead.
+"""
+
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from mindcraft.ai_service.prompts import estimate_tokens
+from .models import LessonSection
+
+# BM25 parameters (the usual defaults)
+K1 = 1.5
+B = 0.75
+
+# Sections longer than this are split at paragraph breaks
+SECTION_MAX_TOKENS = 300
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+STOP_WORDS = {
+    "a", "an", "and", "the", "of", "for", "to", "in", "on", "at", "by", "with", "from", "about",
+    "is", "are", "was", "were", "be", "been", "it", "its", "this", "that", "these", "those",
+    "i", "me", "my", "you", "your", "we", "our", "they", "them", "their", "he", "she",
+    "do", "does", "did", "can", "could", "would", "should", "will", "what", "why", "how",
+    "when", "where", "which", "who", "so", "but", "or", "if", "not", "no", "yes", "just",
+    "get", "got", "dont", "don", "t", "s", "there", "here", "some", "any", "more", "very",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words without stop words or plural -s (as research_cache.normalize_topic)."""
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text.lower().replace("'", "")):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def split_sections(markdown: str) -> list[tuple[str, str]]:
+    """Split lesson Markdown into (heading path, text) sections at its headings."""
+    sections = []
+    path = []  # (level, title) of the enclosing headings
+    lines = []
+
+    def close():
+        text = "\n".join(lines).strip()
+        body = [line for line in lines if line.strip() and not HEADING.match(line)]
+        if body:
+            sections.append((" › ".join(title for _, title in path), text))
+        lines.clear()
+
+    for line in markdown.splitlines():
+        match = HEADING.match(line)
+        if match:
+            close()
+            level = len(match.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, match.group(2)))
+        lines.append(line)
+    close()
+
+    split = []
+    for heading, text in sections:
+        first, *rest = _split_long(text)
+        split.append((heading, first))
+        # Continuations repeat the heading line so each section reads on its own
+        heading_line = first.splitlines()[0] if HEADING.match(first.splitlines()[0]) else ""
+        split.extend((heading, f"{heading_line}\n\n{part}" if heading_line else part) for part in rest)
+    return split
+
+
+def _split_long(text):
+    if estimate_tokens(text) <= SECTION_MAX_TOKENS:
+        return [text]
+    parts, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        if current and estimate_tokens(current) + estimate_tokens(paragraph) > SECTION_MAX_TOKENS:
+            parts.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        parts.append(current)
+    return parts
+
+
+def index_lesson(lesson):
+    """Rebuild the lesson's sections from its content."""
+    sections = []
+    for order, (heading, text) in enumerate(split_sections(lesson.content or "")):
+        words = tokenize(f"{heading} {text}")
+        sections.append(LessonSection(
+            lesson_id=lesson.id,
+            order=order,
+            heading=heading[:300],
+            content=text,
+            terms=dict(Counter(words)),
+            length=len(words),
+            tokens=estimate_tokens(text),
+        ))
+    with transaction.atomic():
+        LessonSection.objects.filter(lesson_id=lesson.id).delete()
+        LessonSection.objects.bulk_create(sections)
+    return sections
+
+
+def _score(sections, query_terms):
+    """BM25 score of each section for the query terms."""
+    n = len(sections)
+    avg_length = sum(s.length for s in sections) / n or 1
+    scores = [0.0] * n
+    for term in set(query_terms):
+        df = sum(1 for s in sections if term in s.terms)
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for i, section in enumerate(sections):
+            tf = section.terms.get(term, 0)
+            if tf:
+                scores[i] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * section.length / avg_length))
+    return scores
+
+
+def relevant_context(lesson, question: str, max_tokens=None, max_sections=None) -> str:
+    """The lesson sections most relevant to `question`, joined in lesson order, within a token budget."""
+    max_tokens = settings.AI_LESSON_CONTEXT_TOKENS if max_tokens is None else max_tokens
+    max_sections = settings.AI_LESSON_CONTEXT_SECTIONS if max_sections is None else max_sections
+
+    sections = list(LessonSection.objects.filter(lesson_id=lesson.id))
+    if not sections and lesson.content:
+        # Lessons saved before indexing existed, or written with .update()
+        sections = index_lesson(lesson)
+    if not sections:
+        return ""
+
+    scores = _score(sections, tokenize(question))
+    ranked = sorted((i for i in range(len(sections)) if scores[i] > 0), key=lambda i: -scores[i])
+    if not ranked:
+        ranked = range(len(sections))  # nothing matched: start of the lesson
+
+    picked, used = [], 0
+    for i in ranked:
+        if len(picked) == max_sections:
+            break
+        if used + sections[i].tokens > max_tokens:
+            continue
+        picked.append(i)
+        used += sections[i].tokens
+    if not picked:
+        # Even the best section is over budget: send its beginning
+        best = sections[ranked[0]]
+        return best.content[: max_tokens * 4]
+    return "\n\n".join(sections[i].content for i in sorted(picked))
@@ -17,6 +17,7 @@ class TopicSerializer(serializers.ModelSerializer):
 
 
 class LessonListSerializer(serializers.ModelSerializer):
+    """Expects the LessonViewSet queryset: topic/subject joined and `active_quiz_id` annotated."""
     topic_name = serializers.CharField(source="topic.name", read_only=True)
     subject_name = serializers.CharField(source="topic.subject.name", read_only=True)
     subject_icon = serializers.CharField(source="topic.subject.icon", read_only=True)
@@ -33,11 +34,10 @@ class LessonListSerializer(serializers.ModelSerializer):
         ]
 
     def get_has_quiz(self, obj):
-        return obj.quizzes.filter(is_active=True).exists()
+        return obj.active_quiz_id is not None
 
     def get_quiz_id(self, obj):
-        quiz = obj.quizzes.filter(is_active=True).first()
-        return quiz.id if quiz else None
+        return obj.active_quiz_id
 
 
 class LessonDetailSerializer(serializers.ModelSerializer):
@@ -58,29 +58,20 @@ class LessonDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_has_quiz(self, obj):
-        return obj.quizzes.filter(is_active=True).exists()
+        return obj.active_quiz_id is not None
 
     def get_quiz_id(self, obj):
-        quiz = obj.quizzes.filter(is_active=True).first()
-        return quiz.id if quiz else None
+        return obj.active_quiz_id
 
     def get_quiz_best_score(self, obj):
-        request = self.context.get("request")
-        if not request or not hasattr(request.user, "kid_profile"):
-            return None
-        from mindcraft.quiz.models import QuizAttempt
-        quiz = obj.quizzes.filter(is_active=True).first()
-        if not quiz:
-            return None
-        attempt = QuizAttempt.objects.filter(
-            quiz=quiz, kid=request.user.kid_profile, completed_at__isnull=False
-        ).order_by("-score").first()
+        # Only annotated for kids (see LessonViewSet.get_queryset)
+        attempt = getattr(obj, "best_attempt", None)
         if not attempt:
             return None
         return {
-            "score": attempt.score,
-            "max_score": attempt.max_score,
-            "percentage": round(attempt.score / attempt.max_score * 100) if attempt.max_score > 0 else 0,
+            "score": attempt["score"],
+            "max_score": attempt["max_score"],
+            "percentage": round(attempt["score"] / attempt["max_score"] * 100) if attempt["max_score"] > 0 else 0,
         }
 
 
@@ -123,7 +114,7 @@ class ResearchSessionListSerializer(serializers.ModelSerializer):
         model = ResearchSession
         fields = [
             "id", "subject_name", "subject_icon", "topic_name", "topic_query",
-            "grade_level", "difficulty", "status", "lesson_id", "created_at", "updated_at",
+            "grade_level", "difficulty", "status", "lesson_id", "media_error", "created_at", "updated_at",
         ]
 
 
@@ -139,7 +130,7 @@ class ResearchSessionDetailSerializer(serializers.ModelSerializer):
         model = ResearchSession
         fields = [
             "id", "subject", "subject_name", "subject_icon", "topic", "topic_name",
-            "topic_query", "grade_level", "difficulty", "status", "lesson_id",
+            "topic_query", "grade_level", "difficulty", "status", "lesson_id", "media_error",
             "finding", "media_resources", "created_at", "updated_at",
         ]
 
@@ -151,6 +142,33 @@ class ResearchSessionCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "status"]
 
 
+class BulkLessonItemSerializer(serializers.Serializer):
+    topic = serializers.CharField(max_length=300)
+    grade_level = serializers.IntegerField(min_value=1, max_value=12, required=False)
+    difficulty = serializers.ChoiceField(choices=Lesson.Difficulty.choices, required=False)
+    topic_id = serializers.PrimaryKeyRelatedField(queryset=Topic.objects.all(), required=False, allow_null=True)
+
+
+class BulkLessonGenerateSerializer(serializers.Serializer):
+    """Bulk lesson generation request; items without a topic_id are filed under `subject`."""
+    lessons = BulkLessonItemSerializer(many=True, allow_empty=False)
+    subject = serializers.PrimaryKeyRelatedField(queryset=Subject.objects.all(), required=False, allow_null=True)
+    grade_level = serializers.IntegerField(min_value=1, max_value=12, default=5)
+    difficulty = serializers.ChoiceField(choices=Lesson.Difficulty.choices, default=Lesson.Difficulty.MEDIUM)
+
+    MAX_LESSONS = 50
+
+    def validate_lessons(self, value):
+        if len(value) > self.MAX_LESSONS:
+            raise serializers.ValidationError(f"At most {self.MAX_LESSONS} lessons per request")
+        return value
+
+    def validate(self, data):
+        if not data.get("subject") and any(not item.get("topic_id") for item in data["lessons"]):
+            raise serializers.ValidationError({"subject": "Required for lessons without a topic_id"})
+        return data
+
+
 class CurriculumLessonSerializer(serializers.ModelSerializer):
     lesson_title = serializers.CharField(source="lesson.title", read_only=True, default="")
     lesson_status = serializers.CharField(source="lesson.status", read_only=True, default="")
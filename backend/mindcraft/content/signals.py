@@ -0,0 +1,26 @@
+"""Keep lesson sections (chat retrieval index) in step with lesson content."""
+
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from mindcraft.content import retrieval
+from mindcraft.content.models import Lesson
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_saving(sender, instance, update_fields=None, **kwargs):
+    # Sections are built from the content alone (headings included), so other edits
+    # (status, title, review notes) keep the index as it is
+    if update_fields is not None and "content" not in update_fields:
+        instance._reindex = False
+    elif instance.pk is None:
+        instance._reindex = True
+    else:
+        previous = Lesson.objects.filter(pk=instance.pk).values_list("content", flat=True).first()
+        instance._reindex = previous != instance.content
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created=False, **kwargs):
+    if created or getattr(instance, "_reindex", True):
+        retrieval.index_lesson(instance)
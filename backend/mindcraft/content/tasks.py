@@ -0,0 +1,878 @@
+"""Research pipeline and curriculum steps.
+
+Each step drives the ResearchSession.PipelineStatus / CurriculumPlan.Status
+state machine: it sets the in-progress status, does the AI work, and either
+advances to the next status or rolls back and re-raises. The viewsets run
+them inline, or hand them to the job worker (mindcraft.jobs) when a request
+asks for background processing.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+
+from mindcraft.ai_service import generators
+from mindcraft.ai_service import research as research_service
+from . import curriculum, research_cache, retrieval
+from .models import Subject, Topic, Lesson, ResearchSession, ResearchFinding, MediaResource, CurriculumPlan, CurriculumLesson
+
+logger = logging.getLogger(__name__)
+
+# Finished bulk-generated lessons are inserted in batches of this size
+BULK_SAVE_BATCH = 10
+
+
+def save_finding(session, result):
+    """Store research_service.research_topic output as the session's finding."""
+    ResearchFinding.objects.update_or_create(
+        session=session,
+        defaults={
+            "summary": result["summary"],
+            "key_facts": result["key_facts"],
+            "citations": result["citations"],
+            "raw_response": result["raw_response"],
+        },
+    )
+
+
+def save_media(session, resources):
+    """Store research_service.discover_multimedia output as the session's media resources.
+
+    URLs the session already has are skipped, so re-running discovery does
+    not duplicate resources.
+    """
+    known_urls = set(session.media_resources.values_list("url", flat=True))
+    for i, r in enumerate(resources):
+        if r["url"] in known_urls:
+            continue
+        known_urls.add(r["url"])
+        MediaResource.objects.create(
+            session=session,
+            url=r["url"],
+            title=r["title"],
+            description=r.get("description", ""),
+            media_type=r.get("media_type", "other"),
+            source=MediaResource.Source.AUTO,
+            thumbnail_url=r.get("thumbnail_url", ""),
+            order=i,
+        )
+
+    # Link discovered media to the lesson if one already exists
+    if session.lesson:
+        session.media_resources.filter(is_included=True, lesson__isnull=True).update(lesson=session.lesson)
+
+
+def research_session(session, refresh=False):
+    """Run Perplexity research on the session topic (or reuse a cached finding)."""
+    session.status = ResearchSession.PipelineStatus.RESEARCHING
+    session.save()
+
+    try:
+        result = None if refresh else research_cache.lookup(session, "finding")
+        if result is None:
+            result = research_service.research_topic(
+                topic=session.topic_query,
+                grade_level=session.grade_level,
+                subject=session.subject.name,
+            )
+            research_cache.store(session, "finding", result)
+
+        save_finding(session, result)
+
+        session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+        session.save()
+    except Exception:
+        logger.exception("Research failed for session %s", session.id)
+        session.status = ResearchSession.PipelineStatus.TOPIC_INPUT
+        session.save()
+        raise
+
+
+def _session_lesson_kwargs(session):
+    """generators.generate_lesson_from_research arguments for a session."""
+    finding = session.finding
+    media_qs = session.media_resources.filter(is_included=True)
+    media_data = [
+        {"title": m.title, "media_type": m.media_type, "url": m.url}
+        for m in media_qs
+    ]
+    return {
+        "topic": session.topic_query,
+        "grade_level": session.grade_level,
+        "difficulty": session.difficulty,
+        "research_summary": finding.summary,
+        "key_facts": finding.key_facts,
+        "citations": finding.citations,
+        "media_resources": media_data,
+        "parent_notes": finding.parent_notes,
+    }
+
+
+def _session_topic(session):
+    """Create or get the topic for the session's lesson."""
+    topic_obj = session.topic
+    if not topic_obj:
+        topic_obj, _ = Topic.objects.get_or_create(
+            subject=session.subject,
+            name=session.topic_query,
+            defaults={"description": f"Auto-created topic for: {session.topic_query}"},
+        )
+        session.topic = topic_obj
+    return topic_obj
+
+
+def generate_session_lesson(session):
+    """Generate a lesson from the session's research findings."""
+    session.status = ResearchSession.PipelineStatus.GENERATING
+    session.save()
+
+    try:
+        result = generators.generate_lesson_from_research(**_session_lesson_kwargs(session))
+
+        lesson = Lesson.objects.create(
+            topic=_session_topic(session),
+            title=result["title"],
+            description=result["description"],
+            content=result["content"],
+            grade_level=session.grade_level,
+            difficulty=session.difficulty,
+            estimated_minutes=result["estimated_minutes"],
+            created_by=session.created_by,
+            ai_generated=True,
+            status=Lesson.Status.DRAFT,
+        )
+
+        # Link media resources to the lesson
+        session.media_resources.filter(is_included=True).update(lesson=lesson)
+
+        session.lesson = lesson
+        session.status = ResearchSession.PipelineStatus.GENERATED
+        session.save()
+    except Exception:
+        logger.exception("Lesson generation failed for session %s", session.id)
+        session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+        session.save()
+        raise
+
+
+def discover_session_media(session, refresh=False):
+    """Discover multimedia resources for the session topic (or reuse cached ones)."""
+    session.status = ResearchSession.PipelineStatus.ENRICHING
+    session.save()
+
+    try:
+        resources = None if refresh else research_cache.lookup(session, "media")
+        if resources is None:
+            resources = research_service.discover_multimedia(
+                topic=session.topic_query,
+                grade_level=session.grade_level,
+                subject=session.subject.name,
+            )
+            research_cache.store(session, "media", resources)
+
+        save_media(session, resources)
+
+        session.status = ResearchSession.PipelineStatus.READY
+        session.media_error = ""
+        session.save()
+    except Exception as e:
+        logger.exception("Media discovery failed for session %s", session.id)
+        session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+        session.media_error = str(e)
+        session.save()
+        raise
+
+
+def seed_from_cache(session):
+    """Fill a new session from the research cache; returns whether a cached finding was found.
+
+    The session skips straight to RESEARCH_COMPLETE with the cached finding
+    and, if there is one, the cached media.
+    """
+    finding = research_cache.lookup(session, "finding")
+    if finding is None:
+        return False
+    save_finding(session, finding)
+    media = research_cache.lookup(session, "media")
+    if media is not None:
+        save_media(session, media)
+    session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+    session.save(update_fields=["status", "updated_at"])
+    return True
+
+
+def research_sessions(sessions, enrich=True, refresh=False):
+    """Research (and optionally discover media for) several sessions concurrently.
+
+    Cached results are used straight away (unless `refresh`); every remaining
+    Perplexity call — research and media discovery for each session — runs
+    at the same time, AI_RESEARCH_CONCURRENCY at a time (the scheduler's
+    "research" workload caps it further). Results are saved on this thread as
+    they arrive: a session is RESEARCH_COMPLETE as soon as its finding is
+    saved, whether or not media discovery is still running. Failed research
+    rolls the session back to TOPIC_INPUT; failed media discovery only loses
+    the media and is recorded in the session's media_error, as with
+    discover_session_media.
+
+    Returns:
+        {session_id: {"error": Exception | None, "media_error": Exception | None}}
+    """
+    outcomes = {session.id: {"error": None, "media_error": None} for session in sessions}
+    started = {"status": ResearchSession.PipelineStatus.RESEARCHING}
+    if enrich:
+        started["media_error"] = ""
+    ResearchSession.objects.filter(id__in=outcomes).update(**started)
+
+    def record(session, step, result=None, error=None):
+        if step == "error":
+            if error is not None:
+                outcomes[session.id]["error"] = error
+                session.status = ResearchSession.PipelineStatus.TOPIC_INPUT
+            else:
+                save_finding(session, result)
+                session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+            session.save(update_fields=["status", "updated_at"])
+        elif error is not None:
+            outcomes[session.id]["media_error"] = error
+            session.media_error = str(error)
+            session.save(update_fields=["media_error", "updated_at"])
+        else:
+            save_media(session, result)
+
+    steps = [("error", "finding", research_service.research_topic)]
+    if enrich:
+        steps.append(("media_error", "media", research_service.discover_multimedia))
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, settings.AI_RESEARCH_CONCURRENCY), thread_name_prefix="research",
+    ) as executor:
+        futures = {}
+        for session in sessions:
+            args = {"topic": session.topic_query, "grade_level": session.grade_level, "subject": session.subject.name}
+            for step, kind, fetch in steps:
+                cached = None if refresh else research_cache.lookup(session, kind)
+                if cached is not None:
+                    record(session, step, cached)
+                else:
+                    futures[executor.submit(fetch, **args)] = (session, step, kind)
+
+        for future in as_completed(futures):
+            session, step, kind = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.exception("%s failed for session %s", "Research" if step == "error" else "Media discovery", session.id)
+                record(session, step, error=e)
+            else:
+                research_cache.store(session, kind, result)
+                record(session, step, result)
+
+    return outcomes
+
+
+def research_and_enrich(session, refresh=False):
+    """Run research and media discovery for one session at the same time.
+
+    Raises the research error if research failed. A media discovery failure
+    is returned instead, since the session is still usable without media.
+    """
+    outcome = research_sessions([session], refresh=refresh)[session.id]
+    if outcome["error"]:
+        raise outcome["error"]
+    return outcome["media_error"]
+
+
+class _PartialText:
+    """Accumulates streamed text and saves it every AI_STREAM_SAVE_INTERVAL seconds."""
+
+    def __init__(self, save):
+        self.text = ""
+        self._save = save
+        self._saved_len = 0
+        self._last_save = time.monotonic()
+
+    def add(self, chunk):
+        self.text += chunk
+        if time.monotonic() - self._last_save >= settings.AI_STREAM_SAVE_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if len(self.text) != self._saved_len:
+            self._save(self.text)
+            self._saved_len = len(self.text)
+        self._last_save = time.monotonic()
+
+
+def stream_research_session(session, refresh=False):
+    """Streaming variant of research_session, yielding SSE events.
+
+    The partial research text is saved to the session's finding as it
+    arrives, so an interrupted stream (error or closed connection) keeps
+    what was produced; the session then goes back to TOPIC_INPUT. When
+    refreshing a session that already has a complete finding, the partial
+    text is only held in memory: the old finding is replaced once the new
+    one is complete, and an interrupted refresh leaves it and the session
+    status as they were.
+    """
+    previous_status = session.status
+    existing = ResearchFinding.objects.filter(session=session).only("raw_response").first()
+    keep_existing = existing is not None and not existing.raw_response.get("partial")
+
+    session.status = ResearchSession.PipelineStatus.RESEARCHING
+    session.save()
+
+    cached = None if refresh else research_cache.lookup(session, "finding")
+    if cached is not None:
+        save_finding(session, cached)
+        session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+        session.save()
+        yield {"type": "chunk", "content": cached["raw_response"].get("content") or cached["summary"]}
+        yield {"type": "done", "session_id": session.id, "cached": True}
+        return
+
+    def save_partial(text):
+        if not keep_existing:
+            ResearchFinding.objects.update_or_create(
+                session=session, defaults={"summary": text, "raw_response": {"content": text, "partial": True}},
+            )
+
+    partial = _PartialText(save_partial)
+    citations = []
+    completed = False
+    try:
+        for chunk in research_service.research_topic_stream(
+            session.topic_query, session.grade_level, session.subject.name, citations,
+        ):
+            partial.add(chunk)
+            yield {"type": "chunk", "content": chunk}
+
+        result = research_service.parse_research(partial.text, citations)
+        research_cache.store(session, "finding", result)
+        save_finding(session, result)
+        session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+        session.save()
+        completed = True
+        yield {"type": "done", "session_id": session.id, "cached": False}
+    except Exception:
+        logger.exception("Streaming research failed for session %s", session.id)
+        raise
+    finally:
+        if not completed:
+            partial.flush()
+            session.status = previous_status if keep_existing else ResearchSession.PipelineStatus.TOPIC_INPUT
+            session.save()
+
+
+def _stream_into_lesson(lesson, chunks, result_args, on_complete=None):
+    """Stream Markdown chunks into `lesson`, saving partial content as it arrives.
+
+    Yields SSE events. On completion the lesson gets its final title and
+    description; if the stream is interrupted the partial content is kept.
+    """
+    partial = _PartialText(lambda text: Lesson.objects.filter(id=lesson.id).update(content=text))
+    completed = False
+    try:
+        for chunk in chunks:
+            partial.add(chunk)
+            yield {"type": "chunk", "content": chunk}
+
+        result = generators.lesson_result(partial.text, **result_args)
+        lesson.title = result["title"]
+        lesson.description = result["description"]
+        lesson.content = result["content"]
+        lesson.estimated_minutes = result["estimated_minutes"]
+        lesson.save(update_fields=["title", "description", "content", "estimated_minutes", "updated_at"])
+        if on_complete:
+            on_complete()
+        completed = True
+        yield {"type": "done", "lesson_id": lesson.id, "title": lesson.title}
+    finally:
+        if not completed:
+            partial.flush()
+
+
+def stream_session_lesson(session):
+    """Streaming variant of generate_session_lesson, yielding SSE events.
+
+    The draft Lesson is created up front and linked to the session, and its
+    content is saved as it streams. An interrupted stream leaves the partial
+    draft in place and the session back at RESEARCH_COMPLETE.
+    """
+    session.status = ResearchSession.PipelineStatus.GENERATING
+    session.save()
+
+    completed = False
+    try:
+        kwargs = _session_lesson_kwargs(session)
+        lesson = Lesson.objects.create(
+            topic=_session_topic(session),
+            title=session.topic_query,
+            description="",
+            content="",
+            grade_level=session.grade_level,
+            difficulty=session.difficulty,
+            created_by=session.created_by,
+            ai_generated=True,
+            status=Lesson.Status.DRAFT,
+        )
+        session.lesson = lesson
+        session.save()
+
+        def finish():
+            session.media_resources.filter(is_included=True).update(lesson=lesson)
+            session.status = ResearchSession.PipelineStatus.GENERATED
+            session.save()
+
+        yield from _stream_into_lesson(
+            lesson,
+            generators.stream_lesson_from_research(**kwargs),
+            {"topic": session.topic_query, "grade_level": session.grade_level, "difficulty": session.difficulty, "research": True},
+            on_complete=finish,
+        )
+        completed = True
+    except Exception:
+        logger.exception("Streaming lesson generation failed for session %s", session.id)
+        raise
+    finally:
+        if not completed:
+            session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
+            session.save()
+
+
+def stream_lesson(topic, grade_level, difficulty, topic_id=None, user=None):
+    """Streaming variant of the one-off lesson generator, yielding SSE events.
+
+    With a topic_id the lesson is saved as a draft (partial content included
+    if the stream is interrupted); without one it is only streamed.
+    """
+    chunks = generators.stream_lesson(topic, grade_level, difficulty)
+    result_args = {"topic": topic, "grade_level": grade_level, "difficulty": difficulty}
+    if not topic_id:
+        content = ""
+        for chunk in chunks:
+            content += chunk
+            yield {"type": "chunk", "content": chunk}
+        yield {"type": "done", **generators.lesson_result(content, **result_args)}
+        return
+
+    lesson = Lesson.objects.create(
+        topic_id=topic_id,
+        title=topic,
+        content="",
+        grade_level=grade_level,
+        difficulty=difficulty,
+        created_by=user,
+        ai_generated=True,
+        status=Lesson.Status.DRAFT,
+    )
+    yield from _stream_into_lesson(lesson, chunks, result_args)
+
+
+def lesson_fingerprint(topic, grade_level, difficulty, topic_id):
+    """Identify a lesson request: same normalized topic, grade, difficulty and Topic row."""
+    key = [research_cache.normalize_topic(topic), grade_level, difficulty, topic_id]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+def _insert_generated_lessons(entries):
+    """Bulk-insert generated lessons, skipping any whose title is already taken in its topic.
+
+    `entries` are (index, unsaved Lesson) pairs. The unique constraints on
+    Lesson (fingerprint; topic and title) also catch a concurrent run that
+    saved the same lesson since the check, in which case the rows are
+    inserted one at a time and the conflicting ones skipped.
+
+    Returns:
+        ({index: new lesson id}, {index: id of the lesson it duplicates, or None})
+    """
+    taken = {
+        (topic_id, title): lesson_id
+        for topic_id, title, lesson_id in Lesson.objects.filter(
+            topic_id__in={lesson.topic_id for _, lesson in entries},
+            title__in={lesson.title for _, lesson in entries},
+        ).values_list("topic_id", "title", "id")
+    }
+    fresh, skipped, repeats, first = [], {}, {}, {}
+    for i, lesson in entries:
+        key = (lesson.topic_id, lesson.title)
+        if key in taken:
+            skipped[i] = taken[key]
+        elif key in first:
+            repeats[i] = first[key]
+        else:
+            first[key] = i
+            fresh.append((i, lesson))
+
+    try:
+        with transaction.atomic():
+            saved = dict(zip((i for i, _ in fresh), Lesson.objects.bulk_create([lesson for _, lesson in fresh])))
+    except IntegrityError:
+        saved = {}
+        for i, lesson in fresh:
+            try:
+                with transaction.atomic():
+                    saved[i] = Lesson.objects.bulk_create([lesson])[0]
+            except IntegrityError:
+                skipped[i] = Lesson.objects.filter(
+                    Q(fingerprint=lesson.fingerprint) | Q(topic_id=lesson.topic_id, title=lesson.title),
+                ).values_list("id", flat=True).first()
+
+    for lesson in saved.values():
+        retrieval.index_lesson(lesson)  # bulk_create sends no post_save
+    saved = {i: lesson.id for i, lesson in saved.items()}
+    for i, first_index in repeats.items():
+        skipped[i] = saved.get(first_index, skipped.get(first_index))
+    return saved, skipped
+
+
+def generate_lessons_bulk(data, user=None, concurrency=None):
+    """Generate many one-off lessons concurrently, yielding progress events.
+
+    `data` is validated BulkLessonGenerateSerializer data. Lessons whose
+    fingerprint already exists (or repeats within the request) are skipped,
+    and so are generated lessons whose title is already taken in their topic
+    (see _insert_generated_lessons). Generations run `concurrency` (default
+    AI_BULK_LESSON_CONCURRENCY) at a time, and finished lessons are
+    bulk-inserted as drafts every BULK_SAVE_BATCH results. If the consumer
+    goes away mid-way, queued generations are cancelled without waiting for
+    the running ones, which are saved from their worker threads as they finish.
+
+    Events: start, item (skipped / generated / failed), saved (with the
+    indexes skipped as duplicates at insert time), done.
+    """
+    items = []
+    for item in data["lessons"]:
+        topic_obj = item.get("topic_id") or (
+            Topic.objects.filter(subject=data.get("subject"), name__iexact=item["topic"]).first()
+            or Topic.objects.create(
+                subject=data.get("subject"),
+                name=item["topic"],
+                description=f"Auto-created topic for: {item['topic']}",
+            )
+        )
+        grade_level = item.get("grade_level", data["grade_level"])
+        difficulty = item.get("difficulty", data["difficulty"])
+        items.append({
+            "topic": item["topic"],
+            "grade_level": grade_level,
+            "difficulty": difficulty,
+            "topic_obj": topic_obj,
+            "fingerprint": lesson_fingerprint(item["topic"], grade_level, difficulty, topic_obj.id),
+        })
+
+    existing = dict(
+        Lesson.objects.filter(fingerprint__in=[item["fingerprint"] for item in items]).values_list("fingerprint", "id")
+    )
+    yield {"type": "start", "total": len(items)}
+
+    todo, first_index = [], {}
+    for i, item in enumerate(items):
+        fingerprint = item["fingerprint"]
+        if fingerprint in existing:
+            yield {"type": "item", "index": i, "topic": item["topic"], "status": "skipped", "lesson_id": existing[fingerprint]}
+        elif fingerprint in first_index:
+            yield {"type": "item", "index": i, "topic": item["topic"], "status": "skipped", "duplicate_of": first_index[fingerprint]}
+        else:
+            first_index[fingerprint] = i
+            todo.append(i)
+
+    counts = {"generated": 0, "skipped": len(items) - len(todo), "failed": 0}
+    lesson_ids = {}
+    buffer = []  # (index, unsaved Lesson)
+
+    def build(i, result):
+        item = items[i]
+        return Lesson(
+            topic=item["topic_obj"],
+            title=result["title"],
+            description=result["description"],
+            content=result["content"],
+            grade_level=item["grade_level"],
+            difficulty=item["difficulty"],
+            estimated_minutes=result["estimated_minutes"],
+            created_by=user,
+            ai_generated=True,
+            status=Lesson.Status.DRAFT,
+            fingerprint=item["fingerprint"],
+        )
+
+    def save_buffer():
+        saved, skipped = _insert_generated_lessons(buffer)
+        lesson_ids.update(saved)
+        counts["generated"] -= len(skipped)
+        counts["skipped"] += len(skipped)
+        buffer.clear()
+        return {"type": "saved", "lesson_ids": saved, "skipped": skipped}
+
+    def collect(i, future):
+        item = items[i]
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.exception("Bulk lesson generation failed for %r", item["topic"])
+            counts["failed"] += 1
+            return {"type": "item", "index": i, "topic": item["topic"], "status": "failed", "error": str(e)}
+        buffer.append((i, build(i, result)))
+        counts["generated"] += 1
+        return {"type": "item", "index": i, "topic": item["topic"], "status": "generated", "title": result["title"]}
+
+    def save_late(future):
+        # Runs on the worker thread that finished the generation, after the consumer went away
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            _insert_generated_lessons([(futures[future], build(futures[future], future.result()))])
+        except Exception:
+            logger.exception("Could not save bulk lesson %r", items[futures[future]]["topic"])
+        finally:
+            connection.close()
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, concurrency or settings.AI_BULK_LESSON_CONCURRENCY), thread_name_prefix="bulk-lesson",
+    )
+    futures = {
+        executor.submit(generators.generate_lesson, items[i]["topic"], items[i]["grade_level"], items[i]["difficulty"]): i
+        for i in todo
+    }
+    collected = set()
+    completed = False
+    try:
+        for future in as_completed(futures):
+            collected.add(future)
+            yield collect(futures[future], future)
+            if len(buffer) >= BULK_SAVE_BATCH:
+                yield save_buffer()
+        if buffer:
+            yield save_buffer()
+        completed = True
+    finally:
+        if completed:
+            executor.shutdown()
+        else:
+            # Interrupted: save what was collected, drop queued work, and let running
+            # generations save themselves rather than holding up the disconnect
+            if buffer:
+                save_buffer()
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in futures:
+                if future not in collected:
+                    future.add_done_callback(save_late)
+
+    yield {"type": "done", **counts, "lesson_ids": lesson_ids}
+
+
+def generate_plan_outline(plan, refresh=False):
+    """AI-generate the curriculum outline.
+
+    On failure the plan goes back to its draft (PLANNING) or, when it already
+    had an outline, to OUTLINE_READY with that outline kept.
+    """
+    had_outline = bool(plan.outline)
+    plan.status = CurriculumPlan.Status.PLANNING
+    plan.save()
+
+    try:
+        result = generators.generate_curriculum_outline(
+            concept=plan.concept,
+            grade_level=plan.grade_level,
+            duration_weeks=plan.duration_weeks,
+            lessons_per_week=plan.lessons_per_week,
+            difficulty=plan.difficulty,
+            refresh=refresh,
+        )
+
+        plan.outline = result
+        plan.title = result.get("title", plan.concept)
+        plan.description = result.get("description", "")
+
+        # Auto-create or find a subject for this curriculum
+        subject_name = result.get("subject_name", plan.concept)
+        subject_icon = result.get("subject_icon", "📚")
+        subject_color = result.get("subject_color", "#6366f1")
+
+        if not plan.subject:
+            subject, _ = Subject.objects.get_or_create(
+                name=subject_name,
+                defaults={
+                    "icon": subject_icon,
+                    "color": subject_color,
+                    "description": f"Auto-created for curriculum: {plan.concept}",
+                },
+            )
+            plan.subject = subject
+
+        plan.status = CurriculumPlan.Status.OUTLINE_READY
+        plan.save()
+    except Exception:
+        logger.exception("Outline generation failed for plan %s", plan.id)
+        plan.status = CurriculumPlan.Status.OUTLINE_READY if had_outline else CurriculumPlan.Status.PLANNING
+        plan.save(update_fields=["status", "updated_at"])
+        raise
+
+
+def plan_topic(plan):
+    """Get or create the subject and topic that a plan's lessons are filed under."""
+    outline = plan.outline
+    if not plan.subject:
+        subject, _ = Subject.objects.get_or_create(
+            name=outline.get("subject_name", plan.concept),
+            defaults={
+                "icon": outline.get("subject_icon", "📚"),
+                "color": outline.get("subject_color", "#6366f1"),
+            },
+        )
+        plan.subject = subject
+        plan.save()
+
+    topic, _ = Topic.objects.get_or_create(
+        subject=plan.subject,
+        name=plan.concept,
+        defaults={
+            "description": plan.description,
+            "grade_level_min": max(1, plan.grade_level - 1),
+            "grade_level_max": min(12, plan.grade_level + 1),
+        },
+    )
+    return topic
+
+
+def generate_plan_lesson(plan, week_number, lesson_index, lesson_outline):
+    """Run the AI generation for one outline lesson (no database writes)."""
+    return generators.generate_curriculum_lesson(
+        **curriculum.lesson_prompt_kwargs(plan, week_number, lesson_index, lesson_outline),
+    )
+
+
+def save_plan_lesson(plan, topic, week_number, lesson_index, lesson_outline, result):
+    """Persist a generated lesson and its CurriculumLesson entry.
+
+    A lesson already at this position is rewritten in place and goes back to
+    draft for review, so its progress, quiz attempts and chats stay attached.
+    """
+    fields = {
+        "title": result["title"],
+        "description": result["description"],
+        "content": result["content"],
+        "grade_level": plan.grade_level,
+        "difficulty": plan.difficulty,
+        "estimated_minutes": result["estimated_minutes"],
+        "ai_generated": True,
+        "status": Lesson.Status.DRAFT,
+    }
+    entry_fields = {
+        "learning_objectives": "\n".join(lesson_outline.get("learning_objectives", [])),
+        "fingerprint": curriculum.lesson_fingerprint(lesson_outline),
+        "context_fingerprint": curriculum.context_fingerprint(plan.outline, week_number, lesson_index),
+    }
+    with transaction.atomic():
+        existing = CurriculumLesson.objects.filter(
+            curriculum=plan, week_number=week_number, order=lesson_index,
+        ).select_related("lesson").first()
+        if existing:
+            lesson = existing.lesson
+            for name, value in fields.items():
+                setattr(lesson, name, value)
+            lesson.save()
+            for name, value in entry_fields.items():
+                setattr(existing, name, value)
+            existing.save(update_fields=list(entry_fields))
+            return existing
+
+        lesson = Lesson.objects.create(topic=topic, created_by=plan.created_by, **fields)
+        return CurriculumLesson.objects.create(
+            curriculum=plan, lesson=lesson, week_number=week_number, order=lesson_index, **entry_fields,
+        )
+
+
+def sync_plan_lessons(plan, items, removed, prune=False):
+    """Apply an outline diff (see curriculum.diff_outline) short of generating anything.
+
+    Unlinks lessons dropped from the outline from the plan, moves matched
+    lessons to their new position and stamps fingerprints on the ones kept,
+    so the remaining "generate" items can be written in place.
+
+    Unlinked lessons stay in the library with their progress, quiz attempts
+    and chats; prune=True deletes them instead.
+    """
+    with transaction.atomic():
+        CurriculumLesson.objects.filter(id__in=[entry.id for entry in removed]).delete()
+        if prune:
+            Lesson.objects.filter(id__in=[entry.lesson_id for entry in removed]).delete()
+        for item in items:
+            entry = item["entry"]
+            if entry is None or item["action"] == "generate" and item["reason"] == "changed":
+                continue
+            entry.week_number = item["week_number"]
+            entry.order = item["order"]
+            if item["action"] != "generate":
+                entry.fingerprint = curriculum.lesson_fingerprint(item["lesson_outline"])
+                entry.context_fingerprint = curriculum.context_fingerprint(plan.outline, entry.week_number, entry.order)
+            entry.save(update_fields=["week_number", "order", "fingerprint", "context_fingerprint"])
+
+
+def generate_plan_lessons(plan, prune=False):
+    """Bring the plan's lessons in line with its outline.
+
+    Only new lessons, lessons whose outline entry was edited and lessons
+    whose neighbours changed are generated; reordered lessons are moved and
+    lessons removed from the outline are unlinked from the plan, or deleted
+    with prune=True (see curriculum.diff_outline and sync_plan_lessons).
+
+    Lessons are generated concurrently (AI_CURRICULUM_CONCURRENCY at a time)
+    and each one is saved as soon as it finishes, so a failure or a worker
+    crash only loses the lessons still in flight. If any lesson fails the
+    others are still saved and the first error is re-raised.
+    """
+    plan.status = CurriculumPlan.Status.GENERATING
+    plan.save()
+
+    try:
+        topic = plan_topic(plan)
+
+        items, removed = curriculum.diff_outline(plan)
+        sync_plan_lessons(plan, items, removed, prune=prune)
+        missing = [
+            (item["week_number"], item["order"], item["lesson_outline"])
+            for item in items if item["action"] == "generate"
+        ]
+
+        errors = []
+        started = time.monotonic()
+        with ThreadPoolExecutor(
+            max_workers=max(1, settings.AI_CURRICULUM_CONCURRENCY), thread_name_prefix="curriculum",
+        ) as executor:
+            futures = {
+                executor.submit(generate_plan_lesson, plan, *position): position
+                for position in missing
+            }
+            # Persist on this thread as results arrive: SQLite prefers a single writer
+            for future in as_completed(futures):
+                week_num, lesson_idx, lesson_outline = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.exception("Week %s lesson %s failed for plan %s", week_num, lesson_idx + 1, plan.id)
+                    errors.append(e)
+                    continue
+                save_plan_lesson(plan, topic, week_num, lesson_idx, lesson_outline, result)
+
+        logger.info(
+            "Generated %d/%d lessons for plan %s in %.1fs",
+            len(missing) - len(errors), len(missing), plan.id, time.monotonic() - started,
+        )
+        if errors:
+            raise errors[0]
+
+        plan.status = CurriculumPlan.Status.COMPLETE
+        plan.save()
+    except Exception:
+        logger.exception("Lesson generation failed for plan %s", plan.id)
+        plan.status = CurriculumPlan.Status.OUTLINE_READY
+        plan.save()
+        raise
@@ -0,0 +1,375 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from mindcraft.core.models import KidProfile
+from mindcraft.progress.models import LessonProgress
+from mindcraft.quiz.models import Quiz, QuizAttempt
+from . import curriculum, retrieval, tasks
+from mindcraft.jobs.models import Job
+from .models import (
+    CurriculumLesson, CurriculumPlan, Lesson, LessonSection, ResearchCache, ResearchFinding, ResearchSession,
+    Subject, Topic,
+)
+
+
+class SyncPlanLessonsTests(TestCase):
+    def setUp(self):
+        parent = User.objects.create_user("parent", password="pw")
+        self.plan = CurriculumPlan.objects.create(
+            concept="Volcanoes", created_by=parent, duration_weeks=1, lessons_per_week=2,
+            outline={"weeks": [{"week_number": 1, "theme": "Basics", "lessons": [
+                {"title": "What is a volcano?", "learning_objectives": ["Define a volcano"]},
+                {"title": "Eruptions", "learning_objectives": ["Explain eruptions"]},
+            ]}]},
+        )
+        topic = tasks.plan_topic(self.plan)
+        for week_num, lesson_idx, lesson_outline in curriculum.outline_positions(self.plan.outline):
+            result = {"title": lesson_outline["title"], "description": "", "content": "# Lesson", "estimated_minutes": 15}
+            tasks.save_plan_lesson(self.plan, topic, week_num, lesson_idx, lesson_outline, result)
+        self.dropped = Lesson.objects.get(title="Eruptions")
+
+        self.plan.outline["weeks"][0]["lessons"].pop()
+        self.plan.save()
+
+    def test_dropped_lesson_is_unlinked_but_kept(self):
+        tasks.sync_plan_lessons(self.plan, *curriculum.diff_outline(self.plan))
+        self.assertTrue(Lesson.objects.filter(id=self.dropped.id).exists())
+        self.assertFalse(CurriculumLesson.objects.filter(lesson=self.dropped).exists())
+        self.assertEqual(self.plan.curriculum_lessons.count(), 1)
+
+    def test_prune_deletes_dropped_lesson(self):
+        tasks.sync_plan_lessons(self.plan, *curriculum.diff_outline(self.plan), prune=True)
+        self.assertFalse(Lesson.objects.filter(id=self.dropped.id).exists())
+        self.assertEqual(self.plan.curriculum_lessons.count(), 1)
+
+
+class RegeneratePlanLessonsTests(TestCase):
+    def setUp(self):
+        parent = User.objects.create_user("parent", password="pw")
+        self.kid = KidProfile.objects.create(user=User.objects.create_user("kid"), parent=parent, display_name="Kid")
+        self.plan = CurriculumPlan.objects.create(
+            concept="Volcanoes", created_by=parent, duration_weeks=1, lessons_per_week=2,
+            outline={"weeks": [{"week_number": 1, "theme": "Basics", "lessons": [
+                {"title": "What is a volcano?", "learning_objectives": ["Define a volcano"]},
+                {"title": "Eruptions", "learning_objectives": ["Explain eruptions"]},
+            ]}]},
+        )
+        with mock.patch.object(tasks, "generate_plan_lesson", self.generated):
+            tasks.generate_plan_lessons(self.plan)
+        self.lessons = list(Lesson.objects.order_by("curriculum_entry__order"))
+        for lesson in self.lessons:
+            lesson.status = Lesson.Status.PUBLISHED
+            lesson.save()
+            LessonProgress.objects.create(kid=self.kid, lesson=lesson, status=LessonProgress.Status.COMPLETED)
+
+    def generated(self, plan, week_number, lesson_index, lesson_outline):
+        return {
+            "title": lesson_outline["title"], "description": "", "estimated_minutes": 15,
+            "content": f"# {lesson_outline['title']}\n\n" + ", ".join(lesson_outline["learning_objectives"]),
+        }
+
+    def test_regenerated_lessons_keep_their_progress(self):
+        # Lesson 1 is edited ("changed"); lesson 2 follows it, so it is regenerated too ("context")
+        self.plan.outline["weeks"][0]["lessons"][0]["title"] = "Volcanoes around the world"
+        self.plan.save()
+        reasons = [item["reason"] for item in curriculum.diff_outline(self.plan)[0]]
+        self.assertEqual(reasons, ["changed", "context"])
+
+        with mock.patch.object(tasks, "generate_plan_lesson", self.generated):
+            tasks.generate_plan_lessons(self.plan)
+
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.status, CurriculumPlan.Status.COMPLETE)
+        self.assertEqual(list(Lesson.objects.order_by("curriculum_entry__order")), self.lessons)
+        changed = Lesson.objects.get(id=self.lessons[0].id)
+        self.assertEqual(changed.title, "Volcanoes around the world")
+        self.assertIn("# Volcanoes around the world", changed.content)
+        self.assertEqual(changed.status, Lesson.Status.DRAFT)
+        self.assertEqual(LessonProgress.objects.filter(kid=self.kid).count(), 2)
+        self.assertEqual([item["action"] for item in curriculum.diff_outline(self.plan)[0]], ["keep", "keep"])
+
+
+class StreamResearchRefreshTests(TestCase):
+    def setUp(self):
+        parent = User.objects.create_user("parent", password="pw")
+        self.session = ResearchSession.objects.create(
+            subject=Subject.objects.create(name="Science"), topic_query="Volcanoes", created_by=parent,
+            status=ResearchSession.PipelineStatus.RESEARCH_COMPLETE,
+        )
+        ResearchFinding.objects.create(
+            session=self.session, summary="Full summary", key_facts=["fact"], raw_response={"content": "Full summary"},
+        )
+
+    def run_stream(self, chunks):
+        def stream(*args):
+            yield from chunks
+            raise RuntimeError("connection reset")
+
+        with mock.patch.object(tasks.research_service, "research_topic_stream", stream), \
+                self.settings(AI_STREAM_SAVE_INTERVAL=0), self.assertRaises(RuntimeError):
+            list(tasks.stream_research_session(self.session, refresh=True))
+
+    def test_interrupted_refresh_keeps_complete_finding(self):
+        self.run_stream(["Half a ", "summ"])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.finding.summary, "Full summary")
+        self.assertEqual(self.session.finding.key_facts, ["fact"])
+        self.assertEqual(self.session.status, ResearchSession.PipelineStatus.RESEARCH_COMPLETE)
+
+    def test_interrupted_first_run_keeps_partial_text(self):
+        self.session.finding.delete()
+        self.run_stream(["Half a ", "summ"])
+        finding = ResearchFinding.objects.get(session=self.session)
+        self.assertEqual(finding.summary, "Half a summ")
+        self.assertTrue(finding.raw_response["partial"])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, ResearchSession.PipelineStatus.TOPIC_INPUT)
+
+
+class ResearchSessionsTests(TestCase):
+    FINDING = {"summary": "Volcanoes erupt", "key_facts": ["fact"], "citations": [], "raw_response": {}}
+    MEDIA = [{"url": "https://example.com/video", "title": "Eruption video", "media_type": "video"}]
+
+    def setUp(self):
+        self.session = ResearchSession.objects.create(
+            subject=Subject.objects.create(name="Science"), topic_query="Volcanoes",
+            created_by=User.objects.create_user("parent"),
+        )
+        self.researched = threading.Event()
+
+    def research(self, **kwargs):
+        self.researched.set()
+        return self.FINDING
+
+    def discover(self, **kwargs):
+        # Finish after research, so the finding is saved while media discovery is still running
+        self.researched.wait(5)
+        time.sleep(0.1)
+        return self.MEDIA
+
+    def run_research(self, research, discover):
+        statuses = []
+        save_media = tasks.save_media
+
+        def saving_media(session, resources):
+            statuses.append(ResearchSession.objects.get(id=session.id).status)
+            save_media(session, resources)
+
+        with mock.patch.object(tasks.research_service, "research_topic", research), \
+                mock.patch.object(tasks.research_service, "discover_multimedia", discover), \
+                mock.patch.object(tasks, "save_media", saving_media):
+            outcome = tasks.research_sessions([self.session])[self.session.id]
+        self.session.refresh_from_db()
+        return outcome, statuses
+
+    def test_session_is_complete_once_the_finding_is_saved(self):
+        outcome, statuses = self.run_research(self.research, self.discover)
+        self.assertEqual(outcome, {"error": None, "media_error": None})
+        self.assertEqual(statuses, [ResearchSession.PipelineStatus.RESEARCH_COMPLETE])
+        self.assertEqual(self.session.status, ResearchSession.PipelineStatus.RESEARCH_COMPLETE)
+        self.assertEqual(self.session.finding.summary, "Volcanoes erupt")
+        self.assertEqual(self.session.media_resources.count(), 1)
+
+    def test_media_failure_is_recorded_on_the_session(self):
+        def discover(**kwargs):
+            self.researched.wait(5)
+            raise RuntimeError("media search down")
+
+        outcome, _ = self.run_research(self.research, discover)
+        self.assertEqual(str(outcome["media_error"]), "media search down")
+        self.assertEqual(self.session.media_error, "media search down")
+        self.assertEqual(self.session.status, ResearchSession.PipelineStatus.RESEARCH_COMPLETE)
+
+        self.run_research(self.research, self.discover)
+        self.assertEqual(self.session.media_error, "")
+
+    def test_research_failure_returns_to_topic_input(self):
+        def research(**kwargs):
+            self.researched.set()
+            raise RuntimeError("research down")
+
+        outcome, _ = self.run_research(research, self.discover)
+        self.assertEqual(str(outcome["error"]), "research down")
+        self.assertEqual(self.session.status, ResearchSession.PipelineStatus.TOPIC_INPUT)
+
+
+class ResearchCacheSeedTests(APITestCase):
+    FINDING = ResearchSessionsTests.FINDING
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("parent", is_staff=True))
+        self.subject = Subject.objects.create(name="Science")
+
+    def create_and_research(self):
+        session = self.client.post(
+            "/api/v1/research/", {"subject": self.subject.id, "topic_query": "Volcanoes", "grade_level": 5},
+        ).data
+        with mock.patch.object(tasks.research_service, "research_topic", return_value=self.FINDING) as research:
+            response = self.client.post(f"/api/v1/research/{session['id']}/research/", {"background": "false"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], ResearchSession.PipelineStatus.RESEARCH_COMPLETE)
+        return session, research.call_count
+
+    def test_cache_miss_researches_once(self):
+        session, calls = self.create_and_research()
+        self.assertEqual(session["status"], ResearchSession.PipelineStatus.TOPIC_INPUT)
+        self.assertEqual(calls, 1)
+        cache = ResearchCache.objects.get()
+        self.assertEqual((cache.fetches, cache.hits), (1, 0))
+
+    def test_cache_hit_is_not_researched_again(self):
+        self.create_and_research()
+        session, calls = self.create_and_research()
+        self.assertEqual(session["status"], ResearchSession.PipelineStatus.RESEARCH_COMPLETE)
+        self.assertEqual(calls, 0)
+        cache = ResearchCache.objects.get()
+        self.assertEqual((cache.fetches, cache.hits), (1, 1))
+
+        # Also without background=false: no job is queued for a seeded session
+        response = self.client.post(f"/api/v1/research/{session['id']}/research/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Job.objects.exists())
+
+
+class BulkLessonGenerateTests(TransactionTestCase):
+    def setUp(self):
+        self.subject = Subject.objects.create(name="Science")
+
+    def lesson(self, title):
+        return {"title": title, "description": "", "content": f"# {title}", "estimated_minutes": 15}
+
+    def bulk_request(self, topics, topic=None):
+        return {
+            "lessons": [{"topic": name, "topic_id": topic} for name in topics],
+            "subject": self.subject, "grade_level": 5, "difficulty": "medium",
+        }
+
+    def test_generated_lessons_are_unique_per_topic_and_title(self):
+        topic = Topic.objects.create(subject=self.subject, name="Volcanoes")
+        existing = Lesson.objects.create(topic=topic, title="Lava", content="# Lava")
+        titles = {"Volcanoes": "Volcanoes 101", "volcanoes erupting": "Volcanoes 101", "lava flows": "Lava"}
+
+        def generate(name, grade_level, difficulty):
+            return self.lesson(titles[name])
+
+        with mock.patch.object(tasks.generators, "generate_lesson", generate):
+            events = list(tasks.generate_lessons_bulk(self.bulk_request(titles, topic), concurrency=2))
+
+        done = events[-1]
+        self.assertEqual((done["generated"], done["skipped"]), (1, 2))
+        kept = Lesson.objects.get(title="Volcanoes 101")
+        skipped = {k: v for e in events if e["type"] == "saved" for k, v in e["skipped"].items()}
+        self.assertEqual(sorted(skipped.values()), sorted([kept.id, existing.id]))
+        self.assertEqual(Lesson.objects.filter(topic=topic).count(), 2)
+
+    def test_disconnect_does_not_wait_for_running_generations(self):
+        running, release = threading.Event(), threading.Event()
+
+        def generate(name, grade_level, difficulty):
+            if name != "Volcanoes":
+                running.set()
+                release.wait(5)
+            return self.lesson(name.title())
+
+        with mock.patch.object(tasks.generators, "generate_lesson", generate):
+            events = tasks.generate_lessons_bulk(self.bulk_request(["Volcanoes", "Glaciers", "Rivers"]), concurrency=1)
+            self.assertEqual(next(events)["type"], "start")
+            self.assertEqual(next(events)["status"], "generated")
+            running.wait(5)
+            started = time.monotonic()
+            events.close()
+            self.assertLess(time.monotonic() - started, 1)
+
+            self.assertEqual(list(Lesson.objects.values_list("title", flat=True)), ["Volcanoes"])
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name.startswith("bulk-lesson"):
+                    thread.join(5)
+        # The running lesson saved itself; the queued one was cancelled
+        self.assertEqual(sorted(Lesson.objects.values_list("title", flat=True)), ["Glaciers", "Volcanoes"])
+
+
+class LessonReindexTests(TestCase):
+    """Saving a lesson rebuilds its chat sections only when the content changed."""
+
+    def setUp(self):
+        topic = Topic.objects.create(subject=Subject.objects.create(name="Science"), name="Volcanoes")
+        self.lesson = Lesson.objects.create(topic=topic, title="Volcanoes", content="## Magma\n\nMagma rises.")
+
+    def save(self, **changes):
+        for field, value in changes.items():
+            setattr(self.lesson, field, value)
+        with mock.patch.object(retrieval, "index_lesson", wraps=retrieval.index_lesson) as index:
+            self.lesson.save()
+        return index.call_count
+
+    def test_new_lesson_is_indexed(self):
+        headings = LessonSection.objects.filter(lesson=self.lesson).values_list("heading", flat=True)
+        self.assertEqual(list(headings), ["Magma"])
+
+    def test_other_edits_keep_the_index(self):
+        self.assertEqual(self.save(), 0)
+        self.assertEqual(self.save(title="All about volcanoes", status=Lesson.Status.PUBLISHED), 0)
+        self.assertEqual(self.save(content="## Magma\n\nMagma rises."), 0)  # reassigned, same text
+
+    def test_content_edit_reindexes(self):
+        self.assertEqual(self.save(content="## Lava\n\nLava flows."), 1)
+        headings = LessonSection.objects.filter(lesson=self.lesson).values_list("heading", flat=True)
+        self.assertEqual(list(headings), ["Lava"])
+
+    def test_update_fields(self):
+        self.lesson.content = "## Ash\n\nAsh falls."
+        self.lesson.save(update_fields=["status"])
+        self.assertFalse(LessonSection.objects.filter(lesson=self.lesson, heading="Ash").exists())
+        self.lesson.save(update_fields=["content"])
+        self.assertTrue(LessonSection.objects.filter(lesson=self.lesson, heading="Ash").exists())
+
+
+class LessonQueryCountTests(APITestCase):
+    """Lesson list and detail take the same number of queries however many lessons there are."""
+
+    def setUp(self):
+        self.parent = User.objects.create_user("parent", is_staff=True)
+        kid_user = User.objects.create_user("kid")
+        self.kid = KidProfile.objects.create(user=kid_user, parent=self.parent, display_name="Kid")
+        self.topic = Topic.objects.create(subject=Subject.objects.create(name="Science"), name="Plants")
+
+    def add_lessons(self, count):
+        for i in range(count):
+            lesson = Lesson.objects.create(
+                topic=self.topic, title=f"Lesson {i}", content="# Lesson", status=Lesson.Status.PUBLISHED,
+            )
+            lesson.assigned_to.add(self.kid)
+            quiz = Quiz.objects.create(lesson=lesson, title=f"Quiz {i}")
+            QuizAttempt.objects.create(quiz=quiz, kid=self.kid, score=1, max_score=2, completed_at=lesson.created_at)
+        return lesson
+
+    def get(self, username, url, queries):
+        # Token auth, as the frontend does: the token lookup is one of the queries
+        token, _ = Token.objects.get_or_create(user=User.objects.get(username=username))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        for count in (2, 10):
+            self.add_lessons(count)
+            total = Lesson.objects.count()
+            with self.subTest(lessons=total):
+                self.assertEqual(self.get("parent", "/api/v1/lessons/", 3).data["count"], total)
+                self.assertEqual(self.get("kid", "/api/v1/lessons/", 4).data["count"], total)
+
+    def test_detail(self):
+        for count in (2, 10):
+            lesson = self.add_lessons(count)
+            with self.subTest(lessons=Lesson.objects.count()):
+                self.get("parent", f"/api/v1/lessons/{lesson.id}/", 3)
+                self.get("kid", f"/api/v1/lessons/{lesson.id}/", 3)
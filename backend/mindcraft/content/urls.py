@@ -12,5 +12,7 @@ router.register("curriculum", views.CurriculumPlanViewSet, basename="curriculum"
 urlpatterns = [
     path("", include(router.urls)),
     path("admin/lessons/generate/", views.generate_lesson_view),
+    path("admin/lessons/generate/stream/", views.generate_lesson_stream_view),
+    path("admin/lessons/generate/bulk/", views.generate_lessons_bulk_view),
     path("media-resources/<int:pk>/", views.media_resource_detail_view),
 ]
@@ -1,11 +1,15 @@
+import json
 import logging
 
+from django.db.models import JSONField, OuterRef, Subquery
+from django.db.models.functions import JSONObject
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from django.utils import timezone
-from .models import Subject, Topic, Lesson, ResearchSession, ResearchFinding, MediaResource, CurriculumPlan, CurriculumLesson
+from .models import Subject, Topic, Lesson, ResearchSession, MediaResource, CurriculumPlan, CurriculumLesson
 from .serializers import (
     SubjectSerializer, TopicSerializer,
     LessonListSerializer, LessonDetailSerializer, LessonCreateSerializer,
@@ -14,14 +18,45 @@ from .serializers import (
     MediaResourceSerializer,
     CurriculumPlanListSerializer, CurriculumPlanDetailSerializer,
     CurriculumPlanCreateSerializer, CurriculumLessonSerializer,
+    BulkLessonGenerateSerializer,
 )
+from . import curriculum, tasks
 from mindcraft.progress.models import LessonProgress
-from mindcraft.ai_service import generators
-from mindcraft.ai_service import research as research_service
+from mindcraft.quiz.models import Quiz, QuizAttempt
+from mindcraft.ai_service import generators, scheduler
+from mindcraft.core.utils import request_flag
+from mindcraft.jobs import runner as job_runner
+from mindcraft.jobs.serializers import JobSerializer
 from openai import AuthenticationError as OpenAIAuthError, APIError as OpenAIAPIError
 
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_TOPICS = 20
+
+
+def _sse(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _sse_response(events, workload):
+    """Stream task events (see content.tasks.stream_*) as SSE, or reject up front if the AI queue is full."""
+    try:
+        scheduler.admit(workload)
+    except scheduler.AIBusy as e:
+        return scheduler.error_response(e)
+
+    def event_stream():
+        try:
+            for event in events:
+                yield _sse(event)
+        except Exception as e:
+            yield _sse({"type": "error", "content": _clean_api_error(e)})
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 
 def _clean_api_error(e: Exception) -> str:
     """Return a user-friendly error message from API exceptions."""
@@ -66,18 +101,17 @@ class SubjectViewSet(viewsets.ModelViewSet):
     def suggest_topics(self, request, pk=None):
         """AI-suggest topics for this subject."""
         subject = self.get_object()
+        refresh = request_flag(request, "refresh")
         try:
             suggestions = generators.suggest_topics(
                 subject_name=subject.name,
                 subject_description=subject.description,
+                refresh=refresh,
             )
             return Response({"topics": suggestions})
         except Exception as e:
             logger.exception("Topic suggestion failed for subject %s", subject.id)
-            return Response(
-                {"error": _clean_api_error(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
+            return scheduler.error_response(e, _clean_api_error(e))
 
 
 class TopicViewSet(viewsets.ModelViewSet):
@@ -119,14 +153,31 @@ class LessonViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Lesson.objects.all()
+            lessons = Lesson.objects.all()
         # Kids see only published lessons assigned to them
-        if hasattr(user, "kid_profile"):
-            return Lesson.objects.filter(
+        elif hasattr(user, "kid_profile"):
+            lessons = Lesson.objects.filter(
                 status=Lesson.Status.PUBLISHED,
                 assigned_to=user.kid_profile,
             )
-        return Lesson.objects.none()
+        else:
+            return Lesson.objects.none()
+
+        if self.action in ("create", "update", "partial_update"):
+            return lessons
+        # Everything the read serializers show comes back in the one query
+        active_quizzes = Quiz.objects.filter(lesson=OuterRef("pk"), is_active=True).order_by("-created_at")
+        lessons = lessons.select_related("topic__subject").annotate(
+            active_quiz_id=Subquery(active_quizzes.values("id")[:1]),
+        )
+        if self.action == "list":
+            return lessons.defer("content")
+        if self.action == "retrieve" and hasattr(user, "kid_profile"):
+            best_attempt = QuizAttempt.objects.filter(
+                quiz=OuterRef("active_quiz_id"), kid=user.kid_profile, completed_at__isnull=False,
+            ).order_by("-score").values(data=JSONObject(score="score", max_score="max_score"))[:1]
+            lessons = lessons.annotate(best_attempt=Subquery(best_attempt, output_field=JSONField()))
+        return lessons
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -222,11 +273,47 @@ def generate_lesson_view(request):
 
         return Response(result)
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return scheduler.error_response(e)
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def generate_lesson_stream_view(request):
+    """Streaming variant of generate_lesson_view (SSE chunk/done/error events)."""
+    topic = request.data.get("topic", "")
+    if not topic:
+        return Response({"error": "Topic is required"}, status=400)
+
+    return _sse_response(tasks.stream_lesson(
+        topic,
+        request.data.get("grade_level", 5),
+        request.data.get("difficulty", "medium"),
+        topic_id=request.data.get("topic_id"),
+        user=request.user,
+    ), "generation")
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def generate_lessons_bulk_view(request):
+    """AI-generate many draft lessons, streaming per-lesson progress as SSE.
+
+    Body: {"lessons": [{"topic": str, "grade_level"?, "difficulty"?, "topic_id"?}, ...],
+           "subject": int, "grade_level": int, "difficulty": str}
+    Lessons already generated from the same request are skipped.
+    """
+    serializer = BulkLessonGenerateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return _sse_response(tasks.generate_lessons_bulk(serializer.validated_data, user=request.user), "generation")
 
 
 class ResearchSessionViewSet(viewsets.ModelViewSet):
-    """Research pipeline sessions — admin only."""
+    """Research pipeline sessions — admin only.
+
+    The AI steps (research, research-and-enrich, generate-lesson, discover-media,
+    batch) are queued for the `run_jobs` worker and return 202 with the job; poll
+    /jobs/<id>/, or pass {"background": false} to run the step in the request.
+    """
     permission_classes = [IsAdminUser]
 
     def get_serializer_class(self):
@@ -240,7 +327,11 @@ class ResearchSessionViewSet(viewsets.ModelViewSet):
         return ResearchSession.objects.select_related("subject", "topic", "lesson").all()
 
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        refresh = request_flag(self.request, "refresh")
+        session = serializer.save(created_by=self.request.user)
+        # Start from cached research on the same topic unless asked for fresh results
+        if not refresh:
+            tasks.seed_from_cache(session)
 
     def _session_detail_response(self, session):
         """Return the full session detail (re-fetched to include relations)."""
@@ -248,39 +339,113 @@ class ResearchSessionViewSet(viewsets.ModelViewSet):
         serializer = ResearchSessionDetailSerializer(session)
         return Response(serializer.data)
 
+    def _enqueue(self, kind, session, **payload):
+        """Queue a pipeline step for the job worker and return 202 with the job."""
+        job = job_runner.enqueue(
+            kind, {"session_id": session.id, **payload}, target=f"research_session:{session.id}", user=self.request.user,
+        )
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=["post"])
     def research(self, request, pk=None):
-        """Run Perplexity research on the session topic."""
-        session = self.get_object()
-        session.status = ResearchSession.PipelineStatus.RESEARCHING
-        session.save()
+        """Run Perplexity research on the session topic. Body: {"refresh": bool} to bypass the research cache.
 
+        A session already seeded from the research cache is returned as-is
+        (200, no job) unless refresh is set.
+        """
+        session = self.get_object()
+        refresh = request_flag(request, "refresh")
+        if not refresh and session.status == ResearchSession.PipelineStatus.RESEARCH_COMPLETE and hasattr(session, "finding"):
+            return self._session_detail_response(session)
+        if request_flag(request, "background", True):
+            return self._enqueue("research", session, refresh=refresh)
         try:
-            result = research_service.research_topic(
-                topic=session.topic_query,
-                grade_level=session.grade_level,
-                subject=session.subject.name,
-            )
+            tasks.research_session(session, refresh=refresh)
+            return self._session_detail_response(session)
+        except Exception as e:
+            return scheduler.error_response(e, _clean_api_error(e))
 
-            finding, _ = ResearchFinding.objects.update_or_create(
-                session=session,
-                defaults={
-                    "summary": result["summary"],
-                    "key_facts": result["key_facts"],
-                    "citations": result["citations"],
-                    "raw_response": result["raw_response"],
-                },
-            )
+    @action(detail=True, methods=["post"], url_path="research-stream")
+    def research_stream(self, request, pk=None):
+        """Streaming variant of research: SSE chunks of the research text as Perplexity writes it."""
+        session = self.get_object()
+        refresh = request_flag(request, "refresh")
+        return _sse_response(tasks.stream_research_session(session, refresh=refresh), "research")
 
-            session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
-            session.save()
+    @action(detail=True, methods=["post"], url_path="research-and-enrich")
+    def research_and_enrich(self, request, pk=None):
+        """Run research and media discovery at the same time.
 
-            return self._session_detail_response(session)
+        A media discovery failure does not fail the request: the session is
+        returned with a "media_error" and discover-media can be retried.
+        """
+        session = self.get_object()
+        refresh = request_flag(request, "refresh")
+        if request_flag(request, "background", True):
+            return self._enqueue("research_and_enrich", session, refresh=refresh)
+        try:
+            media_error = tasks.research_and_enrich(session, refresh=refresh)
         except Exception as e:
-            logger.exception("Research failed for session %s", session.id)
-            session.status = ResearchSession.PipelineStatus.TOPIC_INPUT
-            session.save()
-            return Response({"error": _clean_api_error(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return scheduler.error_response(e, _clean_api_error(e))
+        response = self._session_detail_response(session)
+        if media_error:
+            response.data["media_error"] = _clean_api_error(media_error)
+        return response
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """Create and research several sessions at once.
+
+        Body: {"subject": int, "topics": [str], "grade_level": int, "difficulty": str,
+               "enrich": bool (default true), "refresh": bool, "background": bool (default true)}
+        """
+        topics = [t.strip() for t in request.data.get("topics", []) if isinstance(t, str) and t.strip()]
+        if not topics:
+            return Response({"error": "topics must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(topics) > MAX_BATCH_TOPICS:
+            return Response({"error": f"At most {MAX_BATCH_TOPICS} topics per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+        create_serializers = [
+            ResearchSessionCreateSerializer(data={
+                "subject": request.data.get("subject"),
+                "topic_query": topic,
+                "grade_level": request.data.get("grade_level", 5),
+                "difficulty": request.data.get("difficulty", "medium"),
+            })
+            for topic in topics
+        ]
+        for serializer in create_serializers:
+            serializer.is_valid(raise_exception=True)
+        enrich = request_flag(request, "enrich", True)
+        refresh = request_flag(request, "refresh")
+        sessions = [serializer.save(created_by=request.user) for serializer in create_serializers]
+
+        if request_flag(request, "background", True):
+            kind = "research_and_enrich" if enrich else "research"
+            jobs = [
+                job_runner.enqueue(
+                    kind, {"session_id": s.id, "refresh": refresh}, target=f"research_session:{s.id}", user=request.user,
+                )
+                for s in sessions
+            ]
+            for s in sessions:
+                s.refresh_from_db(fields=["status"])
+            return Response({
+                "sessions": ResearchSessionListSerializer(sessions, many=True).data,
+                "jobs": JobSerializer(jobs, many=True).data,
+            }, status=status.HTTP_202_ACCEPTED)
+
+        outcomes = tasks.research_sessions(sessions, enrich=enrich, refresh=refresh)
+        refreshed = ResearchSession.objects.filter(id__in=outcomes).select_related("subject", "topic", "lesson").in_bulk()
+        results = []
+        for session in sessions:
+            outcome = outcomes[session.id]
+            results.append({
+                "session": ResearchSessionListSerializer(refreshed[session.id]).data,
+                "error": _clean_api_error(outcome["error"]) if outcome["error"] else None,
+                "media_error": _clean_api_error(outcome["media_error"]) if outcome["media_error"] else None,
+            })
+        return Response({"results": results})
 
     @action(detail=True, methods=["patch"], url_path="update-finding")
     def update_finding(self, request, pk=None):
@@ -299,106 +464,34 @@ class ResearchSessionViewSet(viewsets.ModelViewSet):
     def generate_lesson(self, request, pk=None):
         """Generate a lesson from the research findings."""
         session = self.get_object()
-        session.status = ResearchSession.PipelineStatus.GENERATING
-        session.save()
-
+        if request_flag(request, "background", True):
+            return self._enqueue("generate_session_lesson", session)
         try:
-            finding = session.finding
-            media_qs = session.media_resources.filter(is_included=True)
-            media_data = [
-                {"title": m.title, "media_type": m.media_type, "url": m.url}
-                for m in media_qs
-            ]
-
-            result = generators.generate_lesson_from_research(
-                topic=session.topic_query,
-                grade_level=session.grade_level,
-                difficulty=session.difficulty,
-                research_summary=finding.summary,
-                key_facts=finding.key_facts,
-                citations=finding.citations,
-                media_resources=media_data,
-                parent_notes=finding.parent_notes,
-            )
-
-            # Create or get the topic for this lesson
-            topic_obj = session.topic
-            if not topic_obj:
-                topic_obj, _ = Topic.objects.get_or_create(
-                    subject=session.subject,
-                    name=session.topic_query,
-                    defaults={"description": f"Auto-created topic for: {session.topic_query}"},
-                )
-                session.topic = topic_obj
-
-            lesson = Lesson.objects.create(
-                topic=topic_obj,
-                title=result["title"],
-                description=result["description"],
-                content=result["content"],
-                grade_level=session.grade_level,
-                difficulty=session.difficulty,
-                estimated_minutes=result["estimated_minutes"],
-                created_by=session.created_by,
-                ai_generated=True,
-                status=Lesson.Status.DRAFT,
-            )
-
-            # Link media resources to the lesson
-            session.media_resources.filter(is_included=True).update(lesson=lesson)
-
-            session.lesson = lesson
-            session.status = ResearchSession.PipelineStatus.GENERATED
-            session.save()
-
+            tasks.generate_session_lesson(session)
             return self._session_detail_response(session)
         except Exception as e:
-            logger.exception("Lesson generation failed for session %s", session.id)
-            session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
-            session.save()
-            return Response({"error": _clean_api_error(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return scheduler.error_response(e, _clean_api_error(e))
+
+    @action(detail=True, methods=["post"], url_path="generate-lesson-stream")
+    def generate_lesson_stream(self, request, pk=None):
+        """Streaming variant of generate-lesson: SSE chunks of the lesson Markdown."""
+        session = self.get_object()
+        if not hasattr(session, "finding"):
+            return Response({"error": "Run research first."}, status=status.HTTP_400_BAD_REQUEST)
+        return _sse_response(tasks.stream_session_lesson(session), "generation")
 
     @action(detail=True, methods=["post"], url_path="discover-media")
     def discover_media(self, request, pk=None):
         """Discover multimedia resources for the session topic."""
         session = self.get_object()
-        session.status = ResearchSession.PipelineStatus.ENRICHING
-        session.save()
-
+        refresh = request_flag(request, "refresh")
+        if request_flag(request, "background", True):
+            return self._enqueue("discover_media", session, refresh=refresh)
         try:
-            resources = research_service.discover_multimedia(
-                topic=session.topic_query,
-                grade_level=session.grade_level,
-                subject=session.subject.name,
-            )
-
-            created = []
-            for i, r in enumerate(resources):
-                media = MediaResource.objects.create(
-                    session=session,
-                    url=r["url"],
-                    title=r["title"],
-                    description=r.get("description", ""),
-                    media_type=r.get("media_type", "other"),
-                    source=MediaResource.Source.AUTO,
-                    thumbnail_url=r.get("thumbnail_url", ""),
-                    order=i,
-                )
-                created.append(media)
-
-            # Link discovered media to the lesson if one already exists
-            if session.lesson:
-                session.media_resources.filter(is_included=True, lesson__isnull=True).update(lesson=session.lesson)
-
-            session.status = ResearchSession.PipelineStatus.READY
-            session.save()
-
+            tasks.discover_session_media(session, refresh=refresh)
             return self._session_detail_response(session)
         except Exception as e:
-            logger.exception("Media discovery failed for session %s", session.id)
-            session.status = ResearchSession.PipelineStatus.RESEARCH_COMPLETE
-            session.save()
-            return Response({"error": _clean_api_error(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return scheduler.error_response(e, _clean_api_error(e))
 
     @action(detail=True, methods=["post"], url_path="add-media")
     def add_media(self, request, pk=None):
@@ -463,7 +556,11 @@ def media_resource_detail_view(request, pk):
 
 
 class CurriculumPlanViewSet(viewsets.ModelViewSet):
-    """Curriculum planner — admin only. Create multi-week learning plans on any topic."""
+    """Curriculum planner — admin only. Create multi-week learning plans on any topic.
+
+    generate-outline and generate-lessons are queued for the `run_jobs` worker
+    (202 with the job) unless {"background": false} is passed.
+    """
     permission_classes = [IsAdminUser]
 
     def get_serializer_class(self):
@@ -485,51 +582,25 @@ class CurriculumPlanViewSet(viewsets.ModelViewSet):
         serializer = CurriculumPlanDetailSerializer(plan)
         return Response(serializer.data)
 
+    def _enqueue(self, kind, plan, **payload):
+        """Queue a plan step for the job worker and return 202 with the job."""
+        job = job_runner.enqueue(
+            kind, {"plan_id": plan.id, **payload}, target=f"curriculum_plan:{plan.id}", user=self.request.user,
+        )
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=["post"], url_path="generate-outline")
     def generate_outline(self, request, pk=None):
         """AI-generate the curriculum outline."""
         plan = self.get_object()
-        plan.status = CurriculumPlan.Status.PLANNING
-        plan.save()
-
+        refresh = request_flag(request, "refresh")
+        if request_flag(request, "background", True):
+            return self._enqueue("generate_outline", plan, refresh=refresh)
         try:
-            result = generators.generate_curriculum_outline(
-                concept=plan.concept,
-                grade_level=plan.grade_level,
-                duration_weeks=plan.duration_weeks,
-                lessons_per_week=plan.lessons_per_week,
-                difficulty=plan.difficulty,
-            )
-
-            plan.outline = result
-            plan.title = result.get("title", plan.concept)
-            plan.description = result.get("description", "")
-
-            # Auto-create or find a subject for this curriculum
-            subject_name = result.get("subject_name", plan.concept)
-            subject_icon = result.get("subject_icon", "📚")
-            subject_color = result.get("subject_color", "#6366f1")
-
-            if not plan.subject:
-                subject, _ = Subject.objects.get_or_create(
-                    name=subject_name,
-                    defaults={
-                        "icon": subject_icon,
-                        "color": subject_color,
-                        "description": f"Auto-created for curriculum: {plan.concept}",
-                    },
-                )
-                plan.subject = subject
-
-            plan.status = CurriculumPlan.Status.OUTLINE_READY
-            plan.save()
-
+            tasks.generate_plan_outline(plan, refresh=refresh)
             return self._plan_detail_response(plan)
         except Exception as e:
-            logger.exception("Outline generation failed for plan %s", plan.id)
-            plan.status = CurriculumPlan.Status.PLANNING
-            plan.save()
-            return Response({"error": _clean_api_error(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return scheduler.error_response(e, _clean_api_error(e))
 
     @action(detail=True, methods=["patch"], url_path="update-outline")
     def update_outline(self, request, pk=None):
@@ -546,127 +617,29 @@ class CurriculumPlanViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"], url_path="generate-lessons")
     def generate_lessons(self, request, pk=None):
-        """Generate all lessons from the outline. Can also regenerate specific ones."""
+        """Generate the lessons that are missing or out of date with the outline.
+
+        Lessons dropped from the outline are unlinked from the plan and kept
+        with their learner data; {"prune": true} deletes them instead. With
+        {"dry_run": true}, only report what would be generated, moved and
+        removed, and the estimated token cost.
+        """
         plan = self.get_object()
         if not plan.outline or "weeks" not in plan.outline:
             return Response({"error": "No outline available. Generate an outline first."}, status=status.HTTP_400_BAD_REQUEST)
 
-        plan.status = CurriculumPlan.Status.GENERATING
-        plan.save()
+        prune = request_flag(request, "prune")
+        if request_flag(request, "dry_run"):
+            items, removed = curriculum.diff_outline(plan)
+            return Response(curriculum.diff_summary(plan, items, removed, prune=prune))
 
+        if request_flag(request, "background", True):
+            return self._enqueue("generate_lessons", plan, prune=prune)
         try:
-            outline = plan.outline
-            weeks = outline.get("weeks", [])
-
-            # Ensure subject exists
-            if not plan.subject:
-                subject, _ = Subject.objects.get_or_create(
-                    name=outline.get("subject_name", plan.concept),
-                    defaults={
-                        "icon": outline.get("subject_icon", "📚"),
-                        "color": outline.get("subject_color", "#6366f1"),
-                    },
-                )
-                plan.subject = subject
-                plan.save()
-
-            # Create a topic for this curriculum under the subject
-            topic, _ = Topic.objects.get_or_create(
-                subject=plan.subject,
-                name=plan.concept,
-                defaults={
-                    "description": plan.description,
-                    "grade_level_min": max(1, plan.grade_level - 1),
-                    "grade_level_max": min(12, plan.grade_level + 1),
-                },
-            )
-
-            # Build context as we generate each lesson
-            previous_context_parts = []
-
-            for week in weeks:
-                week_num = week.get("week_number", 1)
-                week_lessons = week.get("lessons", [])
-
-                for lesson_idx, lesson_outline in enumerate(week_lessons):
-                    lesson_title = lesson_outline.get("title", f"Week {week_num} Lesson {lesson_idx + 1}")
-                    objectives = lesson_outline.get("learning_objectives", [])
-                    description = lesson_outline.get("description", "")
-
-                    # Check if this lesson already exists (skip if regenerating)
-                    existing = CurriculumLesson.objects.filter(
-                        curriculum=plan,
-                        week_number=week_num,
-                        order=lesson_idx,
-                    ).first()
-                    if existing:
-                        # Add to context and skip
-                        previous_context_parts.append(
-                            f"Week {week_num}, Lesson {lesson_idx + 1}: {existing.lesson.title} — {existing.learning_objectives}"
-                        )
-                        continue
-
-                    # Figure out upcoming lesson title
-                    upcoming_title = ""
-                    if lesson_idx + 1 < len(week_lessons):
-                        upcoming_title = week_lessons[lesson_idx + 1].get("title", "")
-                    else:
-                        # Check next week
-                        week_index = weeks.index(week)
-                        if week_index + 1 < len(weeks):
-                            next_week_lessons = weeks[week_index + 1].get("lessons", [])
-                            if next_week_lessons:
-                                upcoming_title = next_week_lessons[0].get("title", "")
-
-                    previous_context = "\n".join(previous_context_parts) if previous_context_parts else ""
-
-                    result = generators.generate_curriculum_lesson(
-                        concept=plan.concept,
-                        grade_level=plan.grade_level,
-                        difficulty=plan.difficulty,
-                        week_number=week_num,
-                        lesson_number=lesson_idx + 1,
-                        lesson_title=lesson_title,
-                        learning_objectives=objectives,
-                        lesson_description=description,
-                        previous_lessons_context=previous_context,
-                        upcoming_lesson_title=upcoming_title,
-                    )
-
-                    lesson = Lesson.objects.create(
-                        topic=topic,
-                        title=result["title"],
-                        description=result["description"],
-                        content=result["content"],
-                        grade_level=plan.grade_level,
-                        difficulty=plan.difficulty,
-                        estimated_minutes=result["estimated_minutes"],
-                        created_by=plan.created_by,
-                        ai_generated=True,
-                        status=Lesson.Status.DRAFT,
-                    )
-
-                    CurriculumLesson.objects.create(
-                        curriculum=plan,
-                        lesson=lesson,
-                        week_number=week_num,
-                        order=lesson_idx,
-                        learning_objectives="\n".join(objectives),
-                    )
-
-                    previous_context_parts.append(
-                        f"Week {week_num}, Lesson {lesson_idx + 1}: {result['title']} — {', '.join(objectives)}"
-                    )
-
-            plan.status = CurriculumPlan.Status.COMPLETE
-            plan.save()
+            tasks.generate_plan_lessons(plan, prune=prune)
             return self._plan_detail_response(plan)
-
         except Exception as e:
-            logger.exception("Lesson generation failed for plan %s", plan.id)
-            plan.status = CurriculumPlan.Status.OUTLINE_READY
-            plan.save()
-            return Response({"error": _clean_api_error(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return scheduler.error_response(e, _clean_api_error(e))
 
     @action(detail=True, methods=["post"], url_path="generate-single-lesson")
     def generate_single_lesson(self, request, pk=None):
@@ -698,85 +671,14 @@ class CurriculumPlanViewSet(viewsets.ModelViewSet):
         lesson_outline = week_lessons[lesson_index]
 
         try:
-            # Ensure subject and topic exist
-            if not plan.subject:
-                subject, _ = Subject.objects.get_or_create(
-                    name=outline.get("subject_name", plan.concept),
-                    defaults={"icon": outline.get("subject_icon", "📚"), "color": outline.get("subject_color", "#6366f1")},
-                )
-                plan.subject = subject
-                plan.save()
-
-            topic, _ = Topic.objects.get_or_create(
-                subject=plan.subject,
-                name=plan.concept,
-                defaults={"description": plan.description},
-            )
-
-            # Build previous context from existing lessons
-            existing_lessons = plan.curriculum_lessons.select_related("lesson").order_by("week_number", "order")
-            previous_parts = []
-            for cl in existing_lessons:
-                if cl.week_number < week_number or (cl.week_number == week_number and cl.order < lesson_index):
-                    previous_parts.append(f"Week {cl.week_number}, Lesson {cl.order + 1}: {cl.lesson.title} — {cl.learning_objectives}")
-
-            # Figure out upcoming
-            upcoming_title = ""
-            if lesson_index + 1 < len(week_lessons):
-                upcoming_title = week_lessons[lesson_index + 1].get("title", "")
-            else:
-                week_idx = weeks.index(target_week)
-                if week_idx + 1 < len(weeks):
-                    next_lessons = weeks[week_idx + 1].get("lessons", [])
-                    if next_lessons:
-                        upcoming_title = next_lessons[0].get("title", "")
-
-            result = generators.generate_curriculum_lesson(
-                concept=plan.concept,
-                grade_level=plan.grade_level,
-                difficulty=plan.difficulty,
-                week_number=week_number,
-                lesson_number=lesson_index + 1,
-                lesson_title=lesson_outline.get("title", ""),
-                learning_objectives=lesson_outline.get("learning_objectives", []),
-                lesson_description=lesson_outline.get("description", ""),
-                previous_lessons_context="\n".join(previous_parts),
-                upcoming_lesson_title=upcoming_title,
-            )
-
-            # Delete existing curriculum lesson entry if regenerating
-            existing_entry = CurriculumLesson.objects.filter(
-                curriculum=plan, week_number=week_number, order=lesson_index,
-            ).first()
-            if existing_entry:
-                existing_entry.lesson.delete()
-                existing_entry.delete()
-
-            lesson = Lesson.objects.create(
-                topic=topic,
-                title=result["title"],
-                description=result["description"],
-                content=result["content"],
-                grade_level=plan.grade_level,
-                difficulty=plan.difficulty,
-                estimated_minutes=result["estimated_minutes"],
-                created_by=plan.created_by,
-                ai_generated=True,
-                status=Lesson.Status.DRAFT,
-            )
-
-            CurriculumLesson.objects.create(
-                curriculum=plan,
-                lesson=lesson,
-                week_number=week_number,
-                order=lesson_index,
-                learning_objectives="\n".join(lesson_outline.get("learning_objectives", [])),
-            )
+            topic = tasks.plan_topic(plan)
+            result = tasks.generate_plan_lesson(plan, week_number, lesson_index, lesson_outline)
+            tasks.save_plan_lesson(plan, topic, week_number, lesson_index, lesson_outline, result)
 
             return self._plan_detail_response(plan)
         except Exception as e:
             logger.exception("Single lesson generation failed for plan %s", plan.id)
-            return Response({"error": _clean_api_error(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return scheduler.error_response(e, _clean_api_error(e))
 
     @action(detail=True, methods=["post"])
     def publish(self, request, pk=None):
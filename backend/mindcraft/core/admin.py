@@ -29,6 +29,6 @@ admin.site.register(User, UserAdmin)
 
 @admin.register(KidProfile)
 class KidProfileAdmin(admin.ModelAdmin):
-    list_display = ["display_name", "user", "grade_level", "parent", "daily_chat_limit"]
+    list_display = ["display_name", "user", "grade_level", "parent", "daily_chat_limit", "daily_token_limit"]
     list_filter = ["grade_level", "is_active"]
     filter_horizontal = ("allowed_subjects",)
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="kidprofile",
+            name="daily_token_limit",
+            field=models.IntegerField(default=0, help_text="Chat tokens per day (0 = no token budget)"),
+        ),
+    ]
@@ -13,6 +13,9 @@ class KidProfile(models.Model):
     grade_level = models.IntegerField(default=1)
     date_of_birth = models.DateField(null=True, blank=True)
     daily_chat_limit = models.IntegerField(default=settings.AI_DEFAULT_DAILY_CHAT_LIMIT)
+    daily_token_limit = models.IntegerField(
+        default=settings.AI_DEFAULT_DAILY_TOKEN_LIMIT, help_text="Chat tokens per day (0 = no token budget)"
+    )
     allowed_subjects = models.ManyToManyField("content.Subject", blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -10,7 +10,7 @@ class KidProfileSerializer(serializers.ModelSerializer):
         model = KidProfile
         fields = [
             "id", "display_name", "avatar", "grade_level",
-            "date_of_birth", "daily_chat_limit", "age",
+            "date_of_birth", "daily_chat_limit", "daily_token_limit", "age",
         ]
 
 
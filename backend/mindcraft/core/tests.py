@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ValidationError
+
+from .utils import request_flag
+
+
+class RequestFlagTests(SimpleTestCase):
+    def flag(self, data, default=False):
+        return request_flag(SimpleNamespace(data=data), "refresh", default)
+
+    def test_parses_strings_and_booleans(self):
+        for value, expected in [("false", False), ("False", False), ("0", False), ("", False),
+                                ("true", True), ("1", True), ("on", True), (True, True), (False, False)]:
+            with self.subTest(value=value):
+                self.assertIs(self.flag({"refresh": value}), expected)
+
+    def test_missing_uses_default(self):
+        self.assertIs(self.flag({}), False)
+        self.assertIs(self.flag({}, default=True), True)
+
+    def test_rejects_other_values(self):
+        with self.assertRaises(ValidationError):
+            self.flag({"refresh": "maybe"})
@@ -6,4 +6,5 @@ urlpatterns = [
     path("auth/logout/", views.logout_view),
     path("auth/me/", views.me_view),
     path("kids/", views.kids_list_view),
+    path("ai/stats/", views.ai_stats_view),
 ]
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+
+def request_flag(request, name, default=False):
+    """Read a boolean field from the request body.
+
+    Accepts what DRF's BooleanField does (true/false, "true"/"false", 1/0,
+    "on"/"off", ...), so a form-encoded "false" is False; a missing or empty
+    value is `default`, anything else is a 400 ValidationError.
+    """
+    value = request.data.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return serializers.BooleanField().to_internal_value(value)
+    except serializers.ValidationError:
+        raise serializers.ValidationError({name: ["Must be a valid boolean."]})
@@ -4,6 +4,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from mindcraft.ai_service import cache, cli_pool, client as ai_client, providers, replay, scheduler, singleflight
 from .models import KidProfile
 from .serializers import UserSerializer, LoginSerializer, KidProfileSerializer
 
@@ -46,3 +47,20 @@ def kids_list_view(request):
     """List all kid profiles (admin only)."""
     kids = KidProfile.objects.filter(is_active=True)
     return Response(KidProfileSerializer(kids, many=True).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def ai_stats_view(request):
+    """AI runtime metrics: scheduler queues, CLI pool, response cache, HTTP clients (admin only)."""
+    pool = cli_pool.get_pool()
+    return Response({
+        "scheduler": scheduler.stats(),
+        "streaming": ai_client.stream_stats(),
+        "cancellations": ai_client.cancel_stats(),
+        "cli_pool": pool.stats() if pool else None,
+        "cache": cache.stats(),
+        "singleflight": singleflight.stats(),
+        "providers": providers.stats(),
+        "replay": replay.stats(),
+    })
@@ -0,0 +1,109 @@
+"""What each job kind runs, and how it drives its target's state machine.
+
+Every handler has:
+    run      executes the job from its payload and returns a JSON result
+    pending  puts the target into its in-progress status (on enqueue and retry)
+    reset    rolls the target back once the job has finally failed, e.g. after
+             a worker crash left a session stuck in RESEARCHING
+    timeout  seconds a single attempt may run
+"""
+
+from collections import namedtuple
+
+from mindcraft.content import tasks as content_tasks
+from mindcraft.content.models import Lesson, ResearchSession, CurriculumPlan
+from mindcraft.quiz import tasks as quiz_tasks
+
+Handler = namedtuple("Handler", ["run", "pending", "reset", "timeout"])
+
+Pipeline = ResearchSession.PipelineStatus
+
+
+def _session(payload):
+    return ResearchSession.objects.select_related("subject", "topic", "lesson").get(id=payload["session_id"])
+
+
+def _plan(payload):
+    return CurriculumPlan.objects.select_related("subject").get(id=payload["plan_id"])
+
+
+def _session_status(status):
+    return lambda payload: ResearchSession.objects.filter(id=payload["session_id"]).update(status=status)
+
+
+def _plan_status(status):
+    return lambda payload: CurriculumPlan.objects.filter(id=payload["plan_id"]).update(status=status)
+
+
+def _reset_plan_outline(payload):
+    # A failed (re)generation leaves the outline untouched: back to the draft, or to the outline it had
+    plan = CurriculumPlan.objects.only("outline").get(id=payload["plan_id"])
+    _plan_status(CurriculumPlan.Status.OUTLINE_READY if plan.outline else CurriculumPlan.Status.PLANNING)(payload)
+
+
+def _research(payload):
+    content_tasks.research_session(_session(payload), refresh=payload.get("refresh", False))
+    return {"session_id": payload["session_id"]}
+
+
+def _research_and_enrich(payload):
+    media_error = content_tasks.research_and_enrich(_session(payload), refresh=payload.get("refresh", False))
+    return {"session_id": payload["session_id"], "media_error": str(media_error) if media_error else None}
+
+
+def _generate_session_lesson(payload):
+    content_tasks.generate_session_lesson(_session(payload))
+    return {"session_id": payload["session_id"]}
+
+
+def _discover_media(payload):
+    content_tasks.discover_session_media(_session(payload), refresh=payload.get("refresh", False))
+    return {"session_id": payload["session_id"]}
+
+
+def _generate_outline(payload):
+    content_tasks.generate_plan_outline(_plan(payload), refresh=payload.get("refresh", False))
+    return {"plan_id": payload["plan_id"]}
+
+
+def _generate_lessons(payload):
+    content_tasks.generate_plan_lessons(_plan(payload), prune=payload.get("prune", False))
+    return {"plan_id": payload["plan_id"]}
+
+
+def _generate_quiz(payload):
+    lesson = Lesson.objects.get(id=payload["lesson_id"])
+    quiz, question_count = quiz_tasks.create_lesson_quiz(
+        lesson, payload.get("num_questions", 5), refresh=payload.get("refresh", False),
+    )
+    return {"quiz_id": quiz.id, "title": quiz.title, "questions": question_count}
+
+
+def _noop(payload):
+    pass
+
+
+HANDLERS = {
+    "research": Handler(
+        _research, _session_status(Pipeline.RESEARCHING), _session_status(Pipeline.TOPIC_INPUT), 900,
+    ),
+    "research_and_enrich": Handler(
+        _research_and_enrich, _session_status(Pipeline.RESEARCHING), _session_status(Pipeline.TOPIC_INPUT), 900,
+    ),
+    "generate_session_lesson": Handler(
+        _generate_session_lesson, _session_status(Pipeline.GENERATING), _session_status(Pipeline.RESEARCH_COMPLETE), 1800,
+    ),
+    "discover_media": Handler(
+        _discover_media, _session_status(Pipeline.ENRICHING), _session_status(Pipeline.RESEARCH_COMPLETE), 900,
+    ),
+    "generate_outline": Handler(
+        _generate_outline, _plan_status(CurriculumPlan.Status.PLANNING), _reset_plan_outline, 900,
+    ),
+    "generate_lessons": Handler(
+        _generate_lessons,
+        _plan_status(CurriculumPlan.Status.GENERATING),
+        _plan_status(CurriculumPlan.Status.OUTLINE_READY),
+        7200,
+    ),
+    "generate_quiz": Handler(_generate_quiz, _noop, _noop, 900),
+}
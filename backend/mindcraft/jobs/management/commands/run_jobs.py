@@ -0,0 +1,70 @@
+"""Worker process for background jobs (long-running AI actions)."""
+
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mindcraft.jobs import runner
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (research, lesson/outline/quiz generation)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+            help="Jobs to run at the same time",
+        )
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds between queue polls")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(f"⚙️  Job worker {worker_id} started (concurrency={concurrency})")
+        running = {}  # future -> job
+        overdue = set()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job") as executor:
+            while True:
+                for future in [f for f in running if f.done()]:
+                    job = running.pop(future)
+                    overdue.discard(job.id)
+                    self.stdout.write(f"  ✓ job {job.id} ({job.kind}) done")
+
+                # Overdue attempts keep heart-beating: the job is requeued only once their thread exits
+                runner.heartbeat(worker_id, [job.id for job in running.values()])
+                for job in running.values():
+                    if job.id not in overdue and runner.timed_out(job):
+                        overdue.add(job.id)
+                        self.stderr.write(
+                            f"  ! job {job.id} ({job.kind}) passed its {job.timeout_seconds}s timeout; "
+                            "it will be retried once it stops"
+                        )
+                runner.recover_stale()
+
+                claimed = []
+                if not self.stopping:
+                    for job in runner.claim(worker_id, concurrency - len(running)):
+                        self.stdout.write(f"  → job {job.id} ({job.kind}) attempt {job.attempts}")
+                        running[executor.submit(runner.execute, job, worker_id)] = job
+                        claimed.append(job)
+
+                if (self.stopping or options["once"]) and not running and not claimed:
+                    break
+                time.sleep(options["poll"])
+
+        self.stdout.write(self.style.SUCCESS("Job worker stopped"))
+
+    def _stop(self, signum, frame):
+        # Finish the jobs in hand, but take no new ones
+        self.stopping = True
+        self.stdout.write("Stopping after running jobs finish...")
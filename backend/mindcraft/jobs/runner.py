@@ -0,0 +1,143 @@
+"""Enqueue, claim and execute background jobs.
+
+Jobs live in the database, so they survive restarts and any number of
+`manage.py run_jobs` processes can share the queue: a job is claimed with a
+conditional UPDATE, and only the worker whose claim matched may record its
+outcome.
+
+Failed attempts are retried with exponential backoff up to max_attempts. A
+running job whose worker stops heart-beating (crash, kill -9) is treated as a
+failed attempt. Python threads cannot be killed, so an attempt that outlives
+its timeout keeps its claim (and its heartbeat) until its thread exits, and
+only then is recorded as a failed attempt and requeued: two attempts of the
+same job never run at once. Whatever a timed-out attempt returns is discarded.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .handlers import HANDLERS
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = [Job.Status.QUEUED, Job.Status.RUNNING]
+
+
+def enqueue(kind: str, payload: dict, target: str = "", user=None) -> Job:
+    """Queue a job, or return the active job already working on `target`."""
+    handler = HANDLERS[kind]
+    with transaction.atomic():
+        if target:
+            existing = Job.objects.filter(kind=kind, target=target, status__in=ACTIVE).first()
+            if existing:
+                return existing
+        job = Job.objects.create(
+            kind=kind,
+            target=target,
+            payload=payload,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            timeout_seconds=handler.timeout,
+            run_after=timezone.now(),
+            created_by=user,
+        )
+    handler.pending(payload)
+    logger.info("Queued job %s (%s %s)", job.id, kind, target)
+    return job
+
+
+def claim(worker_id: str, limit: int) -> list[Job]:
+    """Atomically take up to `limit` due jobs for this worker."""
+    now = timezone.now()
+    candidates = Job.objects.filter(status=Job.Status.QUEUED, run_after__lte=now).order_by("run_after", "id")
+    claimed = []
+    for job_id in candidates.values_list("id", flat=True)[:limit]:
+        won = Job.objects.filter(id=job_id, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker_id,
+            attempts=F("attempts") + 1,
+            started_at=now,
+            heartbeat_at=now,
+            updated_at=now,
+        )
+        if won:
+            claimed.append(Job.objects.get(id=job_id))
+    return claimed
+
+
+def execute(job: Job, worker_id: str):
+    """Run one claimed job and record its outcome (called on a worker thread)."""
+    close_old_connections()
+    try:
+        logger.info("Running job %s (%s, attempt %d/%d)", job.id, job.kind, job.attempts, job.max_attempts)
+        try:
+            result = HANDLERS[job.kind].run(job.payload)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            fail(job, worker_id, f"{type(e).__name__}: {e}")
+            return
+        if timed_out(job):
+            logger.warning("Job %s finished after its %ds timeout — result discarded", job.id, job.timeout_seconds)
+            fail(job, worker_id, f"Timed out after {job.timeout_seconds}s")
+            return
+        finished = _owned(job, worker_id).update(
+            status=Job.Status.SUCCEEDED, result=result, error="", finished_at=timezone.now(), updated_at=timezone.now(),
+        )
+        if not finished:
+            logger.warning("Job %s lost its claim while running — result discarded", job.id)
+    finally:
+        connection.close()
+
+
+def fail(job: Job, worker_id: str, error: str):
+    """Record a failed attempt: requeue with backoff, or give up and reset the target."""
+    handler = HANDLERS[job.kind]
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        delay = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        updated = _owned(job, worker_id).update(
+            status=Job.Status.QUEUED, error=error, locked_by="", run_after=now + timedelta(seconds=delay), updated_at=now,
+        )
+        if updated:
+            handler.pending(job.payload)
+            logger.info("Job %s will retry in %ds", job.id, delay)
+    else:
+        updated = _owned(job, worker_id).update(
+            status=Job.Status.FAILED, error=error, finished_at=now, updated_at=now,
+        )
+        if updated:
+            handler.reset(job.payload)
+
+
+def heartbeat(worker_id: str, job_ids: list[int]):
+    if job_ids:
+        Job.objects.filter(id__in=job_ids, status=Job.Status.RUNNING, locked_by=worker_id).update(
+            heartbeat_at=timezone.now(),
+        )
+
+
+def timed_out(job: Job) -> bool:
+    return job.started_at is not None and timezone.now() - job.started_at > timedelta(seconds=job.timeout_seconds)
+
+
+def recover_stale():
+    """Fail attempts whose worker died.
+
+    Attempts past their timeout are left to their own worker, which fails them
+    once their thread exits (see execute).
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.JOB_STALE_AFTER)
+    for job in Job.objects.filter(status=Job.Status.RUNNING, heartbeat_at__lt=stale_before):
+        logger.warning("Job %s lost its worker %s — recovering", job.id, job.locked_by)
+        fail(job, job.locked_by, "Worker stopped responding")
+
+
+def _owned(job, worker_id):
+    """Queryset matching `job` only while this worker's claim on this attempt holds."""
+    return Job.objects.filter(id=job.id, status=Job.Status.RUNNING, locked_by=worker_id, attempts=job.attempts)
@@ -0,0 +1,11 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            "id", "kind", "target", "status", "result", "error", "attempts", "max_attempts",
+            "run_after", "started_at", "finished_at", "created_at", "updated_at",
+        ]
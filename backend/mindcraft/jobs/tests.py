@@ -0,0 +1,108 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APITransactionTestCase
+
+from mindcraft.content import tasks as content_tasks
+from mindcraft.content.models import CurriculumPlan, Subject, Topic, Lesson
+from mindcraft.quiz.models import Quiz
+from . import runner
+from .handlers import HANDLERS, Handler
+from .models import Job
+
+
+class GenerateQuizJobTests(APITransactionTestCase):
+    # The worker runs jobs on its own threads and connections, so data must be committed
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("parent", is_staff=True))
+        topic = Topic.objects.create(subject=Subject.objects.create(name="Science"), name="Plants")
+        self.lesson = Lesson.objects.create(topic=topic, title="Photosynthesis", content="# Photosynthesis")
+
+    def fake_quiz(self, lesson, num_questions, refresh=False):
+        return Quiz.objects.create(lesson=lesson, title="Quiz"), num_questions
+
+    def test_queued_by_default(self):
+        response = self.client.post("/api/v1/quizzes/generate/", {"lesson_id": self.lesson.id, "num_questions": 3}, format="json")
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(id=response.data["id"])
+        self.assertEqual(job.status, Job.Status.QUEUED)
+
+        with mock.patch("mindcraft.quiz.tasks.create_lesson_quiz", side_effect=self.fake_quiz):
+            call_command("run_jobs", once=True, poll=0.01, stdout=StringIO(), stderr=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.result["questions"], 3)
+
+        status = self.client.get(f"/api/v1/jobs/{job.id}/")
+        self.assertEqual(status.data["status"], "succeeded")
+
+    def test_background_false_runs_in_the_request(self):
+        with mock.patch("mindcraft.quiz.tasks.create_lesson_quiz", side_effect=self.fake_quiz):
+            response = self.client.post(
+                "/api/v1/quizzes/generate/", {"lesson_id": self.lesson.id, "background": "false"},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Job.objects.exists())
+
+
+class TimedOutJobTests(APITransactionTestCase):
+    def test_timed_out_attempt_is_retried_only_after_its_thread_exits(self):
+        lock = threading.Lock()
+        active, overlap, resets = [0], [0], []
+
+        def slow(payload):
+            with lock:
+                active[0] += 1
+                overlap[0] = max(overlap[0], active[0])
+            time.sleep(0.2)
+            with lock:
+                active[0] -= 1
+            return {}
+
+        handler = Handler(slow, lambda payload: None, resets.append, 0)  # every attempt times out
+        with mock.patch.dict(HANDLERS, {"slow": handler}), self.settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BACKOFF=0):
+            job = runner.enqueue("slow", {"n": 1})
+            call_command("run_jobs", once=True, poll=0.01, stdout=StringIO(), stderr=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(overlap[0], 1)
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertEqual(job.error, "Timed out after 0s")
+        self.assertEqual(resets, [{"n": 1}])
+
+
+class OutlineFailureTests(TestCase):
+    def setUp(self):
+        self.plan = CurriculumPlan.objects.create(
+            concept="Volcanoes", created_by=User.objects.create_user("parent"), status=CurriculumPlan.Status.PLANNING,
+        )
+
+    def generate(self):
+        with mock.patch.object(content_tasks.generators, "generate_curriculum_outline", side_effect=RuntimeError("down")), \
+                self.assertRaises(RuntimeError):
+            content_tasks.generate_plan_outline(self.plan)
+        self.plan.refresh_from_db()
+        return self.plan.status
+
+    def test_failed_first_outline_returns_to_draft(self):
+        self.assertEqual(self.generate(), CurriculumPlan.Status.PLANNING)
+        HANDLERS["generate_outline"].reset({"plan_id": self.plan.id})
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.status, CurriculumPlan.Status.PLANNING)
+
+    def test_failed_regeneration_keeps_the_existing_outline(self):
+        self.plan.outline = {"title": "Volcanoes", "weeks": []}
+        self.plan.status = CurriculumPlan.Status.COMPLETE
+        self.plan.save()
+        self.assertEqual(self.generate(), CurriculumPlan.Status.OUTLINE_READY)
+        self.assertEqual(self.plan.outline["title"], "Volcanoes")
+
+        HANDLERS["generate_outline"].pending({"plan_id": self.plan.id})
+        HANDLERS["generate_outline"].reset({"plan_id": self.plan.id})
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.status, CurriculumPlan.Status.OUTLINE_READY)
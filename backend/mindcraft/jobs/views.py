@@ -0,0 +1,18 @@
+from rest_framework import viewsets
+from rest_framework.permissions import IsAdminUser
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Background job status and results — admin only."""
+    serializer_class = JobSerializer
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        qs = Job.objects.all()
+        for field in ("status", "kind", "target"):
+            value = self.request.query_params.get(field)
+            if value:
+                qs = qs.filter(**{field: value})
+        return qs
@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import JournalEntry
 from .serializers import JournalEntrySerializer
-from mindcraft.ai_service import generators
+from mindcraft.ai_service import generators, scheduler
 
 
 class JournalEntryViewSet(viewsets.ModelViewSet):
@@ -40,4 +40,4 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
             entry.save()
             return Response({"feedback": feedback})
         except Exception as e:
-            return Response({"error": str(e)}, status=500)
+            return scheduler.error_response(e)
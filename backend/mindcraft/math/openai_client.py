@@ -1,10 +1,12 @@
 """Thin wrapper for OpenAI GPT-4o-mini vision API — evaluates handwritten math answers."""
 
+import hashlib
 import json
 import logging
 
 from django.conf import settings
-from openai import OpenAI
+
+from mindcraft.ai_service import providers, replay, scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +22,6 @@ def evaluate_math_answer(problem: str, image_base64: str, grade: int) -> dict:
     Returns:
         {"correct": bool, "correct_answer": str, "feedback": str}
     """
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
     age = grade + 5
     prompt = (
         f"The math problem shown to the student was: {problem}. "
@@ -35,26 +35,38 @@ def evaluate_math_answer(problem: str, image_base64: str, grade: int) -> dict:
         f'{{"correct": true/false, "correct_answer": "...", "feedback": "..."}}'
     )
 
-    response = client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}",
+    def call():
+        response = providers.get_openai().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/png;base64,{image_base64}",
+                            },
                         },
-                    },
-                ],
-            }
-        ],
-        max_tokens=300,
-    )
+                    ],
+                }
+            ],
+            max_tokens=300,
+        )
+        return response.choices[0].message.content
 
-    raw = response.choices[0].message.content.strip()
+    with scheduler.slot("vision"):
+        if replay.enabled():
+            # Key on a digest of the image rather than the full base64 payload
+            request = {
+                "model": settings.OPENAI_MODEL,
+                "prompt": prompt,
+                "image_sha256": hashlib.sha256(image_base64.encode()).hexdigest(),
+            }
+            raw = replay.completion("openai", request, call).strip()
+        else:
+            raw = call().strip()
 
     # Parse JSON (handle markdown code blocks)
     json_str = raw
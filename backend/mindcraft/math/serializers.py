@@ -26,8 +26,9 @@ class MathProblemAttemptSerializer(serializers.ModelSerializer):
 
 
 class MathPracticeSessionListSerializer(serializers.ModelSerializer):
-    attempt_count = serializers.SerializerMethodField()
-    correct_count = serializers.SerializerMethodField()
+    # Annotated by MathPracticeSessionViewSet.get_queryset
+    attempt_count = serializers.IntegerField(read_only=True)
+    correct_count = serializers.IntegerField(read_only=True)
     chat_session_id = serializers.IntegerField(read_only=True)
 
     class Meta:
@@ -38,12 +39,6 @@ class MathPracticeSessionListSerializer(serializers.ModelSerializer):
             "created_at", "updated_at",
         ]
 
-    def get_attempt_count(self, obj):
-        return obj.attempts.filter(is_correct__isnull=False).count()
-
-    def get_correct_count(self, obj):
-        return obj.attempts.filter(is_correct=True).count()
-
 
 class MathPracticeSessionDetailSerializer(serializers.ModelSerializer):
     attempts = MathProblemAttemptSerializer(many=True, read_only=True)
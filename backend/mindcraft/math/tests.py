@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from mindcraft.core.models import KidProfile
+from .models import MathPracticeSession, MathProblemAttempt
+
+
+class MathSessionQueryCountTests(APITestCase):
+    """The session list takes the same number of queries however many sessions there are."""
+
+    def setUp(self):
+        parent = User.objects.create_user("parent", is_staff=True)
+        kid_user = User.objects.create_user("kid")
+        self.kid = KidProfile.objects.create(user=kid_user, parent=parent, display_name="Kid")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=kid_user).key}")
+
+    def add_sessions(self, count):
+        for i in range(count):
+            session = MathPracticeSession.objects.create(kid=self.kid, topic="fractions")
+            MathProblemAttempt.objects.create(session=session, problem_text="1/2 + 1/2", is_correct=True)
+            MathProblemAttempt.objects.create(session=session, problem_text="1/3 + 1/3", is_correct=False)
+            MathProblemAttempt.objects.create(session=session, problem_text="1/4 + 1/4")
+
+    def test_list(self):
+        # Token, kid profile, page count, page
+        for count in (2, 10):
+            self.add_sessions(count)
+            with self.subTest(sessions=MathPracticeSession.objects.count()), self.assertNumQueries(4):
+                response = self.client.get("/api/v1/math/sessions/")
+            results = response.data["results"]
+            self.assertEqual(len(results), MathPracticeSession.objects.count())
+            self.assertEqual((results[0]["attempt_count"], results[0]["correct_count"]), (2, 1))
@@ -4,7 +4,7 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from mindcraft.ai_service import generators
+from mindcraft.ai_service import generators, scheduler
 from mindcraft.chat.models import ChatSession
 from .models import MathPracticeSession, MathProblemAttempt
 from .serializers import (
@@ -22,10 +22,17 @@ class MathPracticeSessionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return MathPracticeSession.objects.all()
-        if hasattr(user, "kid_profile"):
-            return MathPracticeSession.objects.filter(kid=user.kid_profile)
-        return MathPracticeSession.objects.none()
+            sessions = MathPracticeSession.objects.all()
+        elif hasattr(user, "kid_profile"):
+            sessions = MathPracticeSession.objects.filter(kid=user.kid_profile)
+        else:
+            return MathPracticeSession.objects.none()
+        if self.action == "list":
+            sessions = sessions.annotate(
+                attempt_count=db_models.Count("attempts", filter=db_models.Q(attempts__is_correct__isnull=False)),
+                correct_count=db_models.Count("attempts", filter=db_models.Q(attempts__is_correct=True)),
+            ).order_by(*MathPracticeSession._meta.ordering)  # aggregates drop Meta.ordering
+        return sessions
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -98,7 +105,7 @@ def generate_problem(request):
         result = generators.generate_math_problem(topic=topic, grade_level=grade)
         return Response(result)
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return scheduler.error_response(e)
 
 
 @api_view(["POST"])
@@ -129,4 +136,4 @@ def evaluate_answer(request):
         )
         return Response(result)
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return scheduler.error_response(e)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import LessonProgress, Badge, KidBadge, Streak
+from .models import LessonProgress, Badge, Streak
 
 
 class LessonProgressSerializer(serializers.ModelSerializer):
@@ -18,18 +18,12 @@ class BadgeSerializer(serializers.ModelSerializer):
         model = Badge
         fields = ["id", "name", "description", "icon", "badge_type", "earned", "earned_at"]
 
+    # `earned_at` is annotated for the kid by badges_view
     def get_earned(self, obj):
-        kid = self.context.get("kid")
-        if kid:
-            return KidBadge.objects.filter(kid=kid, badge=obj).exists()
-        return False
+        return getattr(obj, "earned_at", None) is not None
 
     def get_earned_at(self, obj):
-        kid = self.context.get("kid")
-        if kid:
-            kb = KidBadge.objects.filter(kid=kid, badge=obj).first()
-            return kb.earned_at if kb else None
-        return None
+        return getattr(obj, "earned_at", None)
 
 
 class StreakSerializer(serializers.ModelSerializer):
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from mindcraft.core.models import KidProfile
+from .models import Badge, KidBadge
+
+
+class BadgeQueryCountTests(APITestCase):
+    """The badge list takes the same number of queries however many badges there are."""
+
+    def setUp(self):
+        parent = User.objects.create_user("parent", is_staff=True)
+        kid_user = User.objects.create_user("kid")
+        self.kid = KidProfile.objects.create(user=kid_user, parent=parent, display_name="Kid")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=kid_user).key}")
+
+    def add_badges(self, count):
+        for i in range(count):
+            badge = Badge.objects.create(name=f"Badge {i}", description="", badge_type=Badge.BadgeType.EXPLORER)
+            if i % 2:
+                KidBadge.objects.create(kid=self.kid, badge=badge)
+
+    def test_list(self):
+        # Token, kid profile, badges
+        for count in (2, 10):
+            self.add_badges(count)
+            with self.subTest(badges=Badge.objects.count()), self.assertNumQueries(3):
+                response = self.client.get("/api/v1/progress/badges/")
+            self.assertEqual(len(response.data), Badge.objects.count())
+            self.assertEqual(sum(b["earned"] for b in response.data), KidBadge.objects.count())
@@ -1,3 +1,4 @@
+from django.db.models import OuterRef, Subquery
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from .models import LessonProgress, Badge, KidBadge, Streak
@@ -52,6 +53,9 @@ def badges_view(request):
         kid = request.user.kid_profile
 
     badges = Badge.objects.all()
+    if kid:
+        earned = KidBadge.objects.filter(kid=kid, badge=OuterRef("pk"))
+        badges = badges.annotate(earned_at=Subquery(earned.values("earned_at")[:1]))
     serializer = BadgeSerializer(badges, many=True, context={"kid": kid})
     return Response(serializer.data)
 
@@ -0,0 +1,72 @@
+"""Per-quiz answer keys for grading submissions without per-question queries.
+
+A key is loaded in one query (questions left-joined to their choices) and
+kept in process memory for QUIZ_ANSWER_KEY_TTL seconds. Saving or deleting a
+question or choice drops its quiz's key in this process (see quiz.signals);
+the TTL bounds how long other worker processes can grade against an edited
+quiz.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Question
+
+# Quizzes whose keys are kept at once (least recently used dropped first)
+MAX_KEYS = 256
+
+_keys = OrderedDict()  # quiz_id -> (loaded_at, key)
+_lock = threading.Lock()
+
+
+def _load(quiz_id):
+    key = {}
+    rows = (
+        Question.objects.filter(quiz_id=quiz_id)
+        .order_by("order", "id", "choices__order", "choices__id")
+        .values_list("id", "points", "explanation", "choices__id", "choices__is_correct")
+    )
+    for question_id, points, explanation, choice_id, is_correct in rows:
+        question = key.setdefault(question_id, {
+            "points": points, "explanation": explanation, "choices": {}, "correct_choice_id": None,
+        })
+        if choice_id is None:
+            continue
+        question["choices"][choice_id] = is_correct
+        if is_correct and question["correct_choice_id"] is None:
+            question["correct_choice_id"] = choice_id
+    return key
+
+
+def get(quiz_id):
+    """Answer key for a quiz.
+
+    Returns:
+        {question_id: {"points", "explanation", "choices": {choice_id: is_correct},
+                       "correct_choice_id"}} in question order
+    """
+    with _lock:
+        cached = _keys.get(quiz_id)
+        if cached and time.monotonic() - cached[0] < settings.QUIZ_ANSWER_KEY_TTL:
+            _keys.move_to_end(quiz_id)
+            return cached[1]
+
+    key = _load(quiz_id)
+    with _lock:
+        _keys[quiz_id] = (time.monotonic(), key)
+        _keys.move_to_end(quiz_id)
+        while len(_keys) > MAX_KEYS:
+            _keys.popitem(last=False)
+    return key
+
+
+def max_score(quiz_id):
+    return sum(question["points"] for question in get(quiz_id).values())
+
+
+def invalidate(quiz_id):
+    with _lock:
+        _keys.pop(quiz_id, None)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QuizConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "mindcraft.quiz"
+
+    def ready(self):
+        import mindcraft.quiz.signals  # noqa: F401
@@ -0,0 +1,19 @@
+"""Drop cached answer keys when a quiz's questions or choices change."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from mindcraft.quiz import answer_key
+from mindcraft.quiz.models import Question, Choice
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    answer_key.invalidate(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    quiz_id = Question.objects.filter(id=instance.question_id).values_list("quiz_id", flat=True).first()
+    if quiz_id is not None:
+        answer_key.invalidate(quiz_id)
@@ -0,0 +1,54 @@
+"""Quiz generation, shared by the generate endpoint and the job worker."""
+
+from django.db import transaction
+
+from mindcraft.ai_service import generators
+from .models import Quiz, Question, Choice
+
+
+def create_lesson_quiz(lesson, num_questions=5, refresh=False):
+    """AI-generate a review quiz for `lesson`.
+
+    A lesson that already has a quiz always gets fresh questions rather
+    than a cached copy of the quiz it already has.
+
+    Returns:
+        (quiz, number of questions created)
+    """
+    quiz_data = generators.generate_quiz(
+        lesson.content, num_questions, lesson.grade_level,
+        refresh=refresh or lesson.quizzes.exists(),
+    )
+
+    questions_data = quiz_data.get("questions", [])
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            lesson=lesson,
+            title=quiz_data.get("title", f"Quiz: {lesson.title}"),
+            quiz_type=Quiz.QuizType.LESSON_REVIEW,
+            ai_generated=True,
+        )
+        questions = Question.objects.bulk_create([
+            Question(
+                quiz=quiz,
+                question_text=q_data["question_text"],
+                question_type=q_data.get("question_type", "multiple_choice"),
+                order=i,
+                points=q_data.get("points", 1),
+                hint=q_data.get("hint", ""),
+                explanation=q_data.get("explanation", ""),
+            )
+            for i, q_data in enumerate(questions_data)
+        ])
+        Choice.objects.bulk_create([
+            Choice(
+                question=question,
+                choice_text=c_data["text"],
+                is_correct=c_data.get("is_correct", False),
+                order=j,
+            )
+            for question, q_data in zip(questions, questions_data)
+            for j, c_data in enumerate(q_data.get("choices", []))
+        ])
+
+    return quiz, len(questions)
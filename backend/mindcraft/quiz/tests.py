@@ -0,0 +1,149 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from mindcraft.content.models import Lesson, Subject, Topic
+from mindcraft.core.models import KidProfile
+from . import answer_key, tasks
+from .models import Choice, Question, Quiz, QuizAttempt
+
+QUIZ = {"title": "Plants quiz", "questions": [
+    {"question_text": "What do plants need?", "choices": [
+        {"text": "Sunlight", "is_correct": True}, {"text": "Sand"},
+    ]},
+]}
+
+
+class CreateLessonQuizTests(TestCase):
+    def setUp(self):
+        topic = Topic.objects.create(subject=Subject.objects.create(name="Science"), name="Plants")
+        self.lesson = Lesson.objects.create(topic=topic, title="Plants", content="# Plants")
+
+    def generate(self, **kwargs):
+        with mock.patch.object(tasks.generators, "generate_quiz", return_value=QUIZ) as generate:
+            quiz, count = tasks.create_lesson_quiz(self.lesson, **kwargs)
+        self.assertEqual(count, 1)
+        return generate.call_args.kwargs["refresh"]
+
+    def test_first_quiz_may_come_from_the_cache(self):
+        self.assertFalse(self.generate())
+
+    def test_explicit_refresh_bypasses_the_cache(self):
+        self.assertTrue(self.generate(refresh=True))
+
+    def test_regenerating_bypasses_the_cache(self):
+        Quiz.objects.create(lesson=self.lesson, title="Old quiz")
+        self.assertTrue(self.generate())
+
+
+def make_quiz(lesson):
+    quiz = Quiz.objects.create(lesson=lesson, title="Plants quiz")
+    for i, (text, points) in enumerate([("What do plants need?", 1), ("Where do roots grow?", 2), ("Explain.", 1)]):
+        question = Question.objects.create(quiz=quiz, question_text=text, order=i, points=points, explanation=f"Because {i}")
+        if i < 2:
+            Choice.objects.create(question=question, choice_text="Right", is_correct=True, order=0)
+            Choice.objects.create(question=question, choice_text="Wrong", order=1)
+    return quiz
+
+
+class AnswerKeyTests(TestCase):
+    def setUp(self):
+        topic = Topic.objects.create(subject=Subject.objects.create(name="Science"), name="Plants")
+        self.quiz = make_quiz(Lesson.objects.create(topic=topic, title="Plants", content="# Plants"))
+        self.question = self.quiz.questions.first()
+
+    def test_key_is_cached(self):
+        answer_key.get(self.quiz.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(answer_key.max_score(self.quiz.id), 4)
+
+    def test_editing_a_question_invalidates_the_key(self):
+        answer_key.get(self.quiz.id)
+        self.question.points = 5
+        self.question.save()
+        self.assertEqual(answer_key.max_score(self.quiz.id), 8)
+
+        self.question.delete()
+        self.assertNotIn(self.question.id, answer_key.get(self.quiz.id))
+
+    def test_editing_a_choice_invalidates_the_key(self):
+        right, wrong = self.question.choices.order_by("order")
+        self.assertEqual(answer_key.get(self.quiz.id)[self.question.id]["correct_choice_id"], right.id)
+        right.is_correct, wrong.is_correct = False, True
+        right.save()
+        wrong.save()
+        self.assertEqual(answer_key.get(self.quiz.id)[self.question.id]["correct_choice_id"], wrong.id)
+
+
+def grade_per_row(quiz, answers):
+    """The per-answer grading submit used before answer keys and bulk inserts."""
+    score, results = 0, []
+    for answer in answers:
+        try:
+            question = quiz.questions.get(id=answer.get("question_id"))
+        except (Question.DoesNotExist, ValueError):
+            continue
+        is_correct = False
+        if answer.get("choice_id"):
+            try:
+                is_correct = question.choices.get(id=answer["choice_id"]).is_correct
+            except (Choice.DoesNotExist, ValueError):
+                pass
+        if is_correct:
+            score += question.points
+        correct_choice = question.choices.filter(is_correct=True).first()
+        results.append({
+            "question_id": answer.get("question_id"),
+            "is_correct": is_correct,
+            "correct_choice_id": correct_choice.id if correct_choice else None,
+            "selected_choice_id": answer.get("choice_id"),
+            "explanation": question.explanation,
+        })
+    return score, results
+
+
+class QuizSubmitTests(APITestCase):
+    def setUp(self):
+        parent = User.objects.create_user("parent")
+        kid = KidProfile.objects.create(user=User.objects.create_user("kid"), parent=parent, display_name="Kid")
+        topic = Topic.objects.create(subject=Subject.objects.create(name="Science"), name="Plants")
+        lesson = Lesson.objects.create(topic=topic, title="Plants", content="# Plants", status=Lesson.Status.PUBLISHED)
+        lesson.assigned_to.add(kid)
+        self.quiz = make_quiz(lesson)
+        self.client.force_authenticate(kid.user)
+
+    def submit(self, answers):
+        response = self.client.post(f"/api/v1/quizzes/{self.quiz.id}/submit/", {"answers": answers}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_bulk_grading_matches_the_per_row_path(self):
+        q1, q2, q3 = self.quiz.questions.order_by("order")
+        right1, wrong1 = q1.choices.order_by("order")
+        right2, _ = q2.choices.order_by("order")
+        cases = {
+            "all right": [{"question_id": q1.id, "choice_id": right1.id}, {"question_id": q2.id, "choice_id": right2.id}],
+            "wrong and text": [{"question_id": q1.id, "choice_id": wrong1.id}, {"question_id": q3.id, "text_answer": "Sun"}],
+            "string ids": [{"question_id": str(q2.id), "choice_id": str(right2.id)}],
+            "another question's choice": [{"question_id": q1.id, "choice_id": right2.id}],
+            "unknown question or choice": [{"question_id": 999999, "choice_id": right1.id}, {"question_id": q2.id, "choice_id": 999999}],
+            "no choice": [{"question_id": q1.id}],
+        }
+        for name, answers in cases.items():
+            with self.subTest(name):
+                score, results = grade_per_row(self.quiz, answers)
+                data = self.submit(answers)
+                self.assertEqual((data["score"], data["max_score"]), (score, 4))
+                self.assertEqual(data["results"], results)
+                saved = QuizAttempt.objects.latest("id").answers.order_by("id")
+                self.assertEqual([a.is_correct for a in saved], [r["is_correct"] for r in results])
+
+    def test_submit_grades_against_an_edited_quiz(self):
+        question = self.quiz.questions.order_by("order").first()
+        right, wrong = question.choices.order_by("order")
+        self.assertEqual(self.submit([{"question_id": question.id, "choice_id": wrong.id}])["score"], 0)
+        wrong.is_correct = True
+        wrong.save()
+        self.assertEqual(self.submit([{"question_id": question.id, "choice_id": wrong.id}])["score"], 1)
@@ -1,13 +1,26 @@
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from .models import Quiz, Question, Choice, QuizAttempt, QuestionAnswer
+from .models import Quiz, Question, QuizAttempt, QuestionAnswer
 from .serializers import (
     QuizListSerializer, QuizDetailSerializer, QuizSubmitSerializer, QuizAttemptSerializer,
 )
-from mindcraft.ai_service import generators
+from . import answer_key, tasks
+from mindcraft.ai_service import generators, scheduler
+from mindcraft.core.utils import request_flag
+from mindcraft.jobs import runner as job_runner
+from mindcraft.jobs.serializers import JobSerializer
+
+
+def _as_id(value):
+    """Submitted ids may arrive as strings; anything else non-numeric matches nothing."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 class QuizViewSet(viewsets.ReadOnlyModelViewSet):
@@ -37,7 +50,7 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
         attempt = QuizAttempt.objects.create(
             quiz=quiz,
             kid=request.user.kid_profile,
-            max_score=sum(q.points for q in quiz.questions.all()),
+            max_score=answer_key.max_score(quiz.id),
         )
         return Response(QuizAttemptSerializer(attempt).data)
 
@@ -50,59 +63,58 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
         if not hasattr(request.user, "kid_profile"):
             return Response({"error": "Only kids can submit quizzes"}, status=400)
 
-        # Get or create attempt
-        attempt = QuizAttempt.objects.filter(
-            quiz=quiz, kid=request.user.kid_profile, completed_at__isnull=True
-        ).first()
-        if not attempt:
-            attempt = QuizAttempt.objects.create(
-                quiz=quiz,
-                kid=request.user.kid_profile,
-                max_score=sum(q.points for q in quiz.questions.all()),
-            )
-
+        key = answer_key.get(quiz.id)
         score = 0
         results = []
-        for answer_data in serializer.validated_data["answers"]:
-            question_id = answer_data.get("question_id")
-            choice_id = answer_data.get("choice_id")
-            text_answer = answer_data.get("text_answer", "")
-
-            try:
-                question = quiz.questions.get(id=question_id)
-            except Question.DoesNotExist:
-                continue
-
-            is_correct = False
-            if choice_id:
-                try:
-                    choice = question.choices.get(id=choice_id)
-                    is_correct = choice.is_correct
-                except Choice.DoesNotExist:
-                    pass
-
-            if is_correct:
-                score += question.points
-
-            QuestionAnswer.objects.create(
-                attempt=attempt,
-                question=question,
-                selected_choice_id=choice_id,
-                text_answer=text_answer,
-                is_correct=is_correct,
-            )
-            correct_choice = question.choices.filter(is_correct=True).first()
-            results.append({
-                "question_id": question_id,
-                "is_correct": is_correct,
-                "correct_choice_id": correct_choice.id if correct_choice else None,
-                "selected_choice_id": choice_id,
-                "explanation": question.explanation,
-            })
-
-        attempt.score = score
-        attempt.completed_at = timezone.now()
-        attempt.save()
+        answers = []
+        with transaction.atomic():
+            # Get or create attempt
+            attempt = QuizAttempt.objects.filter(
+                quiz=quiz, kid=request.user.kid_profile, completed_at__isnull=True
+            ).first()
+            if not attempt:
+                attempt = QuizAttempt.objects.create(
+                    quiz=quiz,
+                    kid=request.user.kid_profile,
+                    max_score=answer_key.max_score(quiz.id),
+                )
+
+            for answer_data in serializer.validated_data["answers"]:
+                question_id = answer_data.get("question_id")
+                choice_id = answer_data.get("choice_id")
+                text_answer = answer_data.get("text_answer", "")
+
+                question = key.get(_as_id(question_id))
+                if question is None:
+                    continue
+
+                # Choices from other questions count as no answer
+                selected_choice_id = _as_id(choice_id)
+                if selected_choice_id not in question["choices"]:
+                    selected_choice_id = None
+                is_correct = bool(selected_choice_id and question["choices"][selected_choice_id])
+                if is_correct:
+                    score += question["points"]
+
+                answers.append(QuestionAnswer(
+                    attempt=attempt,
+                    question_id=_as_id(question_id),
+                    selected_choice_id=selected_choice_id,
+                    text_answer=text_answer,
+                    is_correct=is_correct,
+                ))
+                results.append({
+                    "question_id": question_id,
+                    "is_correct": is_correct,
+                    "correct_choice_id": question["correct_choice_id"],
+                    "selected_choice_id": choice_id,
+                    "explanation": question["explanation"],
+                })
+
+            QuestionAnswer.objects.bulk_create(answers)
+            attempt.score = score
+            attempt.completed_at = timezone.now()
+            attempt.save()
 
         return Response({
             "score": score,
@@ -129,21 +141,22 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({"error": "Question not found"}, status=404)
 
         choices = list(question.choices.values_list("choice_text", flat=True))
+        refresh = request_flag(request, "refresh")
 
         try:
-            hint = generators.generate_hint(question.question_text, choices, attempt_number)
+            hint = generators.generate_hint(question.question_text, choices, attempt_number, refresh=refresh)
             return Response({"hint": hint})
         except Exception as e:
             # Fall back to stored hint
             if question.hint:
                 return Response({"hint": question.hint})
-            return Response({"error": str(e)}, status=500)
+            return scheduler.error_response(e)
 
 
 @api_view(["POST"])
 @permission_classes([IsAdminUser])
 def generate_quiz_view(request):
-    """AI-generate a quiz from a lesson."""
+    """AI-generate a quiz from a lesson. Queued as a job (202) unless {"background": false} is passed."""
     lesson_id = request.data.get("lesson_id")
     num_questions = request.data.get("num_questions", 5)
 
@@ -156,34 +169,18 @@ def generate_quiz_view(request):
     except Lesson.DoesNotExist:
         return Response({"error": "Lesson not found"}, status=404)
 
-    try:
-        quiz_data = generators.generate_quiz(lesson.content, num_questions, lesson.grade_level)
-
-        quiz = Quiz.objects.create(
-            lesson=lesson,
-            title=quiz_data.get("title", f"Quiz: {lesson.title}"),
-            quiz_type=Quiz.QuizType.LESSON_REVIEW,
-            ai_generated=True,
+    refresh = request_flag(request, "refresh")
+    if request_flag(request, "background", True):
+        job = job_runner.enqueue(
+            "generate_quiz",
+            {"lesson_id": lesson.id, "num_questions": num_questions, "refresh": refresh},
+            target=f"lesson_quiz:{lesson.id}",
+            user=request.user,
         )
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-        for i, q_data in enumerate(quiz_data.get("questions", [])):
-            question = Question.objects.create(
-                quiz=quiz,
-                question_text=q_data["question_text"],
-                question_type=q_data.get("question_type", "multiple_choice"),
-                order=i,
-                points=q_data.get("points", 1),
-                hint=q_data.get("hint", ""),
-                explanation=q_data.get("explanation", ""),
-            )
-            for j, c_data in enumerate(q_data.get("choices", [])):
-                Choice.objects.create(
-                    question=question,
-                    choice_text=c_data["text"],
-                    is_correct=c_data.get("is_correct", False),
-                    order=j,
-                )
-
-        return Response({"quiz_id": quiz.id, "title": quiz.title, "questions": len(quiz_data.get("questions", []))})
+    try:
+        quiz, question_count = tasks.create_lesson_quiz(lesson, num_questions, refresh=refresh)
+        return Response({"quiz_id": quiz.id, "title": quiz.title, "questions": question_count})
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return scheduler.error_response(e)
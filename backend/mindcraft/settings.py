@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     "mindcraft.journal",
     "mindcraft.progress",
     "mindcraft.math",
+    "mindcraft.jobs",
 ]
 
 MIDDLEWARE = [
@@ -106,12 +107,103 @@ REST_FRAMEWORK = {
 }
 
 # AI Configuration
-AI_BACKEND = os.getenv("AI_BACKEND", "cli")  # "cli" = Claude Code CLI, "api" = Anthropic API
+AI_BACKEND = os.getenv("AI_BACKEND", "cli")  # "cli" = Claude Code CLI, "api" = Anthropic API, "replay" = cassettes
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 AI_MODEL = os.getenv("AI_MODEL", "claude-sonnet-4-6")
 AI_MODEL_CHAT = os.getenv("AI_MODEL_CHAT", "claude-haiku-4-5-20251001")
 AI_MAX_TOKENS = int(os.getenv("AI_MAX_TOKENS", "4096"))
 AI_DEFAULT_DAILY_CHAT_LIMIT = int(os.getenv("AI_DEFAULT_DAILY_CHAT_LIMIT", "50"))
+# Daily chat token budget per kid, counting messages and replies (0 = messages limit only)
+AI_DEFAULT_DAILY_TOKEN_LIMIT = int(os.getenv("AI_DEFAULT_DAILY_TOKEN_LIMIT", "0"))
+# Time zone whose midnight resets the daily chat quotas
+AI_CHAT_QUOTA_TIME_ZONE = os.getenv("AI_CHAT_QUOTA_TIME_ZONE", TIME_ZONE)
+
+# Chat history sent per turn: the last N exchanges within a token budget; older turns are summarized
+AI_CHAT_HISTORY_TURNS = int(os.getenv("AI_CHAT_HISTORY_TURNS", "6"))
+AI_CHAT_HISTORY_TOKENS = int(os.getenv("AI_CHAT_HISTORY_TOKENS", "3000"))
+# Lesson chat grounding: the lesson sections most relevant to each question, at most N within a token budget
+AI_LESSON_CONTEXT_SECTIONS = int(os.getenv("AI_LESSON_CONTEXT_SECTIONS", "3"))
+AI_LESSON_CONTEXT_TOKENS = int(os.getenv("AI_LESSON_CONTEXT_TOKENS", "800"))
+
+# Chat reply streams (resumable with Last-Event-ID): events buffered per reply, seconds a finished
+# reply stays resumable, seconds an unfinished reply keeps generating with no client attached, and
+# seconds between keepalive comments while a reply is silent
+AI_CHAT_STREAM_BUFFER = int(os.getenv("AI_CHAT_STREAM_BUFFER", "512"))
+AI_CHAT_STREAM_TTL = int(os.getenv("AI_CHAT_STREAM_TTL", "120"))
+AI_CHAT_RESUME_GRACE = float(os.getenv("AI_CHAT_RESUME_GRACE", "15"))
+AI_CHAT_STREAM_KEEPALIVE = float(os.getenv("AI_CHAT_STREAM_KEEPALIVE", "15"))
+
+# Record/replay backend (AI_BACKEND=replay) for tests and benchmarks without live credentials
+AI_REPLAY_MODE = os.getenv("AI_REPLAY_MODE", "replay")  # "replay", "record" or "auto"
+AI_REPLAY_UPSTREAM = os.getenv("AI_REPLAY_UPSTREAM", "cli")  # real Claude backend used when recording
+AI_REPLAY_DIR = os.getenv("AI_REPLAY_DIR", str(BASE_DIR / "ai_cassettes"))
+AI_REPLAY_LATENCY_SCALE = float(os.getenv("AI_REPLAY_LATENCY_SCALE", "1.0"))
+
+# Warm Claude CLI worker pool (AI_BACKEND=cli), one warm worker per model. Size 0 spawns one
+# process per call. Workers keep their conversation, so MAX_REQUESTS above 1 lets one request
+# see the previous one's (possibly another kid's) messages.
+AI_CLI_POOL_SIZE = int(os.getenv("AI_CLI_POOL_SIZE", "4"))
+AI_CLI_POOL_MAX_REQUESTS = int(os.getenv("AI_CLI_POOL_MAX_REQUESTS", "1"))
+AI_CLI_POOL_QUEUE_TIMEOUT = int(os.getenv("AI_CLI_POOL_QUEUE_TIMEOUT", "60"))
+AI_CLI_POOL_IDLE_TTL = int(os.getenv("AI_CLI_POOL_IDLE_TTL", "600"))
+
+# Response cache for deterministic generators (topic suggestions, quizzes, hints, ...)
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", str(BASE_DIR / "ai_cache.sqlite3"))
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Directory for cross-process single-flight lock files (empty = coalesce within a process only)
+AI_SINGLEFLIGHT_LOCK_DIR = os.getenv("AI_SINGLEFLIGHT_LOCK_DIR", "")
+
+# AI scheduler: per-workload concurrency limits, bounded queues (timeouts in seconds) and
+# strict priority for interactive traffic on the shared Claude capacity. Chat streams hold their
+# slot only until the first chunk ("hold": "admission"), so the chat limit caps replies starting
+# at once, not open streams.
+AI_SCHEDULER_ENABLED = os.getenv("AI_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+AI_SCHEDULER_CAPACITY = int(os.getenv("AI_SCHEDULER_CAPACITY", str(max(AI_CLI_POOL_SIZE, 4))))
+AI_SCHEDULER_INTERACTIVE_RESERVE = int(os.getenv("AI_SCHEDULER_INTERACTIVE_RESERVE", "1"))
+AI_SCHEDULER_WORKLOADS = {
+    "chat": {"limit": 4, "queue": 100, "timeout": 20, "priority": "interactive", "shared": True, "hold": "admission"},
+    "hint": {"limit": 2, "queue": 10, "timeout": 20, "priority": "interactive", "shared": True},
+    "vision": {"limit": 4, "queue": 10, "timeout": 20, "priority": "interactive", "shared": False},
+    "generation": {"limit": 3, "queue": 30, "timeout": 600, "priority": "batch", "shared": True},
+    "research": {"limit": 2, "queue": 10, "timeout": 120, "priority": "batch", "shared": False},
+}
+
+# Seconds between saves of partial text while lessons/research stream (kept if the stream is cut off)
+AI_STREAM_SAVE_INTERVAL = float(os.getenv("AI_STREAM_SAVE_INTERVAL", "2"))
+
+# Lessons generated at the same time by bulk generation (also capped by the scheduler)
+AI_BULK_LESSON_CONCURRENCY = int(os.getenv("AI_BULK_LESSON_CONCURRENCY", "3"))
+
+# Curriculum lessons generated at the same time (1 = one after another)
+AI_CURRICULUM_CONCURRENCY = int(os.getenv("AI_CURRICULUM_CONCURRENCY", "3"))
+# Perplexity calls run at the same time by research-and-enrich and batch research (the
+# scheduler's "research" workload limit applies on top)
+AI_RESEARCH_CONCURRENCY = int(os.getenv("AI_RESEARCH_CONCURRENCY", "2"))
+# Days Perplexity research/media is reused for sessions on the same topic, subject and grade band (0 = off)
+AI_RESEARCH_CACHE_DAYS = int(os.getenv("AI_RESEARCH_CACHE_DAYS", "30"))
+# "Previous lessons" digest per curriculum lesson prompt: last N lessons in detail, older weeks
+# summarized, capped at a token budget
+AI_CURRICULUM_CONTEXT_RECENT = int(os.getenv("AI_CURRICULUM_CONTEXT_RECENT", "3"))
+AI_CURRICULUM_CONTEXT_TOKENS = int(os.getenv("AI_CURRICULUM_CONTEXT_TOKENS", "300"))
+
+# Background jobs (`manage.py run_jobs`): attempts per job, base retry backoff (doubles each
+# attempt), seconds without a heartbeat before a running job is recovered, and worker threads
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = int(os.getenv("JOB_RETRY_BACKOFF", "30"))
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "120"))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+
+# Seconds a quiz's answer key is reused for grading before it is reloaded
+QUIZ_ANSWER_KEY_TTL = int(os.getenv("QUIZ_ANSWER_KEY_TTL", "300"))
+
+# Shared HTTP connection pools for the Anthropic / OpenAI / Perplexity SDK clients
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "20"))
+AI_HTTP_MAX_KEEPALIVE = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "10"))
+AI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AI_HTTP_KEEPALIVE_EXPIRY", "60"))
+AI_HTTP_TIMEOUT = float(os.getenv("AI_HTTP_TIMEOUT", "600"))
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "10"))
 
 # OpenAI Configuration (used for math answer evaluation via vision)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
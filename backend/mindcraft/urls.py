@@ -16,6 +16,7 @@ urlpatterns = [
     path("api/v1/journal/", include("mindcraft.journal.urls")),
     path("api/v1/progress/", include("mindcraft.progress.urls")),
     path("api/v1/math/", include("mindcraft.math.urls")),
+    path("api/v1/jobs/", include("mindcraft.jobs.urls")),
 ]
 
 if settings.DEBUG:
@@ -48,6 +48,7 @@ export interface KidProfile {
   grade_level: number;
   date_of_birth: string | null;
   daily_chat_limit: number;
+  daily_token_limit: number;
   age: number | null;
 }
 
@@ -96,6 +97,7 @@ export interface ChatMessage {
   id: number;
   role: "user" | "assistant" | "system";
   content: string;
+  truncated?: boolean;
   created_at: string;
 }
 
@@ -239,6 +241,7 @@ export interface ResearchSession {
   difficulty: string;
   status: PipelineStatus;
   lesson_id: number | null;
+  media_error: string;
   finding: ResearchFinding | null;
   media_resources: MediaResource[];
   created_at: string;
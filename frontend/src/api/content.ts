@@ -12,8 +12,8 @@ export interface TopicSuggestion {
   grade_level_max: number;
 }
 
-export const suggestTopics = (subjectId: number) =>
-  api.post(`/subjects/${subjectId}/suggest-topics/`).then(r => r.data.topics) as Promise<TopicSuggestion[]>;
+export const suggestTopics = (subjectId: number, refresh = false) =>
+  api.post(`/subjects/${subjectId}/suggest-topics/`, { refresh }).then(r => r.data.topics) as Promise<TopicSuggestion[]>;
 
 export const getTopics = (subjectId?: number) => api.get('/topics/', { params: subjectId ? { subject: subjectId } : {} }).then(r => r.data.results ?? r.data) as Promise<Topic[]>;
 export const createTopic = (data: Record<string, unknown>) => api.post('/topics/', data).then(r => r.data) as Promise<Topic>;
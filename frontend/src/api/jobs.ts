@@ -0,0 +1,31 @@
+import api from "./client";
+
+export interface Job {
+  id: number;
+  kind: string;
+  target: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  result: Record<string, unknown> | null;
+  error: string;
+}
+
+const POLL_INTERVAL_MS = 2000;
+
+/** Poll a background job until it finishes. A failed job rejects like an API error ({response: {data: {error}}}). */
+export async function waitForJob(job: Job): Promise<Job> {
+  while (job.status === "queued" || job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+    ({ data: job } = await api.get(`/jobs/${job.id}/`));
+  }
+  if (job.status === "failed") {
+    const error = job.error || "Background job failed";
+    throw Object.assign(new Error(error), { response: { data: { error } } });
+  }
+  return job;
+}
+
+/** POST to an endpoint that queues a job (202) and resolve once the job has finished. */
+export async function runJob(url: string, body?: object): Promise<Job> {
+  const { data } = await api.post(url, body);
+  return waitForJob(data);
+}
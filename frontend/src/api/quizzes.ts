@@ -1,4 +1,5 @@
 import api, { type Quiz, type QuizAttempt, type QuizSubmitResult } from "./client";
+import { runJob } from "./jobs";
 
 export async function getQuizzes(): Promise<Quiz[]> {
   const { data } = await api.get("/quizzes/");
@@ -32,12 +33,14 @@ export async function submitQuiz(
 export async function generateQuiz(
   lessonId: number,
   numQuestions: number = 5,
+  refresh: boolean = false,
 ): Promise<{ quiz_id: number; title: string; questions: number }> {
-  const { data } = await api.post("/quizzes/generate/", {
+  const job = await runJob("/quizzes/generate/", {
     lesson_id: lessonId,
     num_questions: numQuestions,
+    refresh,
   });
-  return data;
+  return job.result as { quiz_id: number; title: string; questions: number };
 }
 
 export async function getHint(
@@ -99,13 +99,13 @@ export default function SubjectPicker({ subjects, value, onChange, onSubjectsCha
     }
   };
 
-  const fetchSuggestions = async (subjectId: number) => {
+  const fetchSuggestions = async (subjectId: number, refresh = false) => {
     setLoadingSuggestions(true);
     setError("");
     setSuggestions([]);
     setSelectedSuggestions(new Set());
     try {
-      const topics = await suggestTopics(subjectId);
+      const topics = await suggestTopics(subjectId, refresh);
       setSuggestions(topics);
     } catch (err: unknown) {
       const message =
@@ -343,7 +343,7 @@ export default function SubjectPicker({ subjects, value, onChange, onSubjectsCha
 
           <div className="flex items-center justify-between pt-2">
             <button
-              onClick={() => newSubjectId && fetchSuggestions(newSubjectId)}
+              onClick={() => newSubjectId && fetchSuggestions(newSubjectId, true)}
               disabled={loadingSuggestions}
               className="text-gray-500 hover:text-gray-700 px-4 py-2.5 rounded-xl font-semibold flex items-center gap-2 disabled:opacity-50"
             >
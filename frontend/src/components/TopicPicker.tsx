@@ -76,13 +76,13 @@ export default function TopicPicker({ topics, value, onChange, onTopicsChange, s
     setError("");
   };
 
-  const fetchSuggestions = async () => {
+  const fetchSuggestions = async (refresh = false) => {
     setLoadingSuggestions(true);
     setError("");
     setSuggestions([]);
     setSelectedSuggestions(new Set());
     try {
-      const topics = await suggestTopics(Number(subjectId));
+      const topics = await suggestTopics(Number(subjectId), refresh);
       setSuggestions(topics);
     } catch (err: unknown) {
       const message =
@@ -358,7 +358,7 @@ export default function TopicPicker({ topics, value, onChange, onTopicsChange, s
 
           <div className="flex items-center justify-between pt-2">
             <button
-              onClick={fetchSuggestions}
+              onClick={() => fetchSuggestions(true)}
               disabled={loadingSuggestions}
               className="text-gray-500 hover:text-gray-700 px-4 py-2.5 rounded-xl font-semibold flex items-center gap-2 disabled:opacity-50"
             >
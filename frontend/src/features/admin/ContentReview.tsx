@@ -86,7 +86,7 @@ export default function ContentReview() {
     setError(null);
     setQuizGenerating(lessonId);
     try {
-      const result = await generateQuiz(lessonId);
+      const result = await generateQuiz(lessonId, 5, true);
       setLessons((prev) =>
         prev.map((l) =>
           l.id === lessonId
@@ -2,6 +2,7 @@ import { useState, useEffect, useCallback } from "react";
 import { useSearchParams } from "react-router-dom";
 import Markdown from "../../components/Markdown";
 import api from "../../api/client";
+import { runJob } from "../../api/jobs";
 import type {
   CurriculumPlan,
   CurriculumOutline,
@@ -203,9 +204,8 @@ export default function CurriculumPlanner() {
         lessons_per_week: Number(lessonsPerWeek),
       });
       setSearchParams({ plan: String(newPlan.id) }, { replace: true });
-      const { data: updated } = await api.post(
-        `/curriculum/${newPlan.id}/generate-outline/`
-      );
+      await runJob(`/curriculum/${newPlan.id}/generate-outline/`);
+      const { data: updated } = await api.get(`/curriculum/${newPlan.id}/`);
       setPlan(updated);
       setEditableOutline(updated.outline);
       setCurrentStep(1);
@@ -240,9 +240,8 @@ export default function CurriculumPlanner() {
     setGeneratingOutline(true);
     setError("");
     try {
-      const { data: updated } = await api.post(
-        `/curriculum/${plan.id}/generate-outline/`
-      );
+      await runJob(`/curriculum/${plan.id}/generate-outline/`, { refresh: true });
+      const { data: updated } = await api.get(`/curriculum/${plan.id}/`);
       setPlan(updated);
       setEditableOutline(updated.outline);
       if (updated.outline?.weeks) {
@@ -295,9 +294,8 @@ export default function CurriculumPlanner() {
     setError("");
     setGeneratingLessons(true);
     try {
-      const { data: updated } = await api.post(
-        `/curriculum/${plan.id}/generate-lessons/`
-      );
+      await runJob(`/curriculum/${plan.id}/generate-lessons/`);
+      const { data: updated } = await api.get(`/curriculum/${plan.id}/`);
       setPlan(updated);
       setCurrentStep(2);
     } catch (e: unknown) {
@@ -28,6 +28,7 @@ import {
   Video,
   BookOpen,
 } from "lucide-react";
+import { runJob } from "../../api/jobs";
 import SubjectPicker from "../../components/SubjectPicker";
 import TopicPicker from "../../components/TopicPicker";
 
@@ -315,10 +316,12 @@ export default function ResearchPipeline() {
       setSession(newSession);
       setSearchParams({ session: String(newSession.id) }, { replace: true });
 
-      // Start research
-      const { data: updated } = await api.post(
-        `/research/${newSession.id}/research/`
-      );
+      // Start research (queued as a job) unless the session was seeded from
+      // the research cache, then reload the session
+      if (newSession.status !== "research_complete") {
+        await runJob(`/research/${newSession.id}/research/`);
+      }
+      const { data: updated } = await api.get(`/research/${newSession.id}/`);
       setSession(updated);
       setCurrentStep(STATUS_STEP_MAP[updated.status as PipelineStatus] ?? 1);
       if (updated.finding) {
@@ -343,7 +346,8 @@ export default function ResearchPipeline() {
     setResearching(true);
     setError("");
     try {
-      const { data } = await api.post(`/research/${session.id}/research/`);
+      await runJob(`/research/${session.id}/research/`, { refresh: true });
+      const { data } = await api.get(`/research/${session.id}/`);
       setSession(data);
       if (data.finding) {
         setEditSummary(data.finding.summary);
@@ -389,9 +393,8 @@ export default function ResearchPipeline() {
     setGeneratingLesson(true);
     setError("");
     try {
-      const { data } = await api.post(
-        `/research/${session.id}/generate-lesson/`
-      );
+      await runJob(`/research/${session.id}/generate-lesson/`);
+      const { data } = await api.get(`/research/${session.id}/`);
       setSession(data);
       setCurrentStep(STATUS_STEP_MAP[data.status as PipelineStatus] ?? 2);
       if (data.lesson_id) {
@@ -417,9 +420,8 @@ export default function ResearchPipeline() {
     setDiscoveringMedia(true);
     setError("");
     try {
-      const { data } = await api.post(
-        `/research/${session.id}/discover-media/`
-      );
+      await runJob(`/research/${session.id}/discover-media/`);
+      const { data } = await api.get(`/research/${session.id}/`);
       setSession(data);
     } catch (err: unknown) {
       const message =
@@ -1111,6 +1113,12 @@ export default function ResearchPipeline() {
             </button>
           </div>
 
+          {session?.media_error && (
+            <div className="mb-4 text-sm text-amber-700 bg-amber-50 rounded-xl px-4 py-2.5">
+              Media discovery failed: {session.media_error}
+            </div>
+          )}
+
           {media.length === 0 ? (
             <div className="text-center py-8 text-gray-400">
               No media resources yet. Click "Auto-Discover" or add manually
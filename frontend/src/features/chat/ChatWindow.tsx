@@ -95,38 +95,66 @@ export default function ChatWindow() {
         body: JSON.stringify({ message: userMsg }),
       });
 
-      const reader = response.body?.getReader();
-      const decoder = new TextDecoder();
+      let decoder = new TextDecoder();
+      let buffer = "";
       let fullContent = "";
+      let lastEventId = "";
+      let finished = false;
+      let reader = response.body?.getReader();
+      let resumed = false;
 
-      if (reader) {
-        while (true) {
-          const { done, value } = await reader.read();
-          if (done) break;
-          const text = decoder.decode(value);
-          const lines = text.split("\n");
-          for (const line of lines) {
-            if (line.startsWith("data: ")) {
-              try {
-                const parsed = JSON.parse(line.slice(6));
-                if (parsed.type === "chunk") {
-                  fullContent += parsed.content;
-                  setStreamingContent(fullContent);
-                } else if (parsed.type === "done") {
-                  setMessages((prev) => [
-                    ...prev,
-                    { id: Date.now() + 1, role: "assistant", content: parsed.content, created_at: new Date().toISOString() },
-                  ]);
-                  setStreamingContent("");
-                } else if (parsed.type === "error") {
-                  setMessages((prev) => [
-                    ...prev,
-                    { id: Date.now() + 1, role: "assistant", content: `Oops! Something went wrong: ${parsed.content}`, created_at: new Date().toISOString() },
-                  ]);
-                  setStreamingContent("");
-                }
-              } catch {}
-            }
+      while (reader && !finished) {
+        let chunk;
+        try {
+          chunk = await reader.read();
+        } catch (err) {
+          // Connection dropped mid-reply: reattach once, picking up after the last event seen
+          if (resumed || !lastEventId) throw err;
+          resumed = true;
+          const retry = await fetch(`/api/v1/chat/sessions/${activeSession.id}/stream/`, {
+            headers: { Authorization: `Token ${token}`, "Last-Event-ID": lastEventId },
+          });
+          if (!retry.ok) throw err;
+          reader = retry.body?.getReader();
+          // The replay starts at an event boundary; drop the half-received line
+          decoder = new TextDecoder();
+          buffer = "";
+          continue;
+        }
+        const { done, value } = chunk;
+        if (done) break;
+        // A read can end mid-line (or mid-character); keep the tail until the rest arrives
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines) {
+          if (line.startsWith("id: ")) {
+            lastEventId = line.slice(4);
+          } else if (line.startsWith("data: ")) {
+            try {
+              const parsed = JSON.parse(line.slice(6));
+              if (parsed.type === "chunk") {
+                fullContent += parsed.content;
+                setStreamingContent(fullContent);
+              } else if (parsed.type === "resume") {
+                fullContent = parsed.content;
+                setStreamingContent(fullContent);
+              } else if (parsed.type === "done" || parsed.type === "cancelled") {
+                finished = true;
+                setMessages((prev) => [
+                  ...prev,
+                  { id: Date.now() + 1, role: "assistant", content: parsed.content, created_at: new Date().toISOString() },
+                ]);
+                setStreamingContent("");
+              } else if (parsed.type === "error") {
+                finished = true;
+                setMessages((prev) => [
+                  ...prev,
+                  { id: Date.now() + 1, role: "assistant", content: `Oops! Something went wrong: ${parsed.content}`, created_at: new Date().toISOString() },
+                ]);
+                setStreamingContent("");
+              }
+            } catch {}
           }
         }
       }
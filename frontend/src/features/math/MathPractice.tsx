@@ -245,7 +245,7 @@ export default function MathPractice() {
                 if (parsed.type === "chunk") {
                   fullContent += parsed.content;
                   setStreamingContent(fullContent);
-                } else if (parsed.type === "done") {
+                } else if (parsed.type === "done" || parsed.type === "cancelled") {
                   setMessages((prev) => [
                     ...prev,
                     {